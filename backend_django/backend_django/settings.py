@@ -54,6 +54,7 @@ REST_FRAMEWORK = {
 
 
 MIDDLEWARE = [
+    'social_admin.instrumentation.RequestProfilerMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -154,3 +155,151 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Home feed (social_admin.feed)
+# Communities with more members than this are merged into stream_posts at read time
+# instead of being pushed into every member's inbox.
+
+FEED_FANOUT_MAX_MEMBERS = 5000
+FEED_MAX_ENTRIES = 500
+
+
+# Realtime chat events (social_admin.realtime), served through asgi.py
+# InMemoryChannelLayer works for a single process; for several ASGI/WSGI workers
+# (websockets, and get_messages?wait= long-polls, which wake on these events) use
+#   {'BACKEND': 'social_admin.realtime.RedisChannelLayer', 'OPTIONS': {'url': 'redis://localhost:6379/0'}}
+
+CHANNEL_LAYER = {
+    'BACKEND': 'social_admin.realtime.InMemoryChannelLayer',
+}
+
+
+# Typing indicators (social_admin.presence): TTL entries, never written to the database.
+# Per-process by default; across workers use social_admin.presence.CachePresenceStore
+# (any shared Django cache) or social_admin.presence.RedisPresenceStore with {'url': ...}.
+
+PRESENCE_STORE = {
+    'BACKEND': 'social_admin.presence.InMemoryPresenceStore',
+    'OPTIONS': {'ttl': 5},
+}
+
+
+# Post like/dislike/comment counters (social_admin.counters).
+# DirectCounters updates the post row on every change. To absorb like storms on
+# hot posts switch to write-behind buffering, e.g.
+#   {'BACKEND': 'social_admin.counters.BufferedCounters', 'OPTIONS': {'interval': 2, 'max_pending': 1000}}
+#   {'BACKEND': 'social_admin.counters.RedisCounters', 'OPTIONS': {'url': 'redis://localhost:6379/0'}}
+# and run `manage.py reconcile_counters` periodically to repair drift.
+# `manage.py benchmark_counters` (DEBUG only) compares the backends under a simulated like storm.
+
+ENGAGEMENT_COUNTERS = {
+    'BACKEND': 'social_admin.counters.DirectCounters',
+}
+
+
+# Search (social_admin.search): 'auto' uses MySQL FULLTEXT when the database is MySQL
+# and the portable SearchToken index otherwise; 'fulltext' / 'tokens' force one.
+# Migration 0020 indexes existing rows; after changing it run `manage.py rebuild_search_index`.
+
+SEARCH_BACKEND = 'auto'
+
+
+# Caches. The response cache (social_admin.response_cache) stores public read payloads
+# here under versioned keys; any backend works, e.g.
+#   {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/var/tmp/social_cache'}
+#   {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/1'}
+# Use a shared backend when running several workers, or invalidations stay per process.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+RESPONSE_CACHE_LISTING_TIMEOUT = 60
+
+
+# Request profiling (social_admin.instrumentation): per-route latency, query counts
+# and repeated-query (N+1) detection, shown on the admin performance page and sent
+# to clients as a Server-Timing header.
+
+REQUEST_STATS_WINDOW = 500
+REQUEST_DUPLICATE_QUERY_THRESHOLD = 5
+REQUEST_SERVER_TIMING = True
+
+
+# Prometheus metrics (social_admin.metrics), served at /metrics when prometheus_client
+# is installed. With several worker processes point METRICS_MULTIPROC_DIR (or the
+# PROMETHEUS_MULTIPROC_DIR environment variable) at a directory shared by all of them
+# and emptied on every server start; leave it unset for a single process.
+# An empty METRICS_ALLOWED_IPS lets any client scrape.
+
+METRICS_MULTIPROC_DIR = None
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+
+# Upload processing (social_admin.media): metadata stripping, resized WebP/JPEG
+# renditions and video poster frames (needs ffmpeg) run after the request on a
+# small thread pool in each web process. ImmediateRunner processes inline instead;
+# social_admin.tasks.QueueRunner hands the jobs to the run_tasks workers.
+# `manage.py process_media` finishes uploads left pending by a restart.
+
+MEDIA_PIPELINE = {
+    'BACKEND': 'social_admin.media.ThreadPoolRunner',
+    'OPTIONS': {'workers': 2},
+}
+MEDIA_RENDITION_WIDTHS = (320, 640, 1080)
+MEDIA_AVATAR_SIZES = (64, 160, 400)
+MEDIA_PREVIEW_WIDTH = 640
+
+
+# Resumable chunked uploads (social_admin.uploads) for large videos: POST api/uploads,
+# PUT each chunk to api/uploads/<id>, POST api/uploads/<id>/complete, then pass the
+# upload_id to create_posts / edit_post. Needs a storage with local paths (the default).
+# `manage.py purge_uploads` deletes uploads abandoned for UPLOAD_EXPIRE_HOURS.
+
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+UPLOAD_MAX_CHUNK_SIZE = 16 * 1024 * 1024
+UPLOAD_MAX_SIZE = 2 * 1024 * 1024 * 1024
+UPLOAD_EXPIRE_HOURS = 24
+
+
+# Media serving (social_admin.serving) at MEDIA_URL, in production too: byte ranges for
+# video seeking, content-hash ETags, and immutable caching of hashed rendition names.
+# Set MEDIA_SENDFILE to 'x-accel-redirect' (nginx, with an `internal` location at
+# MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT) or 'x-sendfile' (Apache, lighttpd)
+# so the proxy streams the bytes instead of a Python worker.
+
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_SECONDS = 3600
+
+
+# Content-addressed media storage (social_admin.storage): each distinct upload is stored
+# once under blobs/ and reference counted, so duplicates cost nothing and a file is only
+# removed when the last post, community or profile picture using it lets go.
+# `manage.py dedupe_media` moves media saved before this into the store.
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'social_admin.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+
+# Background tasks (social_admin.tasks) are rows in the Task table, run by
+# `manage.py run_tasks` (keep one or more running under a process supervisor).
+# A failed task is retried after TASK_RETRY_DELAY seconds, doubling each time, and kept
+# as 'failed' after TASK_MAX_ATTEMPTS. Tasks running longer than TASK_LEASE_SECONDS are
+# assumed to have lost their worker and are queued again.
+
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 30
+TASK_LEASE_SECONDS = 600
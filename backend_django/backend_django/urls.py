@@ -14,14 +14,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.urls import path
+import re
+
+from django.urls import path, re_path
 from social_admin import views
 from django.conf import settings
-from django.conf.urls.static import static
 
 urlpatterns = [
     path('', views.admin_login, name='admin_login'),
     path('dashboard', views.admin_home, name='admin_dashboard'),
+    path('dashboard/performance', views.performance_dashboard, name='performance_dashboard'),
+    path('metrics', views.metrics_view, name='metrics'),
     path('users_data', views.users_list, name='users_list'),
     path('user/<int:user_id>/', views.user_detail, name='user_detail'),
     path('communities', views.community_list, name='communities_list'),
@@ -49,12 +52,16 @@ urlpatterns = [
     path('api/like_dislike/<int:post_id>', views.like_post, name='like_post'),
     path('api/comment/<int:post_id>', views.add_comment, name='add_comment'),
     path('api/create_posts', views.create_post, name='create_post'),
+    path('api/uploads', views.start_upload, name='start_upload'),
+    path('api/uploads/<uuid:upload_id>', views.upload_chunk, name='upload_chunk'),
+    path('api/uploads/<uuid:upload_id>/complete', views.complete_upload, name='complete_upload'),
     path('api/create_communities', views.create_community_with_post, name='create_community'),
     path('api/toggle_membership/<int:community_id>', views.toggle_community_membership, name='join_community'),  
     path('api/community/<int:community_id>', views.get_community, name='get_community'),
     path('api/community_posts/<int:community_id>', views.community_posts, name='community_posts'),
     path('api/get_comment/<int:post_id>', views.post_comments, name='get_comments'),
     path('api/discover_communities', views.discover_communities, name='discover_communities'),
+    path('api/search', views.search_view, name='search'),
     path('api/report_chat/<int:chat_id>', views.report_chat, name='report_chat'),
     path('api/report_post/<int:post_id>', views.report_post, name='report_post'),
     path('api/report_comment/<int:comment_id>', views.report_comment, name='report_comment'),
@@ -76,6 +83,7 @@ urlpatterns = [
     path('api/user_profile/<int:user_id>/', views.user_profile, name='user_profile'),
     path('api/follow/<int:user_id>', views.follow_user, name='follow_user'),
     path('api/block/<int:user_id>', views.block_user, name='block_user'),
+    path('api/notifications', views.notifications, name='notifications'),
     path('api/profile_dashboard', views.profile_dashboard_full, name='profile_dashboard'),
     path('api/change_password', views.change_password, name='change_password'),
     path('api/chats_view', views.chats_view, name='chats_view'),
@@ -86,6 +94,5 @@ urlpatterns = [
     path('api/delete_chat/<int:chat_id>/', views.delete_chat, name='delete_chat'),
     path('api/typing/<int:chat_id>/', views.typing_status_view, name='typing'),
     path('api/get_typing/<int:chat_id>/', views.get_typing_status, name='get_typing'),
-]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    re_path(r'^%s(?P<name>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), views.serve_media, name='media'),
+]
\ No newline at end of file
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class SocialAdminConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'social_admin'
+
+    def ready(self):
+        from . import metrics, response_cache, search, site_stats, storage
+
+        metrics.connect_signals()
+        response_cache.connect_signals()
+        search.connect_signals()
+        site_stats.connect_signals()
+        storage.connect_signals()
@@ -0,0 +1,60 @@
+from django.db.models import BigIntegerField, Case, F, When
+from django.db.models.functions import Greatest
+
+from . import metrics, response_cache
+from .models import ChatState
+
+
+def chat_scope(chat_id):
+    # version bumped on every change to a chat's messages or inbox rows;
+    # chats_view / get_messages use it as their ETag input
+    return f'chat:{chat_id}'
+
+
+def ensure_states(chat, users):
+    """Create inbox rows for participants who do not have one yet."""
+    ChatState.objects.bulk_create(
+        [ChatState(chat=chat, user=user, last_activity=chat.updated_at or chat.created_at) for user in users],
+        ignore_conflicts=True,
+    )
+    response_cache.bump(chat_scope(chat.id))
+
+
+def record_message(message):
+    # one UPDATE for every participant: the sender has read their own message,
+    # everyone else gets one more unread
+    is_sender = When(user_id=message.sender_id, then=F('unread_count'))
+    ChatState.objects.filter(chat_id=message.chat_id).update(
+        last_message=message,
+        last_activity=message.created_at,
+        unread_count=Case(is_sender, default=F('unread_count') + 1),
+        last_read_message=Case(
+            When(user_id=message.sender_id, then=message.id),
+            default=F('last_read_message'),
+            output_field=BigIntegerField(),
+        ),
+    )
+    response_cache.bump(chat_scope(message.chat_id))
+    metrics.message_sent()
+
+
+def mark_read(chat, user, last_message_id):
+    ChatState.objects.filter(chat=chat, user=user).update(
+        unread_count=0,
+        last_read_message_id=last_message_id,
+    )
+    response_cache.bump(chat_scope(chat.id))
+
+
+def record_deleted(message):
+    # an unread message that gets deleted should not keep the badge lit
+    if not message.is_read:
+        ChatState.objects.filter(chat_id=message.chat_id).exclude(user_id=message.sender_id).update(
+            unread_count=Greatest(F('unread_count') - 1, 0)
+        )
+    response_cache.bump(chat_scope(message.chat_id))
+
+
+def leave(chat, user):
+    ChatState.objects.filter(chat=chat, user=user).delete()
+    response_cache.bump(chat_scope(chat.id))
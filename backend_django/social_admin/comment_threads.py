@@ -0,0 +1,70 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from . import popularity
+from .models import Comment
+
+
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 10
+REPLIES_PER_NODE = 10
+
+
+def attach_replies(roots, depth=DEFAULT_DEPTH, per_node=REPLIES_PER_NODE):
+    """
+    Load the visible reply tree under `roots` level by level (one query per
+    level, plus one count query for the deepest level) and hang it on each
+    comment as `thread_replies` / `reply_count` for CommentSerializer.
+    Each level query returns at most `per_node` replies per parent, however
+    long a thread grows.
+    """
+    level = list(roots)
+    for _ in range(depth - 1):
+        if not level:
+            break
+        children = defaultdict(list)
+        siblings = {}
+        replies = (
+            Comment.objects
+            .filter(parent_id__in=[c.id for c in level], is_visible=True)
+            .annotate(
+                position=Window(RowNumber(), partition_by=[F('parent_id')],
+                                order_by=[F('created_at').asc(), F('id').asc()]),
+                siblings=Window(Count('id'), partition_by=[F('parent_id')]),
+            )
+            .filter(position__lte=per_node)
+            .select_related('user')
+            .order_by('created_at', 'id')
+        )
+        for reply in replies:
+            children[reply.parent_id].append(reply)
+            siblings[reply.parent_id] = reply.siblings
+
+        next_level = []
+        for comment in level:
+            comment.reply_count = siblings.get(comment.id, 0)
+            comment.thread_replies = children.get(comment.id, [])
+            next_level.extend(comment.thread_replies)
+        level = next_level
+
+    # Deepest loaded level: report how many replies a "load more" would return
+    if level:
+        counts = dict(
+            Comment.objects
+            .filter(parent_id__in=[c.id for c in level], is_visible=True)
+            .values_list('parent_id')
+            .annotate(total=Count('id'))
+        )
+        for comment in level:
+            comment.reply_count = counts.get(comment.id, 0)
+            comment.thread_replies = []
+    return roots
+
+
+def delete_thread(comment):
+    # replies cascade with their parent, so count every removed comment
+    _, deleted = comment.delete()
+    removed = deleted.get(Comment._meta.label, 0)
+    popularity.record_comments(comment.post_id, -removed)
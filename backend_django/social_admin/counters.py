@@ -0,0 +1,180 @@
+# Engagement counters on Post (likes / dislikes / comments and the popularity
+# score that follows them). DirectCounters writes each change immediately; the
+# write-behind backends buffer deltas and flush them aggregated per post, so a
+# viral post's row is locked once per flush instead of once per tap.
+import atexit
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from . import metrics, popularity
+
+
+NO_DELTA = (0, 0, 0)
+
+
+class DirectCounters:
+    """No buffering: every change is one UPDATE on the post row."""
+
+    def __init__(self, **options):
+        pass
+
+    def add(self, post_id, likes=0, dislikes=0, comments=0):
+        popularity.apply_engagement({post_id: (likes, dislikes, comments)})
+
+    def pending(self, post_id):
+        return NO_DELTA
+
+    def flush(self):
+        return 0
+
+
+class BufferedCounters:
+    """
+    In-process write-behind buffer. Deltas are summed per post and written
+    `interval` seconds after the first change, or as soon as `max_pending`
+    changes are queued. A delta enters the buffer only once the transaction
+    that made it commits. Unflushed deltas are lost if the process is killed;
+    run the reconcile_counters command to repair any drift.
+    """
+
+    def __init__(self, interval=2.0, max_pending=1000, **options):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._deltas = {}
+        self._queued = 0
+        self._lock = threading.Lock()
+        # one flush at a time, so flush() returns only once earlier deltas are written
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def add(self, post_id, likes=0, dislikes=0, comments=0):
+        if not (likes or dislikes or comments):
+            return
+        # the Like/Comment change may still roll back; DirectCounters' UPDATE would go with it
+        transaction.on_commit(lambda: self._buffer(post_id, (likes, dislikes, comments)))
+
+    def _buffer(self, post_id, delta):
+        self._push(post_id, delta)
+        with self._lock:
+            self._queued += 1
+            full = self._queued >= self.max_pending
+        if full:
+            self.flush()
+        else:
+            self._schedule()
+
+    def pending(self, post_id):
+        with self._lock:
+            return tuple(self._deltas.get(post_id, NO_DELTA))
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                self._queued = 0
+            deltas = self._take()
+            if not deltas:
+                return 0
+            try:
+                popularity.apply_engagement(deltas)
+            except Exception:
+                # keep the deltas for the next flush instead of dropping them
+                for post_id, delta in deltas.items():
+                    self._push(post_id, delta)
+                raise
+            return len(deltas)
+
+    def _push(self, post_id, delta):
+        with self._lock:
+            current = self._deltas.get(post_id, NO_DELTA)
+            self._deltas[post_id] = tuple(a + b for a, b in zip(current, delta))
+            metrics.buffered_posts(len(self._deltas))
+
+    def _take(self):
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+        metrics.buffered_posts(0)
+        return deltas
+
+    def _schedule(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # the timer thread gets its own DB connection; don't leak it
+            connection.close()
+
+
+class RedisCounters(BufferedCounters):
+    """
+    Shared buffer for several workers: deltas are HINCRBY'd into one Redis hash
+    per post and drained by whichever process flushes next (its timer or the
+    flush_counters command).
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='social_admin:counters:', batch_size=500, **options):
+        super().__init__(**options)
+        import redis  # optional dependency, only needed for this backend
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._dirty = prefix + 'dirty'
+        self.batch_size = batch_size
+
+    def _key(self, post_id):
+        return f'{self._prefix}{post_id}'
+
+    def _push(self, post_id, delta):
+        pipe = self._redis.pipeline()
+        for field, value in zip(('likes', 'dislikes', 'comments'), delta):
+            if value:
+                pipe.hincrby(self._key(post_id), field, value)
+        pipe.sadd(self._dirty, post_id)
+        pipe.execute()
+
+    def backlog(self):
+        """Posts with deltas waiting in Redis, across all workers."""
+        return self._redis.scard(self._dirty)
+
+    def pending(self, post_id):
+        values = self._redis.hmget(self._key(post_id), 'likes', 'dislikes', 'comments')
+        return tuple(int(value or 0) for value in values)
+
+    def _take(self):
+        deltas = {}
+        post_ids = self._redis.spop(self._dirty, self.batch_size) or []
+        for post_id in post_ids:
+            pipe = self._redis.pipeline()  # MULTI: read and clear the hash atomically
+            pipe.hgetall(self._key(int(post_id)))
+            pipe.delete(self._key(int(post_id)))
+            values, _ = pipe.execute()
+            delta = tuple(int(values.get(field, 0)) for field in (b'likes', b'dislikes', b'comments'))
+            if any(delta):
+                deltas[int(post_id)] = delta
+        return deltas
+
+
+_counters = None
+_counters_lock = threading.Lock()
+
+
+def get_counters():
+    global _counters
+    with _counters_lock:
+        if _counters is None:
+            config = getattr(settings, 'ENGAGEMENT_COUNTERS', {})
+            backend = import_string(config.get('BACKEND', 'social_admin.counters.DirectCounters'))
+            _counters = backend(**config.get('OPTIONS', {}))
+    return _counters
@@ -0,0 +1,146 @@
+# Fan-out-on-write home feed for stream_posts: new posts are pushed into the
+# FeedEntry inboxes of the author's followers and the community's members
+# (by a run_tasks worker, see social_admin.tasks), trimming inboxes that have
+# grown past FEED_MAX_ENTRIES.
+# Communities above FEED_FANOUT_MAX_MEMBERS are pulled at read time instead.
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import Community, FeedEntry, Post
+
+
+FANOUT_MAX_MEMBERS = getattr(settings, 'FEED_FANOUT_MAX_MEMBERS', 5000)
+MAX_ENTRIES = getattr(settings, 'FEED_MAX_ENTRIES', 500)
+# fan-out trims an inbox only once it is this far over MAX_ENTRIES, so most posts cost no trim
+TRIM_SLACK = 50
+BACKFILL_POSTS = getattr(settings, 'FEED_BACKFILL_POSTS', 100)
+
+
+def is_large_community(community_id):
+    if not community_id:
+        return False
+    return Community.objects.filter(id=community_id, members_count__gt=FANOUT_MAX_MEMBERS).exists()
+
+
+def large_joined_community_ids(user):
+    return list(
+        user.communities_joined
+        .filter(members_count__gt=FANOUT_MAX_MEMBERS)
+        .values_list('id', flat=True)
+    )
+
+
+def _add_entries(user_ids, posts):
+    entries = [
+        FeedEntry(user_id=user_id, post_id=post.id, created_at=post.created_at)
+        for user_id in user_ids
+        for post in posts
+    ]
+    FeedEntry.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Push an active post into the inboxes of everyone who should see it."""
+    if post.status != 'active':
+        return
+    recipients = set(post.postedby.followers.values_list('id', flat=True))
+    if post.community_id and not is_large_community(post.community_id):
+        recipients.update(
+            Community.members.through.objects
+            .filter(community_id=post.community_id)
+            .values_list('user_id', flat=True)
+        )
+    _add_entries(recipients, [post])
+    trim_feeds(recipients)
+
+
+def remove_post(post):
+    """Drop a hidden post from every inbox (deleted posts cascade on their own)."""
+    FeedEntry.objects.filter(post=post).delete()
+
+
+def _backfill(user, posts):
+    posts = list(posts.filter(status='active').order_by('-created_at')[:BACKFILL_POSTS])
+    _add_entries([user.id], posts)
+    trim_feed(user.id)
+
+
+def on_follow(user, target):
+    _backfill(user, Post.objects.filter(postedby=target))
+
+
+def on_unfollow(user, target):
+    # keep posts the user still receives through a joined community
+    FeedEntry.objects.filter(user=user, post__postedby=target).exclude(
+        post__community__in=user.communities_joined.all()
+    ).delete()
+
+
+def on_join(user, community):
+    if not is_large_community(community.id):
+        _backfill(user, Post.objects.filter(community=community))
+
+
+def on_leave(user, community):
+    # keep posts the user still receives by following the author
+    FeedEntry.objects.filter(user=user, post__community=community).exclude(
+        post__postedby__in=user.following.all()
+    ).delete()
+
+
+def trim_feeds(user_ids, keep=MAX_ENTRIES, slack=TRIM_SLACK, batch_size=1000):
+    """Trim the inboxes among `user_ids` that have grown more than `slack` entries past `keep`."""
+    user_ids = list(user_ids)
+    removed = 0
+    for start in range(0, len(user_ids), batch_size):
+        oversized = (
+            FeedEntry.objects.filter(user_id__in=user_ids[start:start + batch_size])
+            .values('user_id').annotate(n=Count('id')).filter(n__gt=keep + slack)
+            .values_list('user_id', flat=True)
+        )
+        removed += sum(trim_feed(user_id, keep) for user_id in oversized)
+    return removed
+
+
+def trim_feed(user_id, keep=MAX_ENTRIES):
+    """Delete everything but the newest `keep` entries in one user's inbox."""
+    boundary = (
+        FeedEntry.objects.filter(user_id=user_id)
+        .order_by('-created_at', '-post_id')
+        .values_list('created_at', 'post_id')[keep:keep + 1]
+        .first()
+    )
+    if boundary is None:
+        return 0
+    created_at, post_id = boundary
+    # cut at (created_at, post_id), the inbox's sort key, so entries tied on created_at above the boundary stay
+    deleted, _ = FeedEntry.objects.filter(user_id=user_id).filter(
+        Q(created_at__lt=created_at) | Q(created_at=created_at, post_id__lte=post_id)
+    ).delete()
+    return deleted
+
+
+def rebuild_feed(user):
+    """Recreate one inbox from the follow/membership graph (used by the rebuild_feeds command)."""
+    small_communities = user.communities_joined.exclude(id__in=large_joined_community_ids(user))
+    posts = Post.objects.filter(
+        Q(community__in=small_communities) | Q(postedby__in=user.following.all())
+    )
+    FeedEntry.objects.filter(user=user).delete()
+    posts = list(posts.filter(status='active').order_by('-created_at')[:MAX_ENTRIES])
+    _add_entries([user.id], posts)
+
+
+def feed_queryset(user):
+    """Active posts for the user's stream: their inbox plus large communities pulled on read."""
+    if not FeedEntry.objects.filter(user=user).exists():
+        # no inbox yet (nothing fanned out to this user so far): read the follow/membership graph directly
+        return Post.objects.filter(
+            Q(community__in=user.communities_joined.all()) | Q(postedby__in=user.following.all()),
+            status='active',
+        )
+    large_ids = large_joined_community_ids(user)
+    if not large_ids:
+        return Post.objects.filter(feed_entries__user=user, status='active')
+    inbox = FeedEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(Q(id__in=inbox) | Q(community__in=large_ids), status='active')
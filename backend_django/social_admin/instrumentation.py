@@ -0,0 +1,187 @@
+# Per-request profiling: wall time, DB query count/time, repeated queries (the
+# N+1 signature: one statement run again and again with different parameters),
+# response size and the matched URL name. Each response gets a Server-Timing
+# header, and the numbers are kept in a rolling per-route window that the admin
+# performance page reads. Everything is in-process: each worker sees its own
+# traffic only (social_admin.metrics aggregates across workers for /metrics).
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+WINDOW = getattr(settings, 'REQUEST_STATS_WINDOW', 500)
+DUPLICATE_QUERY_THRESHOLD = getattr(settings, 'REQUEST_DUPLICATE_QUERY_THRESHOLD', 5)
+SERVER_TIMING = getattr(settings, 'REQUEST_SERVER_TIMING', True)
+
+# upper bounds (ms) of the latency histogram buckets; the last one is open
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf'))
+
+UNRESOLVED = '<unresolved>'
+
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_SPACE_RE = re.compile(r'\s+')
+# savepoints of nested atomic() blocks repeat per row by design; they are not N+1 queries
+_TRANSACTION_RE = re.compile(
+    r'^\s*(?:BEGIN|START\s+TRANSACTION|COMMIT|ROLLBACK|SAVEPOINT|RELEASE\s+SAVEPOINT)\b', re.IGNORECASE)
+
+
+def query_signature(sql):
+    """
+    SQL with literals and IN-lists collapsed, so the same statement run for
+    different rows compares equal; None for transaction control statements.
+    """
+    if _TRANSACTION_RE.match(sql):
+        return None
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    sql = _LITERAL_RE.sub('?', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+class QueryProfile:
+    """execute_wrapper hook that counts and times every query run through it."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.signatures = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            signature = query_signature(sql)
+            if signature is not None:
+                self.signatures[signature] += 1
+
+    def duplicates(self, threshold=DUPLICATE_QUERY_THRESHOLD):
+        return [(sql, times) for sql, times in self.signatures.most_common() if times >= threshold]
+
+
+class RouteStats:
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.total = 0
+        self.last_duplicates = []
+
+    def summary(self, name):
+        samples = list(self.samples)
+        walls = sorted(sample['wall_ms'] for sample in samples)
+        n = len(samples)
+
+        def percentile(p):
+            return walls[min(n - 1, int(n * p))]
+
+        histogram = [0] * len(LATENCY_BUCKETS)
+        for wall in walls:
+            histogram[next(i for i, bound in enumerate(LATENCY_BUCKETS) if wall <= bound)] += 1
+        return {
+            'name': name,
+            'requests': self.total,
+            'window': n,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'p99_ms': percentile(0.99),
+            'max_ms': walls[-1],
+            'total_ms': sum(walls),
+            'avg_queries': sum(sample['queries'] for sample in samples) / n,
+            'max_queries': max(sample['queries'] for sample in samples),
+            'avg_db_ms': sum(sample['db_ms'] for sample in samples) / n,
+            'avg_bytes': sum(sample['bytes'] or 0 for sample in samples) / n,
+            'n_plus_one': sum(1 for sample in samples if sample['duplicates']),
+            'histogram': histogram,
+            'last_duplicates': self.last_duplicates,
+        }
+
+
+class RequestStats:
+    """Rolling window of the last `window` requests per URL name."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, wall_ms, queries, db_ms, size, duplicates):
+        with self._lock:
+            route = self._routes.get(name)
+            if route is None:
+                route = self._routes[name] = RouteStats(self.window)
+            route.samples.append({
+                'wall_ms': wall_ms,
+                'queries': queries,
+                'db_ms': db_ms,
+                'bytes': size,
+                'duplicates': len(duplicates),
+            })
+            route.total += 1
+            if duplicates:
+                route.last_duplicates = duplicates[:3]
+
+    def snapshot(self):
+        """Per-route summaries, the routes spending the most time in total first."""
+        with self._lock:
+            summaries = [route.summary(name) for name, route in self._routes.items() if route.samples]
+        return sorted(summaries, key=lambda row: row['total_ms'], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+stats = RequestStats()
+
+
+def server_timing(wall_ms, queries, db_ms, duplicates):
+    metrics = [f'db;dur={db_ms:.1f};desc="{queries} queries"']
+    if duplicates:
+        metrics.append(f'dupq;desc="{len(duplicates)} repeated statements"')
+    metrics.append(f'app;dur={max(wall_ms - db_ms, 0):.1f}')
+    metrics.append(f'total;dur={wall_ms:.1f}')
+    return ', '.join(metrics)
+
+
+class RequestProfilerMiddleware:
+    """Keep this first in MIDDLEWARE so the timings cover the rest of the stack."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = QueryProfile()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - start) * 1000
+        db_ms = profile.duration * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        name = match.view_name if match is not None else UNRESOLVED
+        # streamed bodies (file downloads) are not buffered, so their size is unknown
+        size = None if response.streaming else len(response.content)
+        duplicates = profile.duplicates()
+        if duplicates:
+            sql, times = duplicates[0]
+            logger.warning('%s ran the same statement %d times: %s', name, times, sql)
+
+        stats.record(name, wall_ms, profile.count, db_ms, size, duplicates)
+        metrics.observe_request(name, request.method, response.status_code,
+                                wall_ms / 1000, profile.count, profile.duration)
+        if SERVER_TIMING:
+            response['Server-Timing'] = server_timing(wall_ms, profile.count, db_ms, duplicates)
+        return response
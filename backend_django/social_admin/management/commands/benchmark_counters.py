@@ -0,0 +1,131 @@
+import random
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.backends.signals import connection_created
+from social_admin import counters
+from social_admin.models import Like, Post, User
+
+
+BACKENDS = {
+    'direct': lambda options: counters.DirectCounters(),
+    'buffered': lambda options: counters.BufferedCounters(interval=options['interval'],
+                                                          max_pending=options['max_pending']),
+}
+
+
+class Command(BaseCommand):
+    help = ("Simulate a like storm on one post and compare the engagement counter backends: "
+            "transaction latency, UPDATEs on the post row and drift from a recount (DEBUG only)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taps', type=int, default=2000,
+                            help="Like/dislike toggles per backend")
+        parser.add_argument('--threads', type=int, default=16,
+                            help="Concurrent tappers, each with its own connection")
+        parser.add_argument('--users', type=int, default=200,
+                            help="Synthetic users reacting to the post")
+        parser.add_argument('--backend', action='append', choices=sorted(BACKENDS),
+                            help="Backend to run (repeatable; default: all)")
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help="BufferedCounters flush interval in seconds")
+        parser.add_argument('--max-pending', type=int, default=1000,
+                            help="BufferedCounters changes queued before a flush")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            raise CommandError("benchmark_counters writes synthetic rows and is only allowed with DEBUG = True")
+        if connection.vendor == 'sqlite':
+            raise CommandError("SQLite serializes every writer, so there is no row-lock contention to measure")
+
+        run = int(time.time())
+        users = User.objects.bulk_create([
+            User(email=f'storm-{run}-{i}@example.com', name=f'storm {i}')
+            for i in range(options['users'])
+        ])
+        try:
+            for name in options['backend'] or sorted(BACKENDS):
+                self.storm(name, BACKENDS[name](options), users, options)
+        finally:
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    def storm(self, name, backend, users, options):
+        post = Post.objects.create(title=f'storm {name}', postedby=users[0])
+        timings, post_updates, errors = [], [], []
+        lock = threading.Lock()
+        start = threading.Barrier(options['threads'])
+        per_thread = options['taps'] // options['threads']
+
+        def count_post_updates(execute, sql, params, many, context):
+            if sql.startswith('UPDATE') and Post._meta.db_table in sql:
+                with lock:
+                    post_updates.append(1)
+            return execute(sql, params, many, context)
+
+        def watch(sender, connection, **kwargs):
+            # tappers and flush timers each open their own connection
+            connection.execute_wrappers.append(count_post_updates)
+
+        def tapper(seed):
+            rnd = random.Random(seed)
+            mine = []
+            try:
+                start.wait()
+                for _ in range(per_thread):
+                    began = time.perf_counter()
+                    self.tap(backend, post.id, rnd.choice(users).id, rnd.choice(['like', 'dislike']))
+                    mine.append((time.perf_counter() - began) * 1000)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+                with lock:
+                    timings.extend(mine)
+
+        threads = [threading.Thread(target=tapper, args=(seed,)) for seed in range(options['threads'])]
+        connection_created.connect(watch)
+        try:
+            began = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            with connection.execute_wrapper(count_post_updates):
+                while backend.flush():
+                    pass
+        finally:
+            connection_created.disconnect(watch)
+        elapsed = time.perf_counter() - began
+        if errors:
+            raise CommandError(f"{name}: {len(errors)} tappers failed, first error: {errors[0]!r}")
+
+        post.refresh_from_db()
+        drift = (
+            post.likes_count - Like.objects.filter(post=post, type='like').count(),
+            post.dislikes_count - Like.objects.filter(post=post, type='dislike').count(),
+        )
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(self.style.SUCCESS(
+            f"{name}: {len(timings)} taps in {elapsed:.2f} s, transaction p50 {statistics.median(timings):.2f} ms, "
+            f"p99 {p99:.2f} ms, {len(post_updates)} post-row UPDATEs, drift likes/dislikes {drift}"
+        ))
+        post.delete()
+
+    def tap(self, backend, post_id, user_id, action):
+        # the shape of like_post: toggle the row, then hand the counter deltas to the backend
+        opposite = 'dislike' if action == 'like' else 'like'
+        deltas = {'like': 0, 'dislike': 0}
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    Like.objects.create(user_id=user_id, post_id=post_id, type=action)
+                deltas[action] = 1
+                deltas[opposite] = -Like.objects.filter(user_id=user_id, post_id=post_id, type=opposite).delete()[0]
+            except IntegrityError:
+                deltas[action] = -Like.objects.filter(user_id=user_id, post_id=post_id, type=action).delete()[0]
+            backend.add(post_id, likes=deltas['like'], dislikes=deltas['dislike'])
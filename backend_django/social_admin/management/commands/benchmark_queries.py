@@ -0,0 +1,127 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from social_admin import chat_state, feed
+from social_admin.models import Chat, ChatState, Comment, Community, Message, Notification, Post, Report, User
+
+
+class Command(BaseCommand):
+    help = "Print EXPLAIN plans and p50/p99 latencies for the hot API queries (optionally seeding test data first)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Create this many synthetic posts (plus users, comments, chats...) first; DEBUG only")
+        parser.add_argument('--runs', type=int, default=50,
+                            help="Executions per query for the latency percentiles")
+        parser.add_argument('--no-explain', action='store_true',
+                            help="Only print latencies")
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            if not settings.DEBUG:
+                raise CommandError("--seed writes synthetic rows and is only allowed with DEBUG = True")
+            self.seed(options['seed'])
+
+        for name, queryset in self.hot_queries():
+            timings = []
+            for _ in range(options['runs']):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: p50 {statistics.median(timings):.2f} ms, p99 {p99:.2f} ms"
+            ))
+            if not options['no_explain']:
+                self.stdout.write(queryset.explain())
+
+    def hot_queries(self):
+        # sample the busiest rows so the plans reflect the worst case
+        user = User.objects.order_by('-posts__id').first()
+        community = Community.objects.order_by('-members_count').first()
+        post = Post.objects.order_by('-comments_count').first()
+        chat = Chat.objects.order_by('-messages__id').first()
+        if not (user and community and post and chat):
+            raise CommandError("Not enough data to benchmark; run with --seed first")
+
+        listing = ('-created_at', '-id')
+        return [
+            ('home / recent posts', Post.objects.for_listing(user).filter(status='active').order_by(*listing)[:20]),
+            ('popular_posts', Post.objects.for_listing(user).filter(status='active')
+                .order_by('-popularity_score', '-id')[:20]),
+            ('community posts', Post.objects.for_listing(user).filter(community=community, status='active')
+                .order_by(*listing)[:20]),
+            ('profile posts', Post.objects.for_listing(user).filter(postedby=user, status='active')
+                .order_by(*listing)[:20]),
+            ('stream_posts', feed.feed_queryset(user).for_listing(user).order_by(*listing)[:20]),
+            ('post_comments', Comment.objects.filter(post=post, parent=None, is_visible=True)
+                .select_related('user').order_by(*listing)[:20]),
+            ('get_messages', Message.objects.filter(chat=chat).select_related('sender').order_by(*listing)[:50]),
+            ('mark_read', Message.objects.filter(chat=chat, is_read=False).exclude(sender=user).values('id')),
+            ('chats_view', ChatState.objects.filter(user=user).select_related('chat', 'last_message')
+                .order_by('-last_activity')[:50]),
+            ('notifications', Notification.objects.filter(recipient=user, unread=True).order_by('-created_at')[:20]),
+            ('reported_management', Report.objects.select_related('reported_by', 'content_type')
+                .filter(content_type__model__in=['post', 'comment']).order_by('-created_at')[:5]),
+        ]
+
+    def seed(self, posts):
+        rnd = random.Random(0)
+        run = int(time.time())
+        users = User.objects.bulk_create([
+            User(email=f'bench-{run}-{i}@example.com', name=f'bench {i}')
+            for i in range(max(10, posts // 50))
+        ])
+        communities = Community.objects.bulk_create([
+            Community(name=f'bench-{run}-{i}', creater=rnd.choice(users))
+            for i in range(max(2, posts // 500))
+        ])
+        Post.objects.bulk_create([
+            Post(title=f'post {i}', postedby=rnd.choice(users),
+                 community=rnd.choice(communities + [None]),
+                 status='active' if rnd.random() < 0.95 else 'hidden')
+            for i in range(posts)
+        ], batch_size=1000)
+        post_ids = list(Post.objects.filter(postedby__in=users).values_list('id', flat=True))
+
+        Community.members.through.objects.bulk_create([
+            Community.members.through(community_id=community.id, user_id=user.id)
+            for user in users for community in rnd.sample(communities, min(3, len(communities)))
+        ], batch_size=1000, ignore_conflicts=True)
+        for community in communities:
+            community.members_count = community.members.count()
+        Community.objects.bulk_update(communities, ['members_count'])
+        for user in users:
+            feed.rebuild_feed(user)
+        Comment.objects.bulk_create([
+            Comment(post_id=rnd.choice(post_ids), user=rnd.choice(users), text='bench')
+            for _ in range(posts * 3)
+        ], batch_size=1000)
+
+        chats = []
+        for i in range(max(2, len(users) // 2)):
+            pair = [users[i], users[-1 - i]]
+            chat = Chat.objects.create()
+            chat.participants.add(*pair)
+            chat_state.ensure_states(chat, pair)
+            chats.append((chat, pair))
+        Message.objects.bulk_create([
+            Message(chat=chat, sender=rnd.choice(pair), text='bench', is_read=rnd.random() < 0.8)
+            for chat, pair in chats for _ in range(posts // len(chats) or 1)
+        ], batch_size=1000)
+        Notification.objects.bulk_create([
+            Notification(recipient=rnd.choice(users), verb='liked your post', unread=rnd.random() < 0.5)
+            for _ in range(posts)
+        ], batch_size=1000)
+        post_type = ContentType.objects.get_for_model(Post)
+        Report.objects.bulk_create([
+            Report(content_type=post_type, object_id=post_id, reported_by=rnd.choice(users), reason='bench')
+            for post_id in rnd.sample(post_ids, min(len(post_ids), posts // 20))
+        ], batch_size=1000, ignore_conflicts=True)
+
+        self.stdout.write(self.style.SUCCESS(f"Seeded {posts} posts for {len(users)} users"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from social_admin import trending
+
+
+class Command(BaseCommand):
+    help = "Recompute the trending posts table from hourly engagement buckets (run from cron every few minutes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=trending.DEFAULT_WINDOW_HOURS,
+                            help="Engagement window in hours")
+        parser.add_argument('--limit', type=int, default=trending.DEFAULT_TOP_K,
+                            help="Number of ranked posts to keep")
+        parser.add_argument('--keep-hours', type=int, default=7 * 24,
+                            help="Delete engagement buckets older than this")
+
+    def handle(self, *args, **options):
+        ranked = trending.rebuild_trending(hours=options['hours'], top_k=options['limit'])
+        pruned = trending.prune_buckets(max(options['keep_hours'], options['hours']))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Ranked {len(ranked)} trending posts, pruned {pruned} old buckets"
+        ))
@@ -0,0 +1,24 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from social_admin import storage
+
+
+class Command(BaseCommand):
+    help = "Move existing media into the content-addressed store, merging duplicates, and recount blob references"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=1,
+                            help="Leave blobs and files touched in the last N hours alone")
+        parser.add_argument('--recount-only', action='store_true',
+                            help="Only repair reference counts and remove unreferenced blobs")
+
+    def handle(self, *args, **options):
+        if not hasattr(default_storage, 'adopt'):
+            raise CommandError("STORAGES['default'] is not social_admin.storage.ContentAddressedStorage")
+
+        if not options['recount_only']:
+            moved, blobs = storage.dedupe_existing()
+            self.stdout.write(f"Moved {moved} files into {blobs} blobs")
+        kept, removed = storage.recount(options['hours'])
+
+        self.stdout.write(self.style.SUCCESS(f"{kept} blobs in use, {removed} unreferenced files removed"))
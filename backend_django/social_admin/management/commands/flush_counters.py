@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from social_admin import counters
+
+
+class Command(BaseCommand):
+    help = "Write buffered engagement counter deltas to the posts table (for the RedisCounters backend, run from cron)"
+
+    def handle(self, *args, **options):
+        flushed = 0
+        while True:
+            batch = counters.get_counters().flush()
+            if not batch:
+                break
+            flushed += batch
+
+        self.stdout.write(self.style.SUCCESS(f"Flushed counters for {flushed} posts"))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from social_admin import media
+from social_admin.models import Post, User
+
+
+class Command(BaseCommand):
+    help = "Process uploads the media pipeline has not finished (after a restart), or backfill all of them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Also reprocess uploads that are already done or failed (backfill)")
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(media_file='').exclude(media_file=None)
+        users = User.objects.exclude(profile_pic='').exclude(profile_pic=None)
+        if not options['all']:
+            posts = posts.filter(media_status='pending')
+            users = users.filter(profile_pic_renditions=[])
+
+        post_ids = list(posts.values_list('id', flat=True))
+        for post_id in post_ids:
+            media.process_post(post_id)
+        user_ids = list(users.values_list('id', flat=True))
+        for user_id in user_ids:
+            media.process_profile_pic(user_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed media of {len(post_ids)} posts and {len(user_ids)} profile pictures"
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from social_admin import uploads
+
+
+class Command(BaseCommand):
+    help = "Delete chunked uploads that were abandoned or already attached to a post (run from cron hourly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=uploads.EXPIRE_HOURS,
+                            help="Only touch uploads idle for at least this many hours")
+
+    def handle(self, *args, **options):
+        abandoned = uploads.purge(options['hours'])
+
+        self.stdout.write(self.style.SUCCESS(f"Deleted {abandoned} abandoned uploads"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from social_admin import feed
+from social_admin.models import FeedEntry, User
+
+
+class Command(BaseCommand):
+    help = "Rebuild every user's stream inbox from follows/memberships, or only trim oversized inboxes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trim-only', action='store_true',
+                            help="Only cut inboxes down to FEED_MAX_ENTRIES")
+
+    def handle(self, *args, **options):
+        if options['trim_only']:
+            oversized = list(
+                FeedEntry.objects.values('user_id')
+                .annotate(total=Count('id'))
+                .filter(total__gt=feed.MAX_ENTRIES)
+                .values_list('user_id', flat=True)
+            )
+            removed = sum(feed.trim_feed(user_id) for user_id in oversized)
+            self.stdout.write(self.style.SUCCESS(f"Trimmed {removed} feed entries"))
+            return
+
+        count = 0
+        for user in User.objects.filter(is_active=True).iterator():
+            feed.rebuild_feed(user)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt feeds for {count} users"))
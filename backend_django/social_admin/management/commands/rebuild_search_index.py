@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from social_admin import search
+from social_admin.models import SearchDocument
+
+
+class Command(BaseCommand):
+    help = "Rebuild the search index for posts, communities, users and comments (migration 0020 builds it; use this to repair it or after changing SEARCH_BACKEND)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=list(search.MODELS), action='append',
+                            help="Only reindex this kind (repeatable)")
+
+    def handle(self, *args, **options):
+        kinds = options['kind'] or list(search.MODELS)
+        for kind in kinds:
+            model = search.MODELS[kind]
+            # drop documents whose object no longer exists, then reindex the rest
+            SearchDocument.objects.filter(kind=kind).exclude(
+                object_id__in=model.objects.values('pk')
+            ).delete()
+            count = 0
+            for obj in model.objects.iterator():
+                search.index_object(kind, obj)
+                count += 1
+            self.stdout.write(self.style.SUCCESS(f"Indexed {count} {kind} documents"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from social_admin import counters, popularity
+
+
+class Command(BaseCommand):
+    help = "Recompute post like/dislike/comment counters and popularity scores from the Like and Comment tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Posts read and rewritten per batch")
+
+    def handle(self, *args, **options):
+        # write out anything still buffered so it isn't counted as drift
+        flushed = 0
+        while True:
+            batch = counters.get_counters().flush()
+            if not batch:
+                break
+            flushed += batch
+        fixed = popularity.reconcile(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Flushed {flushed} buffered posts, corrected {fixed} drifted posts"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from social_admin import site_stats
+
+
+class Command(BaseCommand):
+    help = "Recount the admin dashboard totals and rebuild the daily series (run nightly from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2,
+                            help="Rebuild the daily series for this many recent days; 0 rebuilds all history")
+
+    def handle(self, *args, **options):
+        totals = site_stats.rollup(days=options['days'] or None)
+
+        summary = ', '.join(f"{name} {value}" for name, value in totals.items())
+        self.stdout.write(self.style.SUCCESS(f"Site stats rolled up: {summary}"))
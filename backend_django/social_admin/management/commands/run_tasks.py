@@ -0,0 +1,32 @@
+import signal
+
+from django.core.management.base import BaseCommand
+from social_admin import tasks
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (keep running under a process supervisor; --once drains the queue and exits)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=10, help="Tasks claimed per round trip")
+        parser.add_argument('--sleep', type=float, default=1.0, help="Seconds to wait when nothing is due")
+        parser.add_argument('--once', action='store_true', help="Exit once no task is due")
+
+    def handle(self, *args, **options):
+        stopping = []
+
+        def stop(signum, frame):
+            # finish the task in hand, then exit
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        succeeded, failed = tasks.work(
+            batch=options['batch'],
+            idle_sleep=options['sleep'],
+            once=options['once'],
+            should_stop=lambda: bool(stopping),
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"Ran {succeeded} tasks, {failed} failed"))
@@ -0,0 +1,414 @@
+# Upload processing. The request thread only sniffs the real type of an upload
+# from its first bytes; everything expensive (decoding, metadata stripping,
+# resized WebP/JPEG renditions, video poster frames) runs on the
+# MEDIA_PIPELINE runner after the transaction commits. Results are recorded on
+# Post.media_* and User.profile_pic_renditions. `manage.py process_media`
+# picks up rows left pending by a restart and backfills older uploads.
+import hashlib
+import io
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Post, User
+from .storage import BLOB_PREFIX
+
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = getattr(settings, 'MEDIA_RENDITION_WIDTHS', (320, 640, 1080))
+AVATAR_SIZES = getattr(settings, 'MEDIA_AVATAR_SIZES', (64, 160, 400))
+# the variant feeds show when a client does not choose from the renditions itself
+PREVIEW_WIDTH = getattr(settings, 'MEDIA_PREVIEW_WIDTH', 640)
+AVATAR_PREVIEW_SIZE = 160
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+SNIFF_BYTES = 32
+# renditions are named <stem>-<size>.<hash>.<ext>, so they can be cached forever
+HASH_LENGTH = 12
+
+# formats whose originals are rewritten without metadata, with their file extensions
+STRIPPABLE_FORMATS = {
+    'JPEG': ('.jpg', '.jpeg'),
+    'PNG': ('.png',),
+    'WEBP': ('.webp',),
+}
+
+# (offset, magic, mime); checked in order
+SIGNATURES = (
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (8, b'WEBP', 'image/webp'),
+    (8, b'AVI ', 'video/x-msvideo'),
+    (0, b'\x1aE\xdf\xa3', 'video/webm'),
+    (0, b'OggS', 'video/ogg'),
+)
+# ISO base media files (MP4, MOV, HEIC...) name their brand after 'ftyp'
+FTYP_BRANDS = {
+    b'qt  ': 'video/quicktime',
+    b'heic': 'image/heic',
+    b'heix': 'image/heic',
+    b'mif1': 'image/heif',
+    b'avif': 'image/avif',
+}
+
+
+def sniff_mime(upload):
+    """MIME type from the file's leading bytes, ignoring its name and the client's Content-Type."""
+    position = upload.tell() if hasattr(upload, 'tell') else 0
+    upload.seek(0)
+    head = upload.read(SNIFF_BYTES)
+    upload.seek(position)
+
+    for offset, magic, mime in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return mime
+    if head[4:8] == b'ftyp':
+        return FTYP_BRANDS.get(head[8:12], 'video/mp4')
+    return 'application/octet-stream'
+
+
+def media_type_for(mime):
+    kind = mime.split('/', 1)[0]
+    return kind if kind in ('image', 'video') else 'none'
+
+
+def sniff(upload):
+    """(mime, Post.media_type) for an uploaded file."""
+    mime = sniff_mime(upload)
+    return mime, media_type_for(mime)
+
+
+# ---------------------------------------------------------------------------
+# Runners: where processing jobs execute
+# ---------------------------------------------------------------------------
+
+class ImmediateRunner:
+    """Runs jobs inline; for tests and management commands."""
+
+    def __init__(self, **options):
+        pass
+
+    def submit(self, func, *args):
+        func(*args)
+
+
+class ThreadPoolRunner:
+    """A few background threads in each web process, so requests never wait on image work."""
+
+    def __init__(self, workers=2, **options):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='media')
+
+    def submit(self, func, *args):
+        self._executor.submit(self._run, func, *args)
+
+    @staticmethod
+    def _run(func, *args):
+        try:
+            func(*args)
+        except Exception:
+            logger.exception('media job %s%r failed', func.__name__, args)
+        finally:
+            # pool threads get their own DB connection; don't leak it
+            connection.close()
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            config = getattr(settings, 'MEDIA_PIPELINE', {})
+            backend = import_string(config.get('BACKEND', 'social_admin.media.ThreadPoolRunner'))
+            _runner = backend(**config.get('OPTIONS', {}))
+    return _runner
+
+
+def schedule(func, *args):
+    # the job reads the row back, so it must not start before the upload is committed
+    transaction.on_commit(lambda: get_runner().submit(func, *args))
+
+
+def process_post_later(post):
+    if post.media_file and post.media_status == 'pending':
+        schedule(process_post, post.pk)
+
+
+def process_profile_pic_later(user):
+    if user.profile_pic:
+        schedule(process_profile_pic, user.pk)
+
+
+def discard_renditions_later(renditions):
+    """Delete the renditions of an upload that is being replaced, once the replacement is committed."""
+    if renditions:
+        transaction.on_commit(lambda: _delete_renditions(renditions))
+
+
+# ---------------------------------------------------------------------------
+# Jobs
+# ---------------------------------------------------------------------------
+
+def process_post(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.media_file:
+        return
+    source = post.media_file.name
+    try:
+        with default_storage.open(source, 'rb') as handle:
+            mime = sniff_mime(handle)
+        media_type = media_type_for(mime)
+        if media_type == 'image':
+            name, width, height, renditions = _process_image(source, 'posts', post.pk, RENDITION_WIDTHS)
+        elif media_type == 'video':
+            name, width, height, renditions = _process_video(source, post.pk)
+        else:
+            name, width, height, renditions = source, None, None, []
+        status = 'ready'
+    except Exception:
+        logger.exception('could not process media of post %s', post_id)
+        mime, media_type, name, width, height, renditions, status = (
+            post.media_mime, post.media_type, source, None, None, [], 'failed')
+
+    # the author may have replaced the file while we worked; that upload has its own job
+    if Post.objects.filter(pk=post_id, media_file=source).exists():
+        old = post.media_renditions
+        post.media_file.name = name
+        post.media_mime, post.media_type = mime, media_type
+        post.media_width, post.media_height = width, height
+        post.media_renditions, post.media_status = renditions, status
+        post.save(update_fields=['media_file', 'media_mime', 'media_type', 'media_width', 'media_height',
+                                 'media_renditions', 'media_status'])
+        # saving the new name released the original (social_admin.storage)
+        _delete_renditions(old, keep=renditions)
+    else:
+        _discard(name, source, renditions)
+
+
+def process_profile_pic(user_id):
+    user = User.objects.filter(pk=user_id).first()
+    if user is None or not user.profile_pic:
+        return
+    source = user.profile_pic.name
+    try:
+        name, _, _, renditions = _process_image(source, 'users', user.pk, AVATAR_SIZES, square=True)
+    except Exception:
+        logger.exception('could not process profile picture of user %s', user_id)
+        return
+
+    if User.objects.filter(pk=user_id, profile_pic=source).exists():
+        old = user.profile_pic_renditions
+        user.profile_pic.name = name
+        user.profile_pic_renditions = renditions
+        user.save(update_fields=['profile_pic', 'profile_pic_renditions'])
+        _delete_renditions(old, keep=renditions)
+    else:
+        _discard(name, source, renditions)
+
+
+# ---------------------------------------------------------------------------
+# Images
+# ---------------------------------------------------------------------------
+
+def _process_image(source, folder, pk, widths, square=False, strip=True):
+    """
+    Write the renditions and, when the original carries metadata, a stripped
+    copy of it (rotated upright first) under a new name.
+    Returns (original name, width, height, renditions).
+    """
+    with default_storage.open(source, 'rb') as handle:
+        data = handle.read()
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except UnidentifiedImageError:
+        raise ValueError(f'{source} is not an image Pillow can decode')
+    # animated GIF/WebP/APNG are served as uploaded: re-encoding or resizing would keep only the first frame
+    if getattr(image, 'is_animated', False):
+        return source, image.width, image.height, []
+
+    original_format = image.format
+    has_metadata = bool(image.info.get('exif') or image.info.get('xmp') or image.getexif())
+    upright = ImageOps.exif_transpose(image)
+
+    name = source
+    extensions = STRIPPABLE_FORMATS.get(original_format)
+    if strip and extensions:
+        stem, ext = os.path.splitext(source)
+        content = None
+        if has_metadata:
+            content = _encode(upright, original_format, quality=95)
+        elif ext.lower() not in extensions:
+            content = data
+        if content is not None:
+            # a new file named for its real format; the original keeps being served until the row points here
+            name = default_storage.save(stem + extensions[0], ContentFile(content))
+
+    stem = os.path.splitext(os.path.basename(source))[0]
+    renditions = []
+    for target in _targets(upright.size, widths, square):
+        if square:
+            variant = ImageOps.fit(upright, (target, target), Image.LANCZOS)
+        else:
+            variant = upright.resize((target, max(1, round(target * upright.height / upright.width))), Image.LANCZOS)
+        for fmt, ext in (('WEBP', 'webp'), ('JPEG', 'jpg')):
+            content = _encode(variant, fmt)
+            rendition = default_storage.save(
+                f'renditions/{folder}/{pk}/{stem}-{target}.{content_hash(content)}.{ext}', ContentFile(content))
+            renditions.append({
+                'name': rendition,
+                'width': variant.width,
+                'height': variant.height,
+                'format': ext,
+                'kind': 'image',
+            })
+    return name, upright.width, upright.height, renditions
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+
+
+def _targets(size, widths, square):
+    """Rendition widths below the original's; never upscale, but always produce the smallest one."""
+    limit = min(size) if square else size[0]
+    targets = [width for width in widths if width < limit]
+    return targets or [min(limit, widths[0])]
+
+
+def _encode(image, fmt, quality=None):
+    output = io.BytesIO()
+    options = {'icc_profile': image.info.get('icc_profile')}  # color, not metadata
+    if fmt == 'JPEG':
+        if image.mode != 'RGB':
+            image = _flatten(image)
+        options.update(quality=quality or JPEG_QUALITY, optimize=True, progressive=True)
+    elif fmt == 'WEBP':
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        options.update(quality=quality or WEBP_QUALITY, method=4)
+    image.save(output, fmt, **{key: value for key, value in options.items() if value is not None})
+    return output.getvalue()
+
+
+def _flatten(image):
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _discard(original, current, renditions):
+    """Delete the output of a job whose upload was replaced meanwhile: `original` unless it is still `current`, and its renditions."""
+    if original != current:
+        default_storage.delete(original)
+    _delete_renditions(renditions)
+
+
+def _delete_renditions(renditions, keep=()):
+    kept = {rendition['name'] for rendition in keep}
+    for rendition in renditions:
+        # re-encoding the same image gives the same blob, and saving it took a second
+        # reference: give back the old one. Other names in `keep` are the new files themselves.
+        if rendition['name'] not in kept or rendition['name'].startswith(BLOB_PREFIX):
+            default_storage.delete(rendition['name'])
+
+
+# ---------------------------------------------------------------------------
+# Videos (needs ffmpeg on PATH; without it videos are served untouched)
+# ---------------------------------------------------------------------------
+
+def _process_video(source, pk):
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        logger.warning('ffmpeg not found; skipping poster frame for %s', source)
+        return source, None, None, []
+
+    with tempfile.TemporaryDirectory() as workdir:
+        local = _local_copy(source, workdir)
+        ext = os.path.splitext(source)[1] or '.mp4'
+
+        # drop metadata (location, device...) and move the index to the front so playback starts early
+        stripped = os.path.join(workdir, 'stripped' + ext)
+        name = source
+        if _ffmpeg(ffmpeg, '-i', local, '-map', '0', '-map_metadata', '-1', '-c', 'copy',
+                   '-movflags', '+faststart', stripped):
+            with open(stripped, 'rb') as handle:
+                name = default_storage.save(source, File(handle))
+            local = stripped
+
+        poster = os.path.join(workdir, 'poster.png')
+        # one second in skips black lead-in frames; very short clips fall back to the first frame
+        if not (_ffmpeg(ffmpeg, '-ss', '1', '-i', local, '-frames:v', '1', poster)
+                or _ffmpeg(ffmpeg, '-i', local, '-frames:v', '1', poster)):
+            return name, None, None, []
+
+        stem = os.path.splitext(os.path.basename(source))[0]
+        with open(poster, 'rb') as handle:
+            poster_name = default_storage.save(f'renditions/posts/{pk}/{stem}-poster.png', File(handle))
+        try:
+            _, width, height, renditions = _process_image(poster_name, 'posts', pk, RENDITION_WIDTHS, strip=False)
+        finally:
+            default_storage.delete(poster_name)
+    for rendition in renditions:
+        rendition['kind'] = 'poster'
+    return name, width, height, renditions
+
+
+def _local_copy(name, workdir):
+    try:
+        return default_storage.path(name)
+    except NotImplementedError:  # remote storage
+        local = os.path.join(workdir, 'source' + os.path.splitext(name)[1])
+        with default_storage.open(name, 'rb') as src, open(local, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        return local
+
+
+def _ffmpeg(ffmpeg, *args):
+    result = subprocess.run([ffmpeg, '-v', 'error', '-y', *args], capture_output=True, timeout=300)
+    return result.returncode == 0
+
+
+# ---------------------------------------------------------------------------
+# Choosing a variant for serializers
+# ---------------------------------------------------------------------------
+
+def pick(renditions, width, kind='image', fmt='webp'):
+    """Name of the smallest `fmt` rendition at least `width` wide (else the largest), or None."""
+    candidates = sorted(
+        (r for r in renditions if r.get('kind', 'image') == kind and r['format'] == fmt),
+        key=lambda r: r['width'],
+    )
+    for rendition in candidates:
+        if rendition['width'] >= width:
+            return rendition['name']
+    return candidates[-1]['name'] if candidates else None
+
+
+def url(name):
+    return default_storage.url(name) if name else None
+
+
+def rendition_urls(renditions):
+    return [
+        {'url': url(r['name']), 'width': r['width'], 'height': r['height'],
+         'format': r['format'], 'kind': r.get('kind', 'image')}
+        for r in renditions
+    ]
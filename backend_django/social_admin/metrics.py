@@ -0,0 +1,186 @@
+# Prometheus metrics, served at /metrics. Request counters and latency
+# histograms are labelled with the URL name from urls.py (never the raw path,
+# which would explode the series count); the app also counts messages, likes,
+# comments, response cache lookups and DB connections, and reads queue depths
+# and database server stats when scraped.
+#
+# Several worker processes (gunicorn, uvicorn --workers) share their numbers
+# through METRICS_MULTIPROC_DIR: each process writes its own memory-mapped
+# files there and a scrape served by any worker sums them all. Empty the
+# directory when the server starts, and call mark_process_dead(worker.pid)
+# from gunicorn's child_exit hook.
+#
+# prometheus_client is optional: without it nothing is recorded and /metrics
+# answers 503.
+import os
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR') or getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+if MULTIPROC_DIR:
+    # prometheus_client picks its value storage when it is first imported
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = MULTIPROC_DIR
+    os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:  # optional dependency
+    prometheus_client = None
+
+
+UNRESOLVED = '<unresolved>'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, float('inf'))
+
+# MySQL status variables exported as social_db_server_threads{state}
+MYSQL_THREAD_STATUS = {
+    'Threads_connected': 'connected',
+    'Threads_running': 'running',
+    'Threads_cached': 'cached',
+}
+
+
+if prometheus_client is not None:
+    REQUESTS = prometheus_client.Counter(
+        'social_http_requests', 'HTTP requests handled, by URL name', ['view', 'method', 'status'])
+    REQUEST_LATENCY = prometheus_client.Histogram(
+        'social_http_request_duration_seconds', 'Wall time per request, by URL name', ['view'],
+        buckets=LATENCY_BUCKETS)
+    REQUEST_QUERIES = prometheus_client.Histogram(
+        'social_http_request_db_queries', 'Database queries per request, by URL name', ['view'],
+        buckets=QUERY_COUNT_BUCKETS)
+    DB_TIME = prometheus_client.Counter(
+        'social_db_query_seconds', 'Time spent in database queries, by URL name', ['view'])
+    DB_CONNECTIONS = prometheus_client.Counter(
+        'social_db_connections_opened', 'New database connections, by alias', ['alias'])
+    CACHE_LOOKUPS = prometheus_client.Counter(
+        'social_response_cache_lookups', 'Response cache lookups, by endpoint and hit/miss', ['view', 'result'])
+    MESSAGES_SENT = prometheus_client.Counter(
+        'social_messages_sent', 'Chat messages sent')
+    REACTIONS = prometheus_client.Counter(
+        'social_reactions', 'Likes and dislikes added to posts', ['reaction'])
+    COMMENTS = prometheus_client.Counter(
+        'social_comments', 'Comments and replies added')
+    BUFFERED_DELTAS = prometheus_client.Gauge(
+        'social_buffered_engagement_posts', 'Posts with counter deltas waiting in a worker buffer',
+        multiprocess_mode='livesum')
+
+
+def enabled():
+    return prometheus_client is not None
+
+
+def observe_request(view, method, status, seconds, queries, db_seconds):
+    if prometheus_client is None:
+        return
+    view = view or UNRESOLVED
+    REQUESTS.labels(view, method, str(status)).inc()
+    REQUEST_LATENCY.labels(view).observe(seconds)
+    REQUEST_QUERIES.labels(view).observe(queries)
+    DB_TIME.labels(view).inc(db_seconds)
+
+
+def cache_lookup(view, hit):
+    if prometheus_client is not None:
+        CACHE_LOOKUPS.labels(view, 'hit' if hit else 'miss').inc()
+
+
+def message_sent():
+    if prometheus_client is not None:
+        MESSAGES_SENT.inc()
+
+
+def reactions_added(likes=0, dislikes=0):
+    if prometheus_client is None:
+        return
+    if likes > 0:
+        REACTIONS.labels('like').inc(likes)
+    if dislikes > 0:
+        REACTIONS.labels('dislike').inc(dislikes)
+
+
+def comments_added(count=1):
+    if prometheus_client is not None and count > 0:
+        COMMENTS.inc(count)
+
+
+def buffered_posts(count):
+    if prometheus_client is not None:
+        BUFFERED_DELTAS.set(count)
+
+
+def mark_process_dead(pid):
+    """Drop a dead worker's live gauges; counters and histograms keep its totals."""
+    if prometheus_client is not None and MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
+
+
+def _connection_opened(sender, connection, **kwargs):
+    if prometheus_client is not None:
+        DB_CONNECTIONS.labels(connection.alias).inc()
+
+
+def connect_signals():
+    connection_created.connect(_connection_opened, dispatch_uid='metrics-connection-created')
+
+
+# ---------------------------------------------------------------------------
+# Values read when scraped: they live outside the worker processes (Redis,
+# the database server), so any worker can report them.
+# ---------------------------------------------------------------------------
+
+def queue_depths():
+    from . import counters, tasks
+
+    depths = {'tasks': tasks.depth()}
+    backend = counters.get_counters()
+    if hasattr(backend, 'backlog'):
+        depths['engagement_counters'] = backend.backlog()
+    return depths
+
+
+def mysql_threads():
+    connection = connections['default']
+    if connection.vendor != 'mysql':
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Threads%'")
+        rows = cursor.fetchall()
+    return {MYSQL_THREAD_STATUS[name]: float(value) for name, value in rows if name in MYSQL_THREAD_STATUS}
+
+
+class ScrapeTimeCollector:
+    def describe(self):
+        # nothing to check for name clashes; keeps registration from querying anything
+        return []
+
+    def collect(self):
+        depth = GaugeMetricFamily('social_queue_depth', 'Items waiting in background queues', labels=['queue'])
+        for queue, value in queue_depths().items():
+            depth.add_metric([queue], value)
+        yield depth
+
+        threads = GaugeMetricFamily('social_db_server_threads', 'Database server threads by state', labels=['state'])
+        for state, value in mysql_threads().items():
+            threads.add_metric([state], value)
+        yield threads
+
+
+if prometheus_client is not None and not MULTIPROC_DIR:
+    prometheus_client.REGISTRY.register(ScrapeTimeCollector())
+
+
+def render():
+    """(body, content type) of the exposition for one scrape."""
+    if MULTIPROC_DIR:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(ScrapeTimeCollector())
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
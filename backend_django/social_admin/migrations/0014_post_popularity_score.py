@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-18 09:05
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_scores(apps, schema_editor):
+    Post = apps.get_model('social_admin', 'Post')
+
+    posts = Post.objects.annotate(
+        likes_total=Count('likes', filter=Q(likes__type='like'), distinct=True),
+        dislikes_total=Count('likes', filter=Q(likes__type='dislike'), distinct=True),
+        comments_total=Count('comments', distinct=True),
+        members_total=Count('community__members', distinct=True),
+    )
+    for post in posts.iterator():
+        post.likes_count = post.likes_total
+        post.dislikes_count = post.dislikes_total
+        post.comments_count = post.comments_total
+        post.popularity_score = (
+            post.likes_total + post.comments_total * 2 - post.dislikes_total
+            + int(post.members_total / 100)
+        )
+        post.save(update_fields=['likes_count', 'dislikes_count', 'comments_count', 'popularity_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_admin', '0013_comment_is_visible'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='dislikes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='popularity_score',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', '-popularity_score', '-id'], name='post_status_popularity_idx'),
+        ),
+    ]
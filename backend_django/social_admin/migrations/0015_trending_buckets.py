@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 09:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_admin', '0014_post_popularity_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0)),
+                ('engagement', models.IntegerField(default=0)),
+                ('hours_since', models.FloatField(default=1)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trending', to='social_admin.post')),
+            ],
+            options={
+                'ordering': ['-score'],
+                'indexes': [models.Index(fields=['-score', 'post'], name='trending_score_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostEngagementBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('likes', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='engagement_buckets', to='social_admin.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='engagement_bucket_hour_idx')],
+                'unique_together': {('post', 'hour')},
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2 on 2026-10-18 09:07
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+import django.db.models.deletion
+
+
+# frozen copies of feed.MAX_ENTRIES / feed.FANOUT_MAX_MEMBERS defaults
+MAX_ENTRIES = 500
+FANOUT_MAX_MEMBERS = 5000
+BATCH_SIZE = 5000
+
+
+def backfill_inboxes(apps, schema_editor):
+    # what feed.rebuild_feed does for every user, so stream_posts has content right after migrate
+    User = apps.get_model('social_admin', 'User')
+    Community = apps.get_model('social_admin', 'Community')
+    Post = apps.get_model('social_admin', 'Post')
+    FeedEntry = apps.get_model('social_admin', 'FeedEntry')
+
+    large = set(
+        Community.objects.annotate(total=Count('members')).filter(total__gt=FANOUT_MAX_MEMBERS)
+        .values_list('id', flat=True)
+    )
+    entries = []
+    for user in User.objects.iterator():
+        communities = [pk for pk in user.communities_joined.values_list('id', flat=True) if pk not in large]
+        posts = (
+            Post.objects.filter(Q(community_id__in=communities) | Q(postedby__in=user.following.all()),
+                                status='active')
+            .order_by('-created_at')
+            .values_list('id', 'created_at')[:MAX_ENTRIES]
+        )
+        entries.extend(FeedEntry(user_id=user.id, post_id=post_id, created_at=created_at)
+                       for post_id, created_at in posts)
+        if len(entries) >= BATCH_SIZE:
+            FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+            entries = []
+    FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_admin', '0015_trending_buckets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='social_admin.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created_at', '-post'], name='feed_user_created_idx')],
+                'unique_together': {('user', 'post')},
+            },
+        ),
+        migrations.RunPython(backfill_inboxes, migrations.RunPython.noop),
+    ]
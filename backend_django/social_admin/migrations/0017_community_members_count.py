@@ -0,0 +1,30 @@
+# Generated by Django 4.2 on 2026-10-18 09:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_members_count(apps, schema_editor):
+    Community = apps.get_model('social_admin', 'Community')
+    for community in Community.objects.annotate(total=Count('members')).iterator():
+        Community.objects.filter(id=community.id).update(members_count=community.total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_admin', '0016_feed_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='community',
+            name='members_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_members_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='community',
+            index=models.Index(fields=['-members_count', '-id'], name='community_members_count_idx'),
+        ),
+    ]
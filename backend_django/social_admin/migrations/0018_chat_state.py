@@ -0,0 +1,52 @@
+# Generated by Django 4.2 on 2026-10-18 09:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_chat_states(apps, schema_editor):
+    Chat = apps.get_model('social_admin', 'Chat')
+    ChatState = apps.get_model('social_admin', 'ChatState')
+    Message = apps.get_model('social_admin', 'Message')
+
+    for chat in Chat.objects.prefetch_related('participants').iterator(chunk_size=500):
+        last_message = Message.objects.filter(chat_id=chat.id).order_by('-created_at', '-id').first()
+        states = []
+        for user in chat.participants.all():
+            unread = Message.objects.filter(chat_id=chat.id, is_read=False).exclude(sender_id=user.id).count()
+            states.append(ChatState(
+                chat_id=chat.id,
+                user_id=user.id,
+                unread_count=unread,
+                last_message=last_message,
+                last_activity=last_message.created_at if last_message else chat.created_at,
+            ))
+        ChatState.objects.bulk_create(states)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_admin', '0017_community_members_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_activity', models.DateTimeField()),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='states', to='social_admin.chat')),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='social_admin.message')),
+                ('last_read_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='social_admin.message')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-last_activity'], name='chatstate_user_activity_idx')],
+                'unique_together': {('chat', 'user')},
+            },
+        ),
+        migrations.RunPython(backfill_chat_states, migrations.RunPython.noop),
+    ]
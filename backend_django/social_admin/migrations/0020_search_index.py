@@ -0,0 +1,113 @@
+# Generated by Django 4.2 on 2026-10-18 10:45
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# frozen copies of social_admin.search.FIELDS and is_public() as of this migration
+INDEXED = {
+    'post': ('Post', (('title', 3), ('caption', 1)), lambda obj: obj.status == 'active'),
+    'community': ('Community', (('name', 3), ('description', 1)), lambda obj: True),
+    'user': ('User', (('name', 3), ('email', 2)), lambda obj: obj.is_active and not obj.is_admin),
+    'comment': ('Comment', (('text', 1),), lambda obj: obj.is_visible),
+}
+BATCH_SIZE = 500
+
+
+def tokenize(text):
+    return [token[:40] for token in re.findall(r'\w+', (text or '').lower()) if len(token) >= 2]
+
+
+def backfill_documents(apps, schema_editor):
+    SearchDocument = apps.get_model('social_admin', 'SearchDocument')
+    SearchToken = apps.get_model('social_admin', 'SearchToken')
+    backend = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    fulltext = backend == 'fulltext' or (backend == 'auto' and schema_editor.connection.vendor == 'mysql')
+
+    def index(kind, fields, public, objects):
+        documents, weights = [], {}
+        for obj in objects:
+            body = []
+            weights[obj.pk] = {}
+            for field, weight in fields:
+                value = getattr(obj, field) or ''
+                body.extend([value] * weight)
+                for token in tokenize(value):
+                    weights[obj.pk][token] = weights[obj.pk].get(token, 0) + weight
+            documents.append(SearchDocument(kind=kind, object_id=obj.pk, body='\n'.join(body), is_public=public(obj)))
+        SearchDocument.objects.bulk_create(documents)
+        if fulltext:
+            return
+        # bulk_create does not return ids on every backend; read them back
+        ids = SearchDocument.objects.filter(kind=kind, object_id__in=list(weights)).values_list('object_id', 'id')
+        SearchToken.objects.bulk_create([
+            SearchToken(document_id=document_id, token=token, weight=weight)
+            for object_id, document_id in ids
+            for token, weight in weights[object_id].items()
+        ])
+
+    for kind, (model_name, fields, public) in INDEXED.items():
+        model = apps.get_model('social_admin', model_name)
+        batch = []
+        for obj in model.objects.order_by('pk').iterator(chunk_size=BATCH_SIZE):
+            batch.append(obj)
+            if len(batch) == BATCH_SIZE:
+                index(kind, fields, public, batch)
+                batch = []
+        if batch:
+            index(kind, fields, public, batch)
+
+
+def add_fulltext_index(apps, schema_editor):
+    # MySQL answers searches with MATCH ... AGAINST; other backends use SearchToken
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX search_document_body_ft ON social_admin_searchdocument (body)'
+        )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX search_document_body_ft ON social_admin_searchdocument')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social_admin', '0019_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('post', 'Post'), ('community', 'Community'), ('user', 'User'), ('comment', 'Comment')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('body', models.TextField()),
+                ('is_public', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=40)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='social_admin.searchdocument')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'document'], name='search_token_idx')],
+                'unique_together': {('document', 'token')},
+            },
+        ),
+        migrations.RunPython(add_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,12 @@
+import uuid
+
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager 
 from django.db import models 
+from django.db.models import Exists, OuterRef
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.utils import timezone
 
 class UserManager(BaseUserManager): 
       def create_user(self, email, password=None): 
@@ -26,6 +30,8 @@ class User(AbstractBaseUser):
     name = models.CharField(max_length =255) 
     bio = models.TextField(null=True, blank=True)
     profile_pic = models.ImageField( upload_to='profile_pics/',null=True, blank=True)
+    # Square avatar sizes written by social_admin.media: [{'name', 'width', 'height', 'format'}, ...]
+    profile_pic_renditions = models.JSONField(default=list, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True) 
     is_admin = models.BooleanField(default=False) 
@@ -42,8 +48,15 @@ class Community(models.Model):
     thumbnail = models.ImageField(upload_to='community_thumbnails/',null=True,blank=True)
     creater = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.CASCADE,related_name='communities_created')
     members = models.ManyToManyField(settings.AUTH_USER_MODEL,related_name='communities_joined',blank=True)
+    # Denormalized members.count(), updated wherever members are added or removed
+    members_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-members_count', '-id'], name='community_members_count_idx'),
+        ]
+
 
 class CommunityMembership(models.Model):
     ROLE_CHOICES = (
@@ -61,6 +74,19 @@ class CommunityMembership(models.Model):
         ordering = ['-joined_at']
 
 
+class PostQuerySet(models.QuerySet):
+    def for_listing(self, user=None):
+        # Everything PostSerializer reads in one query: author, community and the viewer's reaction
+        qs = self.select_related('postedby', 'community')
+        if user is not None and user.is_authenticated:
+            reactions = Like.objects.filter(post=OuterRef('pk'), user=user)
+            qs = qs.annotate(
+                liked=Exists(reactions.filter(type='like')),
+                disliked=Exists(reactions.filter(type='dislike')),
+            )
+        return qs
+
+
 class Post(models.Model):
     MEDIA_TYPE_CHOICES = (
         ('image', 'Image'),
@@ -71,17 +97,117 @@ class Post(models.Model):
         ('active', 'Active'),
         ('hidden', 'Hidden'),
     )
+    MEDIA_STATUS_CHOICES = (
+        ('none', 'None'),
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    )
     title = models.CharField(max_length=255, blank=True, null=True)
     caption = models.TextField(blank=True, null=True)
     media_file = models.FileField(upload_to='post_media/', null=True, blank=True)
     media_type = models.CharField(max_length=20,choices=MEDIA_TYPE_CHOICES,default='none')
+    # Filled in by social_admin.media after upload: type sniffed from the file's
+    # magic bytes, original dimensions and the resized variants / video poster
+    media_mime = models.CharField(max_length=100, blank=True, default='')
+    media_width = models.PositiveIntegerField(null=True, blank=True)
+    media_height = models.PositiveIntegerField(null=True, blank=True)
+    media_renditions = models.JSONField(default=list, blank=True)
+    media_status = models.CharField(max_length=10, choices=MEDIA_STATUS_CHOICES, default='none')
     community = models.ForeignKey('Community',on_delete=models.CASCADE,related_name='posts',blank=True,null=True )
     postedby = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.CASCADE,related_name='posts')
     likes_count = models.PositiveIntegerField(default=0)
+    dislikes_count = models.PositiveIntegerField(default=0)
     comments_count = models.PositiveIntegerField(default=0)
+    # Stored ranking for popular_posts, kept current by social_admin.popularity
+    popularity_score = models.IntegerField(default=0)
     status = models.CharField(max_length=10,choices=STATUS_CHOICES,default='active')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-popularity_score', '-id'], name='post_status_popularity_idx'),
+            # (created_at, id) is the cursor order of every post listing
+            models.Index(fields=['status', 'created_at', 'id'], name='post_status_created_idx'),
+            models.Index(fields=['community', 'status', 'created_at', 'id'], name='post_community_created_idx'),
+            models.Index(fields=['postedby', 'status', 'created_at', 'id'], name='post_author_created_idx'),
+        ]
+
+
+class FeedEntry(models.Model):
+    # Materialized stream_posts inbox, filled on write by social_admin.feed
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='feed_entries')
+    post = models.ForeignKey('Post', on_delete=models.CASCADE, related_name='feed_entries')
+    created_at = models.DateTimeField()  # copy of post.created_at so the feed sorts without a join
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='feed_user_created_idx'),
+        ]
+
+
+class PostEngagementBucket(models.Model):
+    # Hourly rollup of likes/comments, written on like_post/add_comment and read by compute_trending
+    post = models.ForeignKey('Post', on_delete=models.CASCADE, related_name='engagement_buckets')
+    hour = models.DateTimeField()
+    likes = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('post', 'hour')
+        indexes = [
+            models.Index(fields=['hour'], name='engagement_bucket_hour_idx'),
+        ]
+
+
+class TrendingPost(models.Model):
+    # Ranked output of the compute_trending command; trending_posts only reads this table
+    post = models.OneToOneField('Post', on_delete=models.CASCADE, related_name='trending')
+    score = models.FloatField(default=0)
+    engagement = models.IntegerField(default=0)
+    hours_since = models.FloatField(default=1)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-score']
+        indexes = [
+            models.Index(fields=['-score', 'post'], name='trending_score_idx'),
+        ]
+
+
+class SearchDocument(models.Model):
+    # One row per searchable object, kept up to date by social_admin.search
+    KIND_CHOICES = (
+        ('post', 'Post'),
+        ('community', 'Community'),
+        ('user', 'User'),
+        ('comment', 'Comment'),
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    body = models.TextField()  # normalized text; on MySQL it carries a FULLTEXT index
+    is_public = models.BooleanField(default=True)  # active post / visible comment / active user
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+
+class SearchToken(models.Model):
+    # Portable inverted index used when the database has no full-text support
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='tokens')
+    token = models.CharField(max_length=40)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('document', 'token')
+        indexes = [
+            models.Index(fields=['token', 'document'], name='search_token_idx'),
+        ]
+
 
 class Comment(models.Model):
     post = models.ForeignKey('Post',on_delete=models.CASCADE,related_name='comments')
@@ -91,6 +217,12 @@ class Comment(models.Model):
     is_visible = models.BooleanField(default=True) 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # top-level comments and reply pages of one post, in cursor order
+            models.Index(fields=['post', 'parent', 'created_at', 'id'], name='comment_thread_idx'),
+        ]
+
 
 class Like(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="likes")
@@ -118,6 +250,9 @@ class Report(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ('reported_by', 'content_type', 'object_id')
+        indexes = [
+            models.Index(fields=['content_type', 'created_at'], name='report_type_created_idx'),
+        ]
 
 
 class Chat(models.Model):
@@ -135,6 +270,29 @@ class Message(models.Model):
     deleted = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['chat', 'created_at', 'id'], name='message_chat_created_idx'),
+            # mark_read: unread messages in a chat from the other participants
+            models.Index(fields=['chat', 'is_read', 'sender'], name='message_chat_unread_idx'),
+        ]
+
+
+class ChatState(models.Model):
+    # Per-participant inbox row for chats_view, maintained by social_admin.chat_state
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='states')
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chat_states')
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_activity = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('chat', 'user')
+        indexes = [
+            models.Index(fields=['user', '-last_activity'], name='chatstate_user_activity_idx'),
+        ]
+
 
 class TypingStatus(models.Model):
     chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='typing_statuses')
@@ -154,4 +312,82 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'unread', 'created_at'], name='notification_inbox_idx'),
+        ]
+
+class SiteCounter(models.Model):
+    # Running totals for the admin dashboard, kept by social_admin.site_stats
+    name = models.CharField(max_length=40, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class DailyStat(models.Model):
+    # New users / posts / comments / reports per day, for the dashboard growth charts
+    day = models.DateField()
+    metric = models.CharField(max_length=40)
+    value = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('metric', 'day')
+
+class Upload(models.Model):
+    # Resumable chunked upload; chunks are written in place into `file`, which
+    # becomes the post's media_file when the upload is attached (social_admin.uploads)
+    STATUS_CHOICES = (
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+        ('attached', 'Attached'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='uploads')
+    filename = models.CharField(max_length=255)
+    file = models.FileField(upload_to='post_media/', max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)  # bytes received so far
+    sha256 = models.CharField(max_length=64, blank=True)  # expected digest of the whole file, if the client sent one
+    mime = models.CharField(max_length=100, blank=True)  # sniffed on completion
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='upload_status_updated_idx'),
+        ]
+
+class Blob(models.Model):
+    # A file of the content-addressed media storage (social_admin.storage);
+    # `refs` counts the saves of this content that have not been deleted yet
+    name = models.CharField(max_length=100, unique=True)
+    size = models.PositiveBigIntegerField()
+    refs = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class Task(models.Model):
+    # Durable background job run by `manage.py run_tasks` (social_admin.tasks):
+    # `name` is the dotted path of a module-level function, `args` its JSON arguments
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    )
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    priority = models.PositiveSmallIntegerField(default=5)  # lower runs first
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'priority', 'run_after'], name='task_ready_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,111 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    # Keyset pagination on (created_at, id): every page is an indexed range scan
+    # with an opaque ?cursor=, so deep pages cost the same as the first one.
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class PopularCursorPagination(CreatedAtCursorPagination):
+    # Walks the post_status_popularity_idx index instead of sorting in Python.
+    # DRF's cursor only holds the first ordering field and breaks ties with an
+    # offset; scores tie a lot and change between requests, so the cursor here
+    # is the whole (score, id) key and every page starts strictly after it.
+    ordering = ('-popularity_score', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(self._after(current_position, reverse))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # positions are unique, so the offset is always 0 in the links we hand out
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        return '|'.join(str(getattr(instance, field.lstrip('-'))) for field in ordering)
+
+    def _after(self, position, reverse):
+        """Rows past `position` in the walking direction: (a, b) < (x, y) means a < x OR (a = x AND b < y)."""
+        values = position.split('|')
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        condition, equal = Q(), {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+
+class ReplyCursorPagination(CreatedAtCursorPagination):
+    # "Load more replies" under one comment, oldest first like the inline thread
+    ordering = ('created_at', 'id')
+
+
+class MessageCursorPagination(CreatedAtCursorPagination):
+    # Newest page first; `next` walks back into older history
+    page_size = 50
+    max_page_size = 200
+
+
+def paginated_response(request, queryset, serializer_class, pagination_class=CreatedAtCursorPagination, context=None):
+    paginator = pagination_class()
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = serializer_class(page, many=True, context=context or {})
+    return paginator.get_paginated_response(serializer.data)
@@ -0,0 +1,137 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from . import counters, metrics, response_cache, trending
+from .models import Comment, Like, Post
+
+
+# Score = likes + 2 * comments - dislikes + 1 per 100 community members
+LIKE_WEIGHT = 1
+DISLIKE_WEIGHT = -1
+COMMENT_WEIGHT = 2
+MEMBERS_PER_POINT = 100
+
+
+def community_boost(members_count):
+    return int(members_count / MEMBERS_PER_POINT)
+
+
+def initial_score(community):
+    """Score of a post nobody has reacted to yet: its community's size boost."""
+    return community_boost(community.members_count) if community else 0
+
+
+def record_community_move(post_id, old_community, new_community):
+    bump_score(post_id, initial_score(new_community) - initial_score(old_community))
+
+
+def bump_score(post_id, delta):
+    """Shift a single post's stored score without reading it first."""
+    if delta:
+        Post.objects.filter(id=post_id).update(popularity_score=F('popularity_score') + delta)
+
+
+def record_reactions(post_id, likes_delta=0, dislikes_delta=0):
+    counters.get_counters().add(post_id, likes=likes_delta, dislikes=dislikes_delta)
+    metrics.reactions_added(likes=likes_delta, dislikes=dislikes_delta)
+
+
+def record_comments(post_id, delta):
+    """Apply a change in comment count (negative when comments are deleted)."""
+    counters.get_counters().add(post_id, comments=delta)
+    metrics.comments_added(delta)
+
+
+def apply_engagement(deltas):
+    """
+    Write {post_id: (likes, dislikes, comments)} deltas to the stored counters
+    and score, one UPDATE per post, and add them to the post's trending bucket
+    for this hour. Posts are updated in id order so two concurrent flushes
+    always take row locks in the same order.
+    """
+    with transaction.atomic():
+        for post_id in sorted(deltas):
+            likes, dislikes, comments = deltas[post_id]
+            if not (likes or dislikes or comments):
+                continue
+            updated = Post.objects.filter(id=post_id).update(
+                likes_count=Greatest(F('likes_count') + likes, 0),
+                dislikes_count=Greatest(F('dislikes_count') + dislikes, 0),
+                comments_count=Greatest(F('comments_count') + comments, 0),
+                popularity_score=F('popularity_score') + (
+                    likes * LIKE_WEIGHT + dislikes * DISLIKE_WEIGHT + comments * COMMENT_WEIGHT
+                ),
+            )
+            if updated:
+                trending.record_engagement(post_id, likes=likes, comments=comments)
+            response_cache.bump(f'post:{post_id}')
+
+
+def record_membership_change(community_id, old_members, new_members):
+    # The community boost only moves when a 100-member boundary is crossed,
+    # so most joins/leaves do not touch the community's posts at all.
+    delta = community_boost(new_members) - community_boost(old_members)
+    if delta:
+        Post.objects.filter(community_id=community_id).update(popularity_score=F('popularity_score') + delta)
+    # members_count has changed even when the boost has not
+    response_cache.bump(f'community:{community_id}')
+
+
+
+def _count_subquery(queryset):
+    return Coalesce(Subquery(
+        queryset.filter(post=OuterRef('pk')).order_by().values('post').annotate(n=Count('id')).values('n')
+    ), 0)
+
+
+def reconcile(batch_size=1000):
+    """
+    Recompute counters and scores from the Like / Comment tables and correct
+    the posts that drifted. Returns the number of posts that were corrected.
+    """
+    posts = (
+        Post.objects
+        .select_related('community')
+        .annotate(
+            real_likes=_count_subquery(Like.objects.filter(type='like')),
+            real_dislikes=_count_subquery(Like.objects.filter(type='dislike')),
+            real_comments=_count_subquery(Comment.objects.all()),
+        )
+        .order_by('id')
+    )
+    fields = ['likes_count', 'dislikes_count', 'comments_count', 'popularity_score']
+    corrections, total = {}, 0
+    for post in posts.iterator(chunk_size=batch_size):
+        members = post.community.members_count if post.community else 0
+        expected = (
+            post.real_likes,
+            post.real_dislikes,
+            post.real_comments,
+            post.real_likes * LIKE_WEIGHT + post.real_dislikes * DISLIKE_WEIGHT
+            + post.real_comments * COMMENT_WEIGHT + community_boost(members),
+        )
+        drift = tuple(value - getattr(post, field) for field, value in zip(fields, expected))
+        if any(drift):
+            corrections[post.id] = drift
+        if len(corrections) >= batch_size:
+            _correct(corrections)
+            total += len(corrections)
+            corrections = {}
+    _correct(corrections)
+    return total + len(corrections)
+
+
+def _correct(corrections):
+    # Shift by the drift rather than writing the recount back: a like or flush
+    # that lands between the read and this write is kept instead of overwritten
+    with transaction.atomic():
+        for post_id in sorted(corrections):
+            likes, dislikes, comments, score = corrections[post_id]
+            Post.objects.filter(id=post_id).update(
+                likes_count=F('likes_count') + likes,
+                dislikes_count=F('dislikes_count') + dislikes,
+                comments_count=F('comments_count') + comments,
+                popularity_score=F('popularity_score') + score,
+            )
+            response_cache.bump(f'post:{post_id}')
@@ -0,0 +1,139 @@
+# Short-lived presence state (who is typing in which chat). Entries expire on
+# their own after a TTL, so nothing here ever touches the database.
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+DEFAULT_TTL = 5
+
+
+class InMemoryPresenceStore:
+    """Per-process store; fine for runserver and for tests (pass `clock` to control expiry)."""
+
+    def __init__(self, ttl=DEFAULT_TTL, clock=time.monotonic, **options):
+        self.ttl = ttl
+        self._clock = clock
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def touch(self, group, member, ttl=None):
+        with self._lock:
+            self._groups.setdefault(group, {})[member] = self._clock() + (ttl or self.ttl)
+
+    def remove(self, group, member):
+        with self._lock:
+            members = self._groups.get(group)
+            if members:
+                members.pop(member, None)
+                if not members:
+                    del self._groups[group]
+
+    def members(self, group):
+        now = self._clock()
+        with self._lock:
+            members = self._groups.get(group, {})
+            for member, expires in list(members.items()):
+                if expires <= now:
+                    del members[member]
+            if not members:
+                self._groups.pop(group, None)
+            return list(members)
+
+
+class CachePresenceStore:
+    """Shares state through a Django cache (memcached, Redis cache, file cache...), one key per member."""
+
+    def __init__(self, ttl=DEFAULT_TTL, alias='default', prefix='presence:', **options):
+        from django.core.cache import caches
+
+        self.ttl = ttl
+        self._cache = caches[alias]
+        self._prefix = prefix
+
+    def _index_key(self, group):
+        return f'{self._prefix}{group}'
+
+    def _member_key(self, group, member):
+        return f'{self._prefix}{group}:{member}'
+
+    def touch(self, group, member, ttl=None):
+        ttl = ttl or self.ttl
+        self._cache.set(self._member_key(group, member), 1, ttl)
+        # the index only lists candidates; each member key carries its own expiry
+        index = self._cache.get(self._index_key(group)) or set()
+        if member not in index:
+            self._cache.set(self._index_key(group), index | {member}, ttl * 2)
+
+    def remove(self, group, member):
+        self._cache.delete(self._member_key(group, member))
+
+    def members(self, group):
+        index = self._cache.get(self._index_key(group)) or set()
+        if not index:
+            return []
+        alive = self._cache.get_many([self._member_key(group, member) for member in index])
+        return [member for member in index if self._member_key(group, member) in alive]
+
+
+class RedisPresenceStore:
+    """Multi-node store: one sorted set per group scored by expiry time."""
+
+    def __init__(self, ttl=DEFAULT_TTL, url='redis://localhost:6379/0', prefix='social_admin:presence:', **options):
+        import redis  # optional dependency, only needed for this backend
+
+        self.ttl = ttl
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def touch(self, group, member, ttl=None):
+        ttl = ttl or self.ttl
+        key = self._prefix + group
+        pipe = self._redis.pipeline()
+        pipe.zadd(key, {member: time.time() + ttl})
+        pipe.expire(key, int(ttl) + 1)
+        pipe.execute()
+
+    def remove(self, group, member):
+        self._redis.zrem(self._prefix + group, member)
+
+    def members(self, group):
+        key = self._prefix + group
+        now = time.time()
+        pipe = self._redis.pipeline()
+        pipe.zremrangebyscore(key, '-inf', now)
+        pipe.zrangebyscore(key, now, '+inf')
+        _, members = pipe.execute()
+        return [int(member) for member in members]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            config = getattr(settings, 'PRESENCE_STORE', {})
+            backend = import_string(config.get('BACKEND', 'social_admin.presence.InMemoryPresenceStore'))
+            _store = backend(**config.get('OPTIONS', {}))
+    return _store
+
+
+def typing_group(chat_id):
+    return f'typing.{chat_id}'
+
+
+def set_typing(chat_id, user_id, active=True):
+    store = get_store()
+    if active:
+        store.touch(typing_group(chat_id), user_id)
+    else:
+        store.remove(typing_group(chat_id), user_id)
+
+
+def typing_users(chat_id, exclude=None):
+    return [user_id for user_id in get_store().members(typing_group(chat_id)) if user_id != exclude]
@@ -0,0 +1,283 @@
+import asyncio
+import json
+import logging
+import re
+import threading
+import time
+from queue import Empty, Queue
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+from . import presence
+
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY_MAX = 30
+
+# ---------------------------------------------------------------------------
+# Channel layers: deliver events published by views to connected sockets
+# ---------------------------------------------------------------------------
+
+class InMemoryChannelLayer:
+    """
+    Fan-out inside one process; enough for runserver or a single ASGI worker.
+    Sockets and long-polls only see events published by their own process,
+    so a deployment with several workers needs RedisChannelLayer.
+    """
+
+    def __init__(self, **options):
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, group, queue, loop):
+        with self._lock:
+            self._groups.setdefault(group, set()).add((queue, loop))
+
+    def unsubscribe(self, group, queue, loop):
+        with self._lock:
+            subscribers = self._groups.get(group)
+            if subscribers:
+                subscribers.discard((queue, loop))
+                if not subscribers:
+                    del self._groups[group]
+
+    def publish(self, group, event):
+        self._deliver(group, event)
+
+    def _deliver(self, group, event):
+        with self._lock:
+            subscribers = list(self._groups.get(group, ()))
+        for queue, loop in subscribers:
+            try:
+                # views run in worker threads, sockets live on the event loop
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # loop already closed; the socket's finally block will unsubscribe
+                pass
+
+
+class RedisChannelLayer(InMemoryChannelLayer):
+    """Multi-node layer: events go through Redis pub/sub and are fanned out locally by each process."""
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='social_admin:', **options):
+        super().__init__()
+        import redis  # optional dependency, only needed for this backend
+
+        self._prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def subscribe(self, group, queue, loop):
+        self._ensure_listener()
+        super().subscribe(group, queue, loop)
+
+    def publish(self, group, event):
+        self._redis.publish(self._prefix + group, json.dumps(event))
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='realtime-redis', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        # Reconnects with backoff when Redis goes away. Events published while
+        # disconnected are lost; clients catch up through get_messages?after_id.
+        delay = 1
+        while True:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(self._prefix + '*')
+                delay = 1
+                for message in pubsub.listen():
+                    channel = message['channel'].decode()
+                    try:
+                        event = json.loads(message['data'])
+                    except ValueError:
+                        logger.warning('dropping malformed realtime event on %s', channel)
+                        continue
+                    self._deliver(channel[len(self._prefix):], event)
+            except Exception:
+                logger.exception('realtime Redis listener disconnected; reconnecting in %ss', delay)
+                time.sleep(delay)
+                delay = min(delay * 2, RECONNECT_DELAY_MAX)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+_layer = None
+_layer_lock = threading.Lock()
+
+
+def get_layer():
+    global _layer
+    with _layer_lock:
+        if _layer is None:
+            config = getattr(settings, 'CHANNEL_LAYER', {})
+            backend = import_string(config.get('BACKEND', 'social_admin.realtime.InMemoryChannelLayer'))
+            _layer = backend(**config.get('OPTIONS', {}))
+    return _layer
+
+
+class _BlockingSubscriber:
+    # Stands in for an event loop so a request thread can subscribe like a socket does
+    def call_soon_threadsafe(self, callback, *args):
+        callback(*args)
+
+
+class Subscription:
+    """
+    Events published on `group` while the block is open, for a request thread:
+
+        with realtime.Subscription(group) as events:
+            ...check the database...
+            events.wait(timeout)
+
+    Subscribing before the check means an event published between the check
+    and wait() is still delivered.
+    """
+
+    def __init__(self, group):
+        self.group = group
+        self._layer = get_layer()
+        self._events = Queue()
+        self._subscriber = _BlockingSubscriber()
+
+    def __enter__(self):
+        self._layer.subscribe(self.group, self._events, self._subscriber)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._layer.unsubscribe(self.group, self._events, self._subscriber)
+
+    def wait(self, timeout, types=None):
+        """Block until an event (of one of `types`) has arrived or `timeout` seconds pass."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                event = self._events.get(timeout=remaining)
+            except Empty:
+                return None
+            if types is None or event.get('type') in types:
+                return event
+
+
+def chat_group(chat_id):
+    return f'chat.{chat_id}'
+
+
+def user_group(user_id):
+    return f'user.{user_id}'
+
+
+def publish_chat(chat_id, event):
+    get_layer().publish(chat_group(chat_id), event)
+
+
+def publish_users(user_ids, event):
+    layer = get_layer()
+    for user_id in user_ids:
+        layer.publish(user_group(user_id), event)
+
+
+# ---------------------------------------------------------------------------
+# ASGI websocket endpoint, mounted from backend_django/asgi.py
+#
+#   ws/chat/<chat_id>/?token=<key>  message.new / message.read / message.deleted / typing
+#   ws/inbox/?token=<key>           chat.updated for every chat of the user
+# ---------------------------------------------------------------------------
+
+CHAT_PATH = re.compile(r'^/ws/chat/(?P<chat_id>\d+)/?$')
+INBOX_PATH = re.compile(r'^/ws/inbox/?$')
+
+
+def _authenticate(token_key, chat_id):
+    # Only runs on connect; an idle socket never touches the database.
+    from rest_framework.authtoken.models import Token
+    from .models import Chat
+
+    close_old_connections()
+    try:
+        token = Token.objects.select_related('user').get(key=token_key)
+    except Token.DoesNotExist:
+        return None
+    user = token.user
+    if not user.is_active:
+        return None
+    if chat_id is not None and not Chat.objects.filter(id=chat_id, participants=user).exists():
+        return None
+    return user
+
+
+async def websocket_application(scope, receive, send):
+    if (await receive())['type'] != 'websocket.connect':
+        return
+
+    path = scope.get('path', '')
+    chat_match = CHAT_PATH.match(path)
+    if not chat_match and not INBOX_PATH.match(path):
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    chat_id = int(chat_match.group('chat_id')) if chat_match else None
+    token_key = parse_qs(scope.get('query_string', b'').decode()).get('token', [''])[0]
+    user = await sync_to_async(_authenticate)(token_key, chat_id)
+    if user is None:
+        await send({'type': 'websocket.close', 'code': 4403})
+        return
+
+    group = chat_group(chat_id) if chat_id else user_group(user.id)
+    layer = get_layer()
+    queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+
+    await send({'type': 'websocket.accept'})
+    layer.subscribe(group, queue, loop)
+
+    incoming = asyncio.ensure_future(receive())
+    outgoing = asyncio.ensure_future(queue.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait({incoming, outgoing}, return_when=asyncio.FIRST_COMPLETED)
+
+            if outgoing in done:
+                await send({'type': 'websocket.send', 'text': json.dumps(outgoing.result())})
+                outgoing = asyncio.ensure_future(queue.get())
+
+            if incoming in done:
+                message = incoming.result()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                if message['type'] == 'websocket.receive' and chat_id:
+                    # presence stores and the Redis layer do blocking I/O; keep it off the event loop
+                    await sync_to_async(_handle_client_event, thread_sensitive=False)(
+                        chat_id, user.id, message.get('text'))
+                incoming = asyncio.ensure_future(receive())
+    finally:
+        layer.unsubscribe(group, queue, loop)
+        incoming.cancel()
+        outgoing.cancel()
+
+
+def _handle_client_event(chat_id, user_id, text):
+    # Typing indicators sent over the socket are relayed without any DB write
+    try:
+        data = json.loads(text or '')
+    except ValueError:
+        return
+    if isinstance(data, dict) and data.get('type') == 'typing':
+        # keep REST pollers (clients without a socket) in sync
+        presence.set_typing(chat_id, user_id, bool(data.get('active', True)))
+        publish_chat(chat_id, {'type': 'typing', 'user_id': user_id, 'active': bool(data.get('active', True))})
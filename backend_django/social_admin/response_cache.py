@@ -0,0 +1,197 @@
+# Cached payloads for the public read endpoints. Each entry records the
+# versions of the scopes it was built from ('post:12', 'community:3', ...);
+# writes bump those versions, so a stale entry is simply never matched again.
+# Versions are ticks of one shared clock, so a payload whose scopes were bumped
+# while it was being built is recognised and not cached.
+# Entries also carry an ETag, so a client holding the current payload gets a
+# 304 without the payload being rebuilt or rendered.
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import metrics
+from .models import Comment, Community, Post, User
+
+
+TIMEOUT = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+# ranked listings can reorder without any of their own posts changing
+LISTING_TIMEOUT = getattr(settings, 'RESPONSE_CACHE_LISTING_TIMEOUT', 60)
+
+VERSION_PREFIX = 'rv:'
+ENTRY_PREFIX = 'rc:'
+CLOCK_KEY = VERSION_PREFIX + '@clock'
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def bump(*scopes):
+    """Invalidate every cached payload built from any of `scopes` once the current transaction commits."""
+    # bumping before commit would let a concurrent reader cache the old rows under the new version
+    transaction.on_commit(lambda: _bump_now(scopes))
+
+
+def _bump_now(scopes):
+    cache = _cache()
+    try:
+        tick = cache.incr(CLOCK_KEY)
+    except ValueError:
+        # unknown (or evicted) clock: restart it past every value it has handed out
+        tick = time.time_ns()
+        if not cache.add(CLOCK_KEY, tick, None):
+            tick = cache.incr(CLOCK_KEY)
+    cache.set_many({VERSION_PREFIX + scope: tick for scope in scopes}, None)
+
+
+def clock():
+    """The latest tick; every version bumped from now on is greater."""
+    cache = _cache()
+    value = cache.get(CLOCK_KEY)
+    if value is None:
+        cache.add(CLOCK_KEY, time.time_ns(), None)
+        value = cache.get(CLOCK_KEY)
+    return value
+
+
+def versions(scopes):
+    cache = _cache()
+    keys = [VERSION_PREFIX + scope for scope in scopes]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # never bumped (or evicted): unchanged since the current tick
+        now = clock()
+        for key in missing:
+            cache.add(key, now, None)
+            found[key] = cache.get(key)
+    return {key[len(VERSION_PREFIX):]: found[key] for key in keys}
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+def make_etag(request, *parts):
+    """Validator computed from cheap inputs (ids, versions) instead of the payload itself."""
+    digest = hashlib.md5(repr((request.get_full_path(), request.user.id) + parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def with_validator(response, etag):
+    # no-cache makes browsers revalidate with If-None-Match on every request,
+    # which turns repeat fetches of an unchanged payload into 304s
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def not_modified(etag):
+    return with_validator(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+
+def respond(request, name, build, overlay=None, timeout=TIMEOUT):
+    """
+    Serve `name` for this request from the cache or by calling build().
+
+    build() returns (data, scopes), or a Response for results that must not be
+    cached (404s). overlay(data) may add per-viewer fields to a copy of the
+    shared payload before it is sent.
+    """
+    cache = _cache()
+    key = ENTRY_PREFIX + hashlib.md5(f'{name}|{request.get_full_path()}'.encode()).hexdigest()
+
+    entry = cache.get(key)
+    if entry is not None and versions(entry['versions']) != entry['versions']:
+        entry = None
+    metrics.cache_lookup(name, entry is not None)
+
+    if entry is None:
+        # read before build(): scopes are only known afterwards, and a write that
+        # commits in between must not be cached under its own new version
+        started = clock()
+        built = build()
+        if isinstance(built, Response):
+            return built
+        data, scopes = built
+        snapshot = versions(scopes)
+        if started is None or any(version > started for version in snapshot.values()):
+            # changed while building (or a cache that keeps nothing): send it, but neither cache nor validate it
+            return Response(overlay(data) if overlay is not None else data)
+        tag = hashlib.md5(repr((key, sorted(snapshot.items()))).encode()).hexdigest()
+        entry = {'data': data, 'versions': snapshot, 'tag': tag}
+        cache.set(key, entry, timeout)
+
+    # the viewer is part of the validator because overlays differ per viewer
+    etag = quote_etag(f"{entry['tag']}-{request.user.id or 0}")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    data = entry['data']
+    if overlay is not None:
+        data = overlay(data)
+    return with_validator(Response(data), etag)
+
+
+# ---------------------------------------------------------------------------
+# Invalidation: model signals cover save()/delete() everywhere (views, admin,
+# serializers); counter UPDATEs call bump() themselves.
+# ---------------------------------------------------------------------------
+
+def _post_changed(sender, instance, **kwargs):
+    scopes = [f'post:{instance.pk}', 'posts', f'user:{instance.postedby_id}']
+    if instance.community_id:
+        scopes.append(f'community:{instance.community_id}')
+    bump(*scopes)
+
+
+def _community_changed(sender, instance, **kwargs):
+    bump(f'community:{instance.pk}')
+
+
+def _comment_changed(sender, instance, **kwargs):
+    bump(f'post:{instance.post_id}')
+
+
+def _user_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login', 'password'}:
+        return
+    bump(f'user:{instance.pk}')
+
+
+def _members_changed(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Community):
+        bump(f'community:{instance.pk}')
+    else:
+        bump(*[f'community:{pk}' for pk in pk_set or ()])
+
+
+def _follows_changed(sender, instance, action, pk_set, **kwargs):
+    # follower/following counts on both ends of the relation
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump(f'user:{instance.pk}', *[f'user:{pk}' for pk in pk_set or ()])
+
+
+def connect_signals():
+    for model, handler in ((Post, _post_changed), (Community, _community_changed), (Comment, _comment_changed)):
+        post_save.connect(handler, sender=model, dispatch_uid=f'response-cache-save-{model.__name__}')
+        post_delete.connect(handler, sender=model, dispatch_uid=f'response-cache-delete-{model.__name__}')
+    post_save.connect(_user_changed, sender=User, dispatch_uid='response-cache-save-User')
+    post_delete.connect(_user_changed, sender=User, dispatch_uid='response-cache-delete-User')
+    m2m_changed.connect(_members_changed, sender=Community.members.through, dispatch_uid='response-cache-members')
+    m2m_changed.connect(_follows_changed, sender=User.followers.through, dispatch_uid='response-cache-follows')
@@ -0,0 +1,195 @@
+# Search over posts, communities, users and comments. Every searchable object
+# has a SearchDocument row, refreshed from post_save/post_delete signals. On
+# MySQL documents are ranked by the FULLTEXT index on SearchDocument.body;
+# other databases use the SearchToken inverted index built here.
+# `manage.py rebuild_search_index` (re)indexes existing rows.
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, FloatField, IntegerField, Max, Q, Sum, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+
+from .models import Comment, Community, Post, SearchDocument, SearchToken, User
+
+
+TOKEN_RE = re.compile(r'\w+')
+MIN_TOKEN_LENGTH = 2
+MAX_TOKEN_LENGTH = 40
+MAX_QUERY_TERMS = 8
+
+MODELS = {
+    'post': Post,
+    'community': Community,
+    'user': User,
+    'comment': Comment,
+}
+
+# (field, weight): a hit in a title or name ranks above one in body text
+FIELDS = {
+    'post': (('title', 3), ('caption', 1)),
+    'community': (('name', 3), ('description', 1)),
+    'user': (('name', 3), ('email', 2)),
+    'comment': (('text', 1),),
+}
+
+# saves touching only other fields (counters, last_login...) skip reindexing
+VISIBILITY_FIELDS = {
+    'post': {'status'},
+    'community': set(),
+    'user': {'is_active', 'is_admin'},
+    'comment': {'is_visible'},
+}
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TOKEN_LENGTH]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) >= MIN_TOKEN_LENGTH
+    ]
+
+
+def use_fulltext():
+    backend = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        return connection.vendor == 'mysql'
+    return backend == 'fulltext'
+
+
+def is_public(kind, obj):
+    if kind == 'post':
+        return obj.status == 'active'
+    if kind == 'comment':
+        return obj.is_visible
+    if kind == 'user':
+        return obj.is_active and not obj.is_admin
+    return True
+
+
+def index_object(kind, obj):
+    weights = {}
+    body = []
+    for field, weight in FIELDS[kind]:
+        value = getattr(obj, field) or ''
+        # MySQL ranks by term frequency, so heavier fields are repeated in the body
+        body.extend([value] * weight)
+        for token in tokenize(value):
+            weights[token] = weights.get(token, 0) + weight
+
+    document, _ = SearchDocument.objects.update_or_create(
+        kind=kind,
+        object_id=obj.pk,
+        defaults={'body': '\n'.join(body), 'is_public': is_public(kind, obj)},
+    )
+    if not use_fulltext():
+        document.tokens.all().delete()
+        SearchToken.objects.bulk_create([
+            SearchToken(document=document, token=token, weight=weight)
+            for token, weight in weights.items()
+        ])
+    return document
+
+
+def remove_object(kind, object_id):
+    SearchDocument.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def query_terms(query):
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def matching_documents(query, kinds=None, public_only=True):
+    """
+    SearchDocuments matching every term of `query` (each term also matches as
+    a word prefix), annotated with `score` and ordered best first.
+    """
+    terms = query_terms(query)
+    documents = SearchDocument.objects.all()
+    if kinds:
+        documents = documents.filter(kind__in=kinds)
+    if public_only:
+        documents = documents.filter(is_public=True)
+    if not terms:
+        # same shape as a real result, so callers can read `score` from an empty one too
+        return documents.annotate(score=Value(0.0, output_field=FloatField())).none()
+
+    if use_fulltext():
+        against = ' '.join(f'+{term}*' for term in terms)
+        return documents.annotate(
+            score=RawSQL('MATCH (body) AGAINST (%s IN BOOLEAN MODE)', [against], output_field=FloatField())
+        ).filter(score__gt=0).order_by('-score', '-id')
+
+    prefix_match = Q()
+    for term in terms:
+        prefix_match |= Q(tokens__token__startswith=term)
+    terms_hit = [
+        Max(Case(When(tokens__token__startswith=term, then=1), default=0, output_field=IntegerField()))
+        for term in terms
+    ]
+    return (
+        documents
+        .filter(prefix_match)
+        .annotate(score=Sum('tokens__weight'), terms_hit=sum(terms_hit[1:], terms_hit[0]))
+        .filter(terms_hit=len(terms))
+        .order_by('-score', '-id')
+    )
+
+
+def matching_ids(kind, query, public_only=False, fields=None):
+    """
+    Subquery of object ids for one kind, for `.filter(id__in=...)` in admin listings.
+
+    `fields` narrows the match to some of the indexed fields (every term must
+    then occur in one of them), for filters that only ever searched names.
+    Queries too short to index (a single character) fall back to a substring
+    scan of those fields, as these filters did before the index.
+    """
+    fields = fields or [field for field, _ in FIELDS[kind]]
+    terms = query_terms(query)
+    if not terms:
+        query = (query or '').strip()
+        if not query:
+            return MODELS[kind].objects.none().values('pk')
+        objects = MODELS[kind].objects.filter(_any_field_contains(fields, query))
+        if public_only:
+            objects = objects.filter(pk__in=SearchDocument.objects.filter(kind=kind, is_public=True).values('object_id'))
+        return objects.values('pk')
+
+    ids = matching_documents(query, [kind], public_only=public_only).order_by().values('object_id')
+    if set(fields) == {field for field, _ in FIELDS[kind]}:
+        return ids
+    objects = MODELS[kind].objects.filter(pk__in=ids)
+    for term in terms:
+        objects = objects.filter(_any_field_contains(fields, term))
+    return objects.values('pk')
+
+
+def _any_field_contains(fields, text):
+    match = Q()
+    for field in fields:
+        match |= Q(**{f'{field}__icontains': text})
+    return match
+
+
+def _on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    kind = next(kind for kind, model in MODELS.items() if model is sender)
+    if update_fields is not None:
+        watched = {field for field, _ in FIELDS[kind]} | VISIBILITY_FIELDS[kind]
+        if not watched & set(update_fields):
+            return
+    index_object(kind, instance)
+
+
+def _on_delete(sender, instance, **kwargs):
+    kind = next(kind for kind, model in MODELS.items() if model is sender)
+    remove_object(kind, instance.pk)
+
+
+def connect_signals():
+    for kind, model in MODELS.items():
+        post_save.connect(_on_save, sender=model, dispatch_uid=f'search-index-{kind}')
+        post_delete.connect(_on_delete, sender=model, dispatch_uid=f'search-remove-{kind}')
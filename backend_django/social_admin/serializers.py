@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.contenttypes.models import ContentType
+from . import media
 from .models import (
     User, Community, CommunityMembership, Post,
     Comment, Like, Report, Chat, Message, Notification
@@ -7,18 +8,24 @@ from .models import (
 
 
 class UserSerializer(serializers.ModelSerializer):
+    # Small square avatar; null until the upload has been processed (use profile_pic then)
+    profile_pic_small = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ['id', 'email', 'name', 'bio', 'profile_pic', 'created_at']
+        fields = ['id', 'email', 'name', 'bio', 'profile_pic', 'profile_pic_small', 'created_at']
+
+    def get_profile_pic_small(self, obj):
+        return media.url(media.pick(obj.profile_pic_renditions, media.AVATAR_PREVIEW_SIZE))
 
 
 class CommunitySerializer(serializers.ModelSerializer):
     creater = UserSerializer(read_only=True)
-    members_count = serializers.IntegerField(source='members.count', read_only=True)
 
     class Meta:
         model = Community
         fields = ['id', 'name', 'description', 'thumbnail', 'creater', 'members_count', 'created_at']
+        read_only_fields = ['members_count']
 
 
 class CommunityMembershipSerializer(serializers.ModelSerializer):
@@ -32,33 +39,59 @@ class CommunityMembershipSerializer(serializers.ModelSerializer):
 class PostSerializer(serializers.ModelSerializer):
     postedby = UserSerializer(read_only=True)
     community_name = serializers.CharField(source='community.name', read_only=True)
-    dislikes_count = serializers.SerializerMethodField()
+    liked = serializers.SerializerMethodField()
+    disliked = serializers.SerializerMethodField()
+    # Resized variants from social_admin.media: media_preview is the feed-sized image
+    # (the poster frame for videos); media_renditions lists every size for srcset
+    media_preview = serializers.SerializerMethodField()
+    media_renditions = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
-        fields = ['id', 'title', 'caption', 'media_file', 'media_type', 'community', 'community_name',
-                  'postedby', 'likes_count', 'dislikes_count', 'comments_count', 'status', 'created_at']
+        fields = ['id', 'title', 'caption', 'media_file', 'media_type', 'media_mime', 'media_width',
+                  'media_height', 'media_status', 'media_preview', 'media_renditions',
+                  'community', 'community_name',
+                  'postedby', 'likes_count', 'dislikes_count', 'comments_count', 'liked', 'disliked',
+                  'status', 'created_at']
         extra_kwargs = {
             'community': {'required': False, 'allow_null': True},
             'title': {'required': False},
             'caption': {'required': False},
             'media_file': {'required': False, 'allow_null': True},
         }
+        read_only_fields = ['likes_count', 'dislikes_count', 'comments_count', 'media_mime', 'media_width',
+                            'media_height', 'media_status']
+
+    def get_media_preview(self, obj):
+        kind = 'poster' if obj.media_type == 'video' else 'image'
+        return media.url(media.pick(obj.media_renditions, media.PREVIEW_WIDTH, kind=kind))
+
+    def get_media_renditions(self, obj):
+        return media.rendition_urls(obj.media_renditions)
+
+    # Annotated by Post.objects.for_listing(user); anonymous viewers get False
+    def get_liked(self, obj):
+        return getattr(obj, 'liked', False)
+
+    def get_disliked(self, obj):
+        return getattr(obj, 'disliked', False)
+
 
-    def get_dislikes_count(self, obj):
-        # If view has annotated or set attribute, use it; otherwise default to 0
-        return getattr(obj, 'dislikes_count', 0)
-        
 class CommentSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     replies = serializers.SerializerMethodField()
+    reply_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Comment
-        fields = ['id', 'post', 'user', 'text', 'parent', 'replies', 'created_at']
+        fields = ['id', 'post', 'user', 'text', 'parent', 'replies', 'reply_count', 'created_at']
 
+    # Filled in by comment_threads.attach_replies; a comment loaded on its own has none attached
     def get_replies(self, obj):
-        return CommentSerializer(obj.replies.all(), many=True).data
+        return CommentSerializer(getattr(obj, 'thread_replies', []), many=True).data
+
+    def get_reply_count(self, obj):
+        return getattr(obj, 'reply_count', 0)
 
 
 class LikeSerializer(serializers.ModelSerializer):
@@ -86,7 +119,11 @@ class ChatSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'participants', 'last_message', 'created_at']
 
     def get_last_message(self, obj):
-        msg = obj.messages.last()
+        # chats_view attaches the message from ChatState so the inbox needs no per-chat query
+        if hasattr(obj, 'inbox_last_message'):
+            msg = obj.inbox_last_message
+        else:
+            msg = obj.messages.last()
         return MessageSerializer(msg).data if msg else None
 
 
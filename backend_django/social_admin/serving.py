@@ -0,0 +1,167 @@
+# Media file responses for MEDIA_URL. Supports single byte ranges (video
+# seeking), strong ETags taken from the file's content hash, conditional
+# requests, and long-lived immutable caching for names that carry their own
+# content hash (the media pipeline's renditions). With MEDIA_SENDFILE set the
+# worker only checks the request and answers with headers; the front proxy
+# (nginx X-Accel-Redirect, Apache/lighttpd X-Sendfile) streams the bytes.
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
+from django.utils.http import http_date, parse_etags, quote_etag
+
+from .media import HASH_LENGTH
+from .storage import BLOB_PREFIX
+
+
+SENDFILE = getattr(settings, 'MEDIA_SENDFILE', None)  # None, 'x-accel-redirect' or 'x-sendfile'
+ACCEL_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+CACHE_SECONDS = getattr(settings, 'MEDIA_CACHE_SECONDS', 3600)
+IMMUTABLE_SECONDS = 365 * 24 * 3600
+READ_SIZE = 64 * 1024
+
+# <anything>.<content hash>.<ext> and blobs/../../<sha256>.<ext>: the bytes behind such a name never change
+HASHED_NAME_RE = re.compile(r'(?:\.([0-9a-f]{%d})|^%s[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64}))\.[A-Za-z0-9]+$'
+                            % (HASH_LENGTH, BLOB_PREFIX))
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+ETAG_KEY = 'media_etag:{name}:{size}:{mtime}'
+ETAG_TIMEOUT = 7 * 24 * 3600
+
+
+class RangeFile:
+    """Read-only view of `length` bytes of an open file, starting where it is positioned."""
+
+    def __init__(self, handle, length):
+        self.handle = handle
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.handle.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.handle.close()
+
+
+def etag(name, path, stat):
+    """Strong ETag from the content hash: read from a hashed name, else computed once per file version."""
+    match = HASHED_NAME_RE.search(name)
+    if match:
+        return quote_etag(match.group(1) or match.group(2))
+    key = ETAG_KEY.format(name=hashlib.md5(name.encode()).hexdigest(), size=stat.st_size, mtime=stat.st_mtime_ns)
+    value = cache.get(key)
+    if value is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as handle:
+            for piece in iter(lambda: handle.read(READ_SIZE), b''):
+                digest.update(piece)
+        value = digest.hexdigest()[:32]
+        cache.set(key, value, ETAG_TIMEOUT)
+    return quote_etag(value)
+
+
+def byte_range(header, size):
+    """
+    (start, end) inclusive for a single-range Range header, None to send the
+    whole file (no header, several ranges, or junk), or 'unsatisfiable'.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match or size == 0:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # suffix range: the last N bytes
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return 'unsatisfiable'
+    if end < start:
+        return None
+    return start, end
+
+
+def serve(request, name):
+    try:
+        path = default_storage.path(name)
+    except SuspiciousFileOperation:
+        raise Http404
+    except NotImplementedError:
+        # remote storage (S3...) serves its own files
+        return HttpResponseRedirect(default_storage.url(name))
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(path):
+        raise Http404
+
+    tag = etag(name, path, stat)
+    headers = {
+        'ETag': tag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': (
+            f'public, max-age={IMMUTABLE_SECONDS}, immutable' if HASHED_NAME_RE.search(name)
+            else f'public, max-age={CACHE_SECONDS}'
+        ),
+    }
+    candidates = parse_etags(request.headers.get('If-None-Match', ''))
+    if '*' in candidates or tag in candidates:
+        response = HttpResponse(status=304)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type, encoding = mimetypes.guess_type(path)
+    content_type = content_type or 'application/octet-stream'
+
+    if SENDFILE:
+        # the proxy handles Range itself and streams the file
+        response = HttpResponse(content_type=content_type)
+        if SENDFILE == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = quote(ACCEL_PREFIX.rstrip('/') + '/' + name)
+        else:
+            response['X-Sendfile'] = path
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    requested = byte_range(request.headers.get('Range'), stat.st_size)
+    if_range = request.headers.get('If-Range')
+    if requested and if_range and if_range != tag:
+        # the client's partial copy is of another version: send it all
+        requested = None
+    if requested == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    handle = open(path, 'rb')
+    if requested:
+        start, end = requested
+        handle.seek(start)
+        response = FileResponse(RangeFile(handle, end - start + 1), status=206, content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    else:
+        response = FileResponse(handle, content_type=content_type)
+        response['Content-Length'] = stat.st_size
+    if encoding:
+        response['Content-Encoding'] = encoding
+    for header, value in headers.items():
+        response[header] = value
+    return response
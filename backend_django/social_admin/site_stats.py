@@ -0,0 +1,186 @@
+# Admin dashboard statistics without COUNT(*) scans. Running totals live in
+# SiteCounter rows and new-rows-per-day in DailyStat; model signals keep both
+# current, applying each change after its transaction commits so a rolled back
+# save never counts and the counter rows are only locked briefly.
+# `manage.py rollup_site_stats` recounts from the tables to repair drift from
+# bulk operations (QuerySet.update, bulk_create) that send no signals.
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+from .models import Comment, Community, DailyStat, Post, Report, SiteCounter, User
+
+
+CACHE_SECONDS = 30
+TOTALS_KEY = 'site_stats:totals'
+SERIES_KEY = 'site_stats:series:{days}'
+DEFAULT_SERIES_DAYS = 30
+
+# total name -> rows it counts
+TOTALS = {
+    'users': lambda: User.objects.filter(is_active=True),
+    'communities': lambda: Community.objects.all(),
+    'posts': lambda: Post.objects.all(),
+    'comments': lambda: Comment.objects.all(),
+    'open_reports': lambda: Report.objects.filter(resolved=False),
+}
+
+# model -> {total name: whether this instance is part of it}
+MEMBERSHIP = {
+    User: lambda user: {'users': user.is_active},
+    Community: lambda community: {'communities': True},
+    Post: lambda post: {'posts': True},
+    Comment: lambda comment: {'comments': True},
+    Report: lambda report: {'open_reports': not report.resolved},
+}
+
+# models whose membership depends on a field, so saves must compare with the loaded state
+STATEFUL = (User, Report)
+
+# daily metric -> model counted by created_at
+DAILY = {
+    'new_users': User,
+    'posts': Post,
+    'comments': Comment,
+    'reports': Report,
+}
+DAILY_METRIC = {model: metric for metric, model in DAILY.items()}
+
+
+def totals():
+    """{name: value} for every entry of TOTALS; one small indexed read, cached briefly."""
+    values = cache.get(TOTALS_KEY)
+    if values is None:
+        values = dict(SiteCounter.objects.filter(name__in=TOTALS).values_list('name', 'value'))
+        for name in TOTALS:
+            if name not in values:
+                values[name] = _initialize(name)
+        cache.set(TOTALS_KEY, values, CACHE_SECONDS)
+    return values
+
+
+def series(days=DEFAULT_SERIES_DAYS, today=None):
+    """{metric: [(day, value), ...]} for the last `days` days, oldest first, gaps filled with 0."""
+    key = SERIES_KEY.format(days=days)
+    result = None if today else cache.get(key)
+    if result is None:
+        today = today or timezone.localdate()
+        days_range = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+        found = {
+            (metric, day): value
+            for metric, day, value in DailyStat.objects
+            .filter(metric__in=DAILY, day__gte=days_range[0], day__lte=today)
+            .values_list('metric', 'day', 'value')
+        }
+        result = {metric: [(day, found.get((metric, day), 0)) for day in days_range] for metric in DAILY}
+        cache.set(key, result, CACHE_SECONDS)
+    return result
+
+
+def _initialize(name):
+    """Create a missing counter from a real count (once, on first use)."""
+    value = TOTALS[name]().count()
+    try:
+        with transaction.atomic():
+            SiteCounter.objects.create(name=name, value=value)
+    except IntegrityError:
+        # initialized concurrently; that count is as good as ours
+        value = SiteCounter.objects.get(name=name).value
+    return value
+
+
+def _add_total(name, delta):
+    if not SiteCounter.objects.filter(name=name).update(value=F('value') + delta):
+        # the fresh count already includes the committed change
+        _initialize(name)
+
+
+def _add_daily(metric, day, delta):
+    if DailyStat.objects.filter(metric=metric, day=day).update(value=F('value') + delta):
+        return
+    try:
+        with transaction.atomic():
+            DailyStat.objects.create(metric=metric, day=day, value=delta)
+    except IntegrityError:
+        DailyStat.objects.filter(metric=metric, day=day).update(value=F('value') + delta)
+
+
+def _apply(total_deltas, daily=None):
+    for name, delta in total_deltas.items():
+        _add_total(name, delta)
+    if daily is not None:
+        _add_daily(*daily, 1)
+    cache.delete_many([TOTALS_KEY, SERIES_KEY.format(days=DEFAULT_SERIES_DAYS)])
+
+
+def rollup(days=None):
+    """
+    Recount every total and rebuild the daily series for the last `days` days
+    (all history when None). Returns the fresh totals.
+    """
+    values = {}
+    for name, rows in TOTALS.items():
+        values[name] = rows().count()
+        SiteCounter.objects.update_or_create(name=name, defaults={'value': values[name]})
+
+    start = timezone.localdate() - timedelta(days=days - 1) if days else None
+    for metric, model in DAILY.items():
+        rows = model.objects.all()
+        if start is not None:
+            # a datetime bound (not created_at__date) keeps the created_at index usable
+            rows = rows.filter(created_at__gte=timezone.make_aware(datetime.combine(start, time.min)))
+        per_day = rows.annotate(day=TruncDate('created_at')).values('day').annotate(n=Count('id')).order_by()
+        with transaction.atomic():
+            stale = DailyStat.objects.filter(metric=metric)
+            if start is not None:
+                stale = stale.filter(day__gte=start)
+            stale.delete()
+            DailyStat.objects.bulk_create([
+                DailyStat(metric=metric, day=row['day'], value=row['n']) for row in per_day
+            ])
+
+    cache.delete_many([TOTALS_KEY, SERIES_KEY.format(days=DEFAULT_SERIES_DAYS)])
+    return values
+
+
+# ---------------------------------------------------------------------------
+# Signals
+# ---------------------------------------------------------------------------
+
+def _on_init(sender, instance, **kwargs):
+    instance._site_stats_counted = MEMBERSHIP[sender](instance)
+
+
+def _on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    now = MEMBERSHIP[sender](instance)
+    before = {} if created else getattr(instance, '_site_stats_counted', now)
+    instance._site_stats_counted = now
+
+    deltas = {name: int(counted) - int(before.get(name, False)) for name, counted in now.items()}
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    daily = None
+    if created and sender in DAILY_METRIC:
+        daily = (DAILY_METRIC[sender], timezone.localdate(instance.created_at))
+    if deltas or daily:
+        transaction.on_commit(lambda: _apply(deltas, daily))
+
+
+def _on_delete(sender, instance, **kwargs):
+    deltas = {name: -1 for name, counted in MEMBERSHIP[sender](instance).items() if counted}
+    if deltas:
+        transaction.on_commit(lambda: _apply(deltas))
+
+
+def connect_signals():
+    for model in MEMBERSHIP:
+        post_save.connect(_on_save, sender=model, dispatch_uid=f'site-stats-save-{model.__name__}')
+        post_delete.connect(_on_delete, sender=model, dispatch_uid=f'site-stats-delete-{model.__name__}')
+    for model in STATEFUL:
+        post_init.connect(_on_init, sender=model, dispatch_uid=f'site-stats-init-{model.__name__}')
@@ -0,0 +1,284 @@
+# Content-addressed media storage. Every saved file is hashed and stored once
+# under blobs/<aa>/<bb>/<sha256><ext>, so a meme or avatar uploaded a thousand
+# times takes the space of one. Each save() takes a reference on the blob
+# (a Blob row) and each delete() gives one back; the bytes are removed with the
+# last reference. Model signals release the files of deleted posts,
+# communities and users and of replaced uploads, so callers keep using plain
+# save/delete. `manage.py dedupe_media` moves existing files into the store
+# and recounts the references from the tables.
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.utils import timezone
+
+from .models import Blob, Community, Post, Upload, User
+
+
+BLOB_PREFIX = 'blobs/'
+TEMP_DIR = BLOB_PREFIX + 'tmp'
+# chunked uploads are written in place, so they cannot live at a content address until complete
+PLAIN_PREFIXES = ('uploads/',)
+READ_SIZE = 64 * 1024
+# blob names are 76 characters plus the extension and must fit the 100 of a FileField
+EXTENSION_RE = re.compile(r'^\.[a-z0-9]{1,10}$')
+
+# model -> file fields whose files belong to the row
+FILE_FIELDS = {
+    Post: ('media_file',),
+    User: ('profile_pic',),
+    Community: ('thumbnail',),
+}
+# model -> JSON list of {'name': ...} renditions owned by the row
+RENDITION_FIELDS = {
+    Post: 'media_renditions',
+    User: 'profile_pic_renditions',
+}
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def __init__(self, plain_prefixes=PLAIN_PREFIXES, **kwargs):
+        super().__init__(**kwargs)
+        self.plain_prefixes = tuple(plain_prefixes)
+
+    def _save(self, name, content):
+        if name.startswith(self.plain_prefixes):
+            return super()._save(name, content)
+
+        os.makedirs(self.path(TEMP_DIR), exist_ok=True)
+        handle, temp = tempfile.mkstemp(dir=self.path(TEMP_DIR))
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(handle, 'wb') as out:
+                for chunk in content.chunks():
+                    out.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            return self._store(temp, digest.hexdigest(), _extension(name), size)
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+    def adopt(self, name):
+        """Move a stored file into the blob store (dropping it if the content is already there); returns the blob name."""
+        if name.startswith(BLOB_PREFIX):
+            return name
+        path = self.path(name)
+        digest = hashlib.sha256()
+        with open(path, 'rb') as handle:
+            for piece in iter(lambda: handle.read(READ_SIZE), b''):
+                digest.update(piece)
+        try:
+            return self._store(path, digest.hexdigest(), _extension(name), os.path.getsize(path))
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _store(self, source, digest, ext, size):
+        """Take a reference on the blob for `digest`, moving `source` into place if it is new."""
+        name = f'{BLOB_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+        path = self.path(name)
+        with transaction.atomic():
+            # the row lock taken by the update keeps a concurrent delete from removing the file under us
+            if not Blob.objects.filter(name=name).update(refs=F('refs') + 1, updated_at=timezone.now()):
+                try:
+                    with transaction.atomic():
+                        Blob.objects.create(name=name, size=size, refs=1)
+                except IntegrityError:
+                    Blob.objects.filter(name=name).update(refs=F('refs') + 1, updated_at=timezone.now())
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(source, path)
+                os.chmod(path, self.file_permissions_mode or 0o644)
+        return name
+
+    def delete(self, name):
+        if not name or not name.startswith(BLOB_PREFIX):
+            return super().delete(name)
+        with transaction.atomic():
+            blob = Blob.objects.select_for_update().filter(name=name).first()
+            if blob is not None and blob.refs > 1:
+                Blob.objects.filter(pk=blob.pk).update(refs=F('refs') - 1, updated_at=timezone.now())
+                return
+            if blob is not None:
+                blob.delete()
+            super().delete(name)
+
+
+def _extension(name):
+    """The lowercased extension of `name`, or '' when the client sent something that is not a short plain one."""
+    ext = os.path.splitext(name)[1].lower()
+    return ext if EXTENSION_RE.match(ext) else ''
+
+
+def release(names):
+    for name in names:
+        if name:
+            default_storage.delete(name)
+
+
+def _file_names(instance):
+    """{field: stored name} for the file fields loaded on `instance` (deferred ones are left out)."""
+    names = {}
+    for field in FILE_FIELDS[type(instance)]:
+        if field in instance.__dict__:
+            value = instance.__dict__[field]
+            names[field] = getattr(value, 'name', value) or ''
+    return names
+
+
+# ---------------------------------------------------------------------------
+# Maintenance (manage.py dedupe_media)
+# ---------------------------------------------------------------------------
+
+def dedupe_existing():
+    """
+    Move every file referenced by FILE_FIELDS and RENDITION_FIELDS that is not
+    a blob yet into the store and repoint the rows (bulk updates, so no signals).
+    Returns (files moved, distinct blobs they became).
+    """
+    moved = {}
+
+    def move(name):
+        if not name or name.startswith(BLOB_PREFIX):
+            return name
+        if name not in moved:
+            moved[name] = default_storage.adopt(name) if default_storage.exists(name) else name
+        return moved[name]
+
+    for model, fields in FILE_FIELDS.items():
+        for field in fields:
+            names = (model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+                     .exclude(**{f'{field}__startswith': BLOB_PREFIX})
+                     .values_list(field, flat=True).distinct())
+            for name in list(names):
+                if move(name) != name:
+                    model.objects.filter(**{field: name}).update(**{field: move(name)})
+
+    for model, field in RENDITION_FIELDS.items():
+        for pk, renditions in model.objects.exclude(**{field: []}).values_list('pk', field).iterator():
+            changed = False
+            for rendition in renditions or []:
+                name = move(rendition['name'])
+                if name != rendition['name']:
+                    rendition['name'] = name
+                    changed = True
+            if changed:
+                model.objects.filter(pk=pk).update(**{field: renditions})
+
+    adopted = {old: new for old, new in moved.items() if old != new}
+    return len(adopted), len(set(adopted.values()))
+
+
+def recount(hours=1):
+    """
+    Reset every blob's refs to the number of rows referring to it and delete
+    blobs (and stray files) nothing refers to. Rows and files touched in the
+    last `hours` are left alone, so uploads in flight are not lost.
+    Returns (blobs kept, blobs removed).
+    """
+    counts = Counter()
+    for model, fields in FILE_FIELDS.items():
+        for field in fields:
+            counts.update(model.objects.filter(**{f'{field}__startswith': BLOB_PREFIX})
+                          .values_list(field, flat=True).iterator())
+    for model, field in RENDITION_FIELDS.items():
+        for renditions in model.objects.exclude(**{field: []}).values_list(field, flat=True).iterator():
+            counts.update(r['name'] for r in renditions or [] if r['name'].startswith(BLOB_PREFIX))
+    counts.update(Upload.objects.filter(status='complete', file__startswith=BLOB_PREFIX)
+                  .values_list('file', flat=True))
+
+    cutoff = timezone.now() - timedelta(hours=hours)
+    kept = removed = 0
+    tracked = set()
+    for blob in Blob.objects.iterator():
+        tracked.add(blob.name)
+        refs = counts.pop(blob.name, 0)
+        if blob.updated_at >= cutoff:
+            kept += 1
+        elif refs:
+            if refs != blob.refs:
+                Blob.objects.filter(pk=blob.pk, updated_at=blob.updated_at).update(refs=refs)
+            kept += 1
+        else:
+            blob.delete()
+            FileSystemStorage.delete(default_storage, blob.name)
+            removed += 1
+
+    # referenced files the table lost track of
+    for name, refs in counts.items():
+        if default_storage.exists(name):
+            Blob.objects.get_or_create(name=name, defaults={'size': default_storage.size(name), 'refs': refs})
+            tracked.add(name)
+            kept += 1
+
+    # files left behind by saves whose transaction rolled back
+    root = default_storage.path(BLOB_PREFIX)
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, default_storage.location).replace(os.sep, '/')
+            if name not in tracked and os.path.getmtime(path) < cutoff.timestamp():
+                os.remove(path)
+                removed += 1
+    return kept, removed
+
+
+# ---------------------------------------------------------------------------
+# Signals
+# ---------------------------------------------------------------------------
+
+def _on_init(sender, instance, **kwargs):
+    instance._stored_files = _file_names(instance)
+
+
+def _on_pre_save(sender, instance, update_fields=None, **kwargs):
+    # fields holding a newly assigned file, which FileField.pre_save is about to store
+    instance._storing_files = {
+        field for field in FILE_FIELDS[sender]
+        if field in instance.__dict__ and (update_fields is None or field in update_fields)
+        and getattr(instance, field) and not getattr(instance, field)._committed
+    }
+
+
+def _on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    before = getattr(instance, '_stored_files', {})
+    now = _file_names(instance)
+    stored = getattr(instance, '_storing_files', set())
+    instance._stored_files = now
+    instance._storing_files = set()
+    if raw or created:
+        return
+    # a new name gives back the old file; so does the same content stored again, since
+    # the store took a second reference on a blob the row already held one on
+    replaced = [
+        before[field] for field, name in now.items()
+        if field in before and (update_fields is None or field in update_fields)
+        and (before[field] != name or (field in stored and name.startswith(BLOB_PREFIX)))
+    ]
+    if replaced:
+        transaction.on_commit(lambda: release(replaced))
+
+
+def _on_delete(sender, instance, **kwargs):
+    names = list(_file_names(instance).values())
+    if sender in RENDITION_FIELDS:
+        names += [rendition['name'] for rendition in instance.__dict__.get(RENDITION_FIELDS[sender]) or []]
+    if any(names):
+        transaction.on_commit(lambda: release(names))
+
+
+def connect_signals():
+    for model in FILE_FIELDS:
+        post_init.connect(_on_init, sender=model, dispatch_uid=f'storage-init-{model.__name__}')
+        pre_save.connect(_on_pre_save, sender=model, dispatch_uid=f'storage-pre-save-{model.__name__}')
+        post_save.connect(_on_save, sender=model, dispatch_uid=f'storage-save-{model.__name__}')
+        post_delete.connect(_on_delete, sender=model, dispatch_uid=f'storage-delete-{model.__name__}')
@@ -0,0 +1,247 @@
+# Durable background tasks in a database table. Views enqueue slow side
+# effects (feed cleanup, cascading deletes, notifications)
+# in their own transaction, so a task exists exactly when the change that
+# caused it committed, and `manage.py run_tasks` workers run them outside the
+# request. Workers claim rows with SELECT ... FOR UPDATE SKIP LOCKED, so any
+# number can share the table; failures retry with exponential backoff until
+# max_attempts, then stay as 'failed' rows with the traceback. A task is the
+# dotted path of a module-level function plus JSON arguments. A job's writes
+# and the removal of its row commit together while the row stays locked, so
+# database work runs once even if a worker dies mid-task; side effects outside
+# the database (files, published events) may repeat and must tolerate that.
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import comment_threads, feed
+from .models import Comment, Community, Notification, Post, Task, User
+
+
+logger = logging.getLogger(__name__)
+
+HIGH = 0
+NORMAL = 5
+LOW = 9
+
+MAX_ATTEMPTS = getattr(settings, 'TASK_MAX_ATTEMPTS', 5)
+RETRY_DELAY = getattr(settings, 'TASK_RETRY_DELAY', 30)  # seconds before the first retry; doubles each time
+MAX_RETRY_DELAY = 6 * 3600
+# a running task whose worker has been silent this long is given to another worker
+LEASE_SECONDS = getattr(settings, 'TASK_LEASE_SECONDS', 600)
+
+
+def enqueue(func, *args, priority=NORMAL, delay=0, max_attempts=MAX_ATTEMPTS):
+    """Queue func(*args); the row commits or rolls back with the caller's transaction."""
+    return Task.objects.create(
+        name=f'{func.__module__}.{func.__name__}',
+        args=list(args),
+        priority=priority,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts,
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker, limit=10):
+    """Lock up to `limit` due tasks, most urgent first, and mark them running for `worker`."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', run_after__lte=now)
+            .order_by('priority', 'run_after', 'id')[:limit]
+        )
+        if batch:
+            Task.objects.filter(pk__in=[task.pk for task in batch]).update(
+                status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1)
+    for task in batch:
+        task.attempts += 1
+        task.status, task.locked_by, task.locked_at = 'running', worker, now
+    return batch
+
+
+def run(task):
+    """
+    Run one claimed task in its own transaction; True if it succeeded, None if
+    it was no longer ours (its lease ran out and another worker took it).
+    """
+    try:
+        with transaction.atomic():
+            # locks the row for the whole run and renews the lease: requeue_stale
+            # skips locked rows, so no other worker can pick the task up meanwhile
+            if not Task.objects.filter(pk=task.pk, status='running', locked_by=task.locked_by).update(
+                    locked_at=timezone.now()):
+                return None
+            import_string(task.name)(*task.args)
+            Task.objects.filter(pk=task.pk).delete()
+    except Exception:
+        logger.exception('task %s %s%r failed (attempt %s)', task.pk, task.name, task.args, task.attempts)
+        _failed(task, traceback.format_exc())
+        return False
+    return True
+
+
+def _failed(task, error):
+    if task.attempts >= task.max_attempts:
+        Task.objects.filter(pk=task.pk).update(status='failed', last_error=error, locked_by='', locked_at=None)
+        return
+    delay = min(RETRY_DELAY * 2 ** (task.attempts - 1), MAX_RETRY_DELAY)
+    Task.objects.filter(pk=task.pk).update(
+        status='queued', last_error=error, locked_by='', locked_at=None,
+        run_after=timezone.now() + timedelta(seconds=delay))
+
+
+def requeue_stale(lease=LEASE_SECONDS):
+    """Give tasks of workers that died mid-run back to the queue (or fail them if out of attempts)."""
+    with transaction.atomic():
+        # a task being run is locked by its worker; only unlocked ones are really abandoned
+        stale = Task.objects.filter(pk__in=list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status='running', locked_at__lt=timezone.now() - timedelta(seconds=lease))
+            .values_list('pk', flat=True)
+        ))
+        failed = stale.filter(attempts__gte=F('max_attempts')).update(
+            status='failed', last_error='worker lost', locked_by='', locked_at=None)
+        return failed + stale.update(status='queued', locked_by='', locked_at=None)
+
+
+def release(tasks):
+    """Hand claimed tasks that were never started back to the queue."""
+    for task in tasks:
+        Task.objects.filter(pk=task.pk, status='running', locked_by=task.locked_by).update(
+            status='queued', locked_by='', locked_at=None, attempts=F('attempts') - 1)
+
+
+def work(worker=None, batch=10, idle_sleep=1.0, once=False, should_stop=lambda: False):
+    """
+    Run tasks until `should_stop()` (or, with `once`, until nothing is due).
+    Returns (succeeded, failed).
+    """
+    worker = worker or worker_name()
+    succeeded = failed = 0
+    last_requeue = 0
+    while not should_stop():
+        if time.monotonic() - last_requeue > LEASE_SECONDS / 10:
+            requeue_stale()
+            last_requeue = time.monotonic()
+        tasks = claim(worker, batch)
+        if not tasks:
+            if once:
+                break
+            close_old_connections()
+            time.sleep(idle_sleep)
+            continue
+        for position, task in enumerate(tasks):
+            if should_stop():
+                release(tasks[position:])
+                break
+            result = run(task)
+            if result:
+                succeeded += 1
+            elif result is False:
+                failed += 1
+        close_old_connections()
+    return succeeded, failed
+
+
+def pending(func):
+    """Argument lists of the queued or running tasks for `func`."""
+    return list(
+        Task.objects.filter(name=f'{func.__module__}.{func.__name__}', status__in=('queued', 'running'))
+        .values_list('args', flat=True)
+    )
+
+
+def depth():
+    return Task.objects.filter(status='queued').count()
+
+
+class QueueRunner:
+    """MEDIA_PIPELINE backend that hands media jobs to the run_tasks workers instead of threads in the web process."""
+
+    def __init__(self, priority=LOW, **options):
+        self.priority = priority
+
+    def submit(self, func, *args):
+        enqueue(func, *args, priority=self.priority)
+
+
+# ---------------------------------------------------------------------------
+# Jobs
+# ---------------------------------------------------------------------------
+
+def notify_later(recipient_id, actor, verb, target=None):
+    """
+    Queue a notification for `recipient_id` unless the actor is notifying
+    themselves or the same notification is still unread, so a like toggled
+    over and over does not add a task row per tap.
+    """
+    if recipient_id is None or recipient_id == actor.pk:
+        return
+    target_type = (target._meta.app_label, target._meta.model_name) if target is not None else None
+    object_id = getattr(target, 'pk', None)
+    if Notification.objects.filter(unread=True, **_notification_fields(
+            recipient_id, actor.pk, verb, target_type, object_id)).exists():
+        return
+    enqueue(create_notification, recipient_id, actor.pk, verb, target_type, object_id, priority=LOW)
+
+
+def _notification_fields(recipient_id, actor_id, verb, target_type, object_id):
+    content_type = ContentType.objects.get_by_natural_key(*target_type) if target_type else None
+    return dict(recipient_id=recipient_id, actor_id=actor_id, verb=verb,
+                content_type=content_type, object_id=object_id)
+
+
+def create_notification(recipient_id, actor_id, verb, target_type, object_id):
+    fields = _notification_fields(recipient_id, actor_id, verb, target_type, object_id)
+    # like/unlike/like again (or a follow toggled twice) while the first one is unread: keep one
+    if not Notification.objects.filter(unread=True, **fields).exists():
+        Notification.objects.create(**fields)
+
+
+def fan_out_post(post_id):
+    post = Post.objects.filter(pk=post_id).select_related('postedby').first()
+    if post is not None:
+        feed.fan_out_post(post)
+
+
+def drop_blocked_feeds(user_id, target_id):
+    """Feed cleanup after a block: neither user keeps the other's posts in their inbox."""
+    user = User.objects.filter(pk=user_id).first()
+    target = User.objects.filter(pk=target_id).first()
+    if user is None or target is None:
+        return
+    feed.on_unfollow(user, target)
+    feed.on_unfollow(target, user)
+
+
+def delete_community(community_id):
+    # posts, memberships, comments, likes and feed entries cascade; their signals keep the counters right
+    community = Community.objects.filter(pk=community_id).first()
+    if community is not None:
+        community.delete()
+
+
+def delete_post(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        post.delete()
+
+
+def delete_comment_thread(comment_id):
+    comment = Comment.objects.filter(pk=comment_id).first()
+    if comment is not None:
+        comment_threads.delete_thread(comment)
@@ -0,0 +1,139 @@
+import random
+import shutil
+import tempfile
+import threading
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import counters, feed, storage, trending
+from .models import Blob, Community, Like, Post, User
+
+
+class PostListingQueryCountTests(TestCase):
+    """Post endpoints run a fixed number of queries however many posts they return."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('viewer@example.com', 'password')
+        self.other = User.objects.create_user('author@example.com', 'password')
+        self.community = Community.objects.create(name='Listing', creater=self.other)
+        self.community.members.add(self.user)
+        self.user.following.add(self.other)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_posts(self, count):
+        for i in range(count):
+            for author in (self.user, self.other):
+                post = Post.objects.create(caption=f'post {i}', postedby=author, community=self.community)
+                Like.objects.create(user=self.user, post=post, type='like')
+                trending.record_engagement(post.id, likes=1)
+                feed.fan_out_post(post)
+        call_command('compute_trending', stdout=StringIO())
+        cache.clear()
+
+    def assertConstantQueries(self, url):
+        self.add_posts(2)
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        self.add_posts(10)
+        with self.assertNumQueries(len(few)):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_latest_posts(self):
+        self.assertConstantQueries('/api/latest_post')
+
+    def test_popular_posts(self):
+        self.assertConstantQueries('/api/popular_posts')
+
+    def test_trending_posts(self):
+        self.assertConstantQueries('/api/trending_posts')
+
+    def test_stream_posts(self):
+        self.assertConstantQueries('/api/stream_posts')
+
+    def test_community_posts(self):
+        self.assertConstantQueries(f'/api/community_posts/{self.community.id}')
+
+    def test_my_posts(self):
+        self.assertConstantQueries('/api/my_posts')
+
+    def test_user_posts(self):
+        self.assertConstantQueries(f'/api/user_posts/{self.other.id}/')
+
+    def test_profile_dashboard(self):
+        self.assertConstantQueries('/api/profile_dashboard')
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class LikeToggleConcurrencyTests(TransactionTestCase):
+    """Concurrent like/dislike taps leave the stored counters equal to a recount of the rows."""
+
+    THREADS = 8
+    TAPS = 25
+
+    def test_counters_match_rows(self):
+        author = User.objects.create_user('author@example.com', 'password')
+        post = Post.objects.create(caption='hot', postedby=author)
+        users = [User.objects.create_user(f'fan{i}@example.com', 'password') for i in range(self.THREADS)]
+        start = threading.Barrier(self.THREADS)
+        errors = []
+
+        def tap(user, seed):
+            client = APIClient()
+            client.force_authenticate(user)
+            choices = random.Random(seed)
+            try:
+                start.wait()
+                for _ in range(self.TAPS):
+                    action = choices.choice(['like', 'dislike'])
+                    response = client.post(f'/api/like_dislike/{post.id}', {'action': action}, format='json')
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=tap, args=(user, seed)) for seed, user in enumerate(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        counters.get_counters().flush()
+
+        self.assertEqual(errors, [])
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, Like.objects.filter(post=post, type='like').count())
+        self.assertEqual(post.dislikes_count, Like.objects.filter(post=post, type='dislike').count())
+
+
+class BlobReferenceTests(TestCase):
+    """Every row holds exactly one reference on each blob it points at."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user('owner@example.com', 'password')
+
+    def test_saving_the_same_file_twice_keeps_one_reference(self):
+        post = Post.objects.create(caption='same bytes', postedby=self.user)
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                post.media_file = SimpleUploadedFile('photo.png', b'identical content')
+                post.save()
+            post = Post.objects.get(pk=post.pk)
+        self.assertTrue(post.media_file.name.startswith(storage.BLOB_PREFIX))
+        self.assertEqual(Blob.objects.get(name=post.media_file.name).refs, 1)
@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import response_cache
+from .models import Post, PostEngagementBucket, TrendingPost
+
+
+DEFAULT_WINDOW_HOURS = 48
+DEFAULT_TOP_K = 100
+
+
+def current_hour(now=None):
+    now = now or timezone.now()
+    return now.replace(minute=0, second=0, microsecond=0)
+
+
+def record_engagement(post_id, likes=0, comments=0):
+    """Add like/comment deltas (negative for removals) to the post's bucket for this hour."""
+    if not likes and not comments:
+        return
+    hour = current_hour()
+    updated = PostEngagementBucket.objects.filter(post_id=post_id, hour=hour).update(
+        likes=F('likes') + likes,
+        comments=F('comments') + comments,
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            PostEngagementBucket.objects.create(post_id=post_id, hour=hour, likes=likes, comments=comments)
+    except IntegrityError:
+        # another request created the bucket first
+        PostEngagementBucket.objects.filter(post_id=post_id, hour=hour).update(
+            likes=F('likes') + likes,
+            comments=F('comments') + comments,
+        )
+
+
+def rebuild_trending(hours=DEFAULT_WINDOW_HOURS, top_k=DEFAULT_TOP_K, now=None):
+    """
+    Score active posts from the last `hours` by engagement per hour of age and
+    replace the TrendingPost table with the top_k results.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(hours=hours)
+
+    totals = (
+        PostEngagementBucket.objects
+        .filter(hour__gte=current_hour(cutoff), post__status='active', post__created_at__gte=cutoff)
+        .values('post_id', 'post__created_at')
+        .annotate(likes_total=Sum('likes'), comments_total=Sum('comments'))
+    )
+
+    scored = []
+    for row in totals:
+        engagement = max(0, row['likes_total'] or 0) + max(0, row['comments_total'] or 0)
+        hours_since = max(1.0, (now - row['post__created_at']).total_seconds() / 3600.0)
+        scored.append(TrendingPost(
+            post_id=row['post_id'],
+            score=engagement / hours_since,
+            engagement=engagement,
+            hours_since=hours_since,
+        ))
+
+    # Posts with no engagement yet still show up (score 0), newest first
+    if len(scored) < top_k:
+        seen = {t.post_id for t in scored}
+        quiet = (
+            Post.objects
+            .filter(status='active', created_at__gte=cutoff)
+            .exclude(id__in=seen)
+            .order_by('-created_at')
+            .values_list('id', 'created_at')[:top_k - len(scored)]
+        )
+        for post_id, created_at in quiet:
+            hours_since = max(1.0, (now - created_at).total_seconds() / 3600.0)
+            scored.append(TrendingPost(post_id=post_id, score=0, engagement=0, hours_since=hours_since))
+
+    scored.sort(key=lambda t: t.score, reverse=True)
+    ranked = scored[:top_k]
+
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(ranked)
+        response_cache.bump('trending')
+    return ranked
+
+
+def prune_buckets(keep_hours):
+    cutoff = current_hour(timezone.now() - timedelta(hours=keep_hours))
+    deleted, _ = PostEngagementBucket.objects.filter(hour__lt=cutoff).delete()
+    return deleted
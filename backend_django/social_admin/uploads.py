@@ -0,0 +1,210 @@
+# Resumable chunked uploads for large media. A client starts an upload
+# (filename, size, optional sha256 of the whole file), PUTs the bytes in
+# chunks at the offset the server reports, then completes it. Chunks are
+# streamed from the request straight into the file at its final storage name,
+# so nothing is spooled to a temp file or copied afterwards, and a dropped
+# connection only loses the chunk in flight: GET the upload to learn the offset
+# to resume from. create_post / edit_post attach a completed upload by id.
+# `manage.py purge_uploads` removes abandoned ones.
+import fcntl
+import hashlib
+import os
+import re
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from . import media
+from .models import Upload
+
+
+CHUNK_SIZE = getattr(settings, 'UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024)  # suggested to clients
+MAX_CHUNK_SIZE = getattr(settings, 'UPLOAD_MAX_CHUNK_SIZE', 16 * 1024 * 1024)
+MAX_UPLOAD_SIZE = getattr(settings, 'UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024)
+EXPIRE_HOURS = getattr(settings, 'UPLOAD_EXPIRE_HOURS', 24)
+READ_SIZE = 64 * 1024
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadError(Exception):
+    """Rejected upload step; `status` is the HTTP status to answer with, `offset` where to resume."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def state(upload):
+    return {
+        'upload_id': str(upload.id),
+        'filename': upload.filename,
+        'size': upload.size,
+        'offset': upload.offset,
+        'status': upload.status,
+        'chunk_size': CHUNK_SIZE,
+    }
+
+
+def start(user, filename, size, sha256=''):
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('size must be the total number of bytes')
+    if not 0 < size <= MAX_UPLOAD_SIZE:
+        raise UploadError(f'size must be between 1 and {MAX_UPLOAD_SIZE} bytes')
+    sha256 = (sha256 or '').lower()
+    if sha256 and not SHA256_RE.match(sha256):
+        raise UploadError('sha256 must be a hex digest')
+
+    filename = os.path.basename(filename or '') or 'upload'
+    # reserve the final name now; chunks are written into this file in place
+    name = default_storage.save(f'uploads/{uuid.uuid4().hex[:12]}-{get_valid_filename(filename)}',
+                                ContentFile(b''))
+    try:
+        default_storage.path(name)
+    except NotImplementedError:
+        default_storage.delete(name)
+        raise UploadError('Chunked uploads need a storage with local file paths', status=501)
+
+    return Upload.objects.create(owner=user, filename=filename[:255], file=name, size=size, sha256=sha256)
+
+
+def _locked(user, upload_id):
+    try:
+        upload_id = uuid.UUID(str(upload_id))
+    except ValueError:
+        raise UploadError('Upload not found', status=404)
+    upload = Upload.objects.select_for_update().filter(pk=upload_id, owner=user).first()
+    if upload is None:
+        raise UploadError('Upload not found', status=404)
+    return upload
+
+
+def get(user, upload_id):
+    with transaction.atomic():
+        return _locked(user, upload_id)
+
+
+def write_chunk(user, upload_id, stream, offset, length, checksum=''):
+    """
+    Write `length` bytes read from `stream` at `offset`. The offset only
+    advances once the chunk is fully on disk and matches `checksum` (hex
+    sha256, optional); otherwise the partial chunk is cut off again.
+    """
+    upload = get(user, upload_id)
+    with open(default_storage.path(upload.file.name), 'r+b') as out:
+        # one writer per upload: a second PUT is refused instead of waiting behind a slow client.
+        # The row is only locked to check and advance the offset, never while the body streams in.
+        try:
+            fcntl.flock(out.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError('Another chunk of this upload is being written', status=409, offset=upload.offset)
+        with transaction.atomic():
+            upload = _locked(user, upload_id)
+            _check_chunk(upload, offset, length)
+
+        digest = hashlib.sha256()
+        written = 0
+        out.seek(offset)
+        while written < length:
+            piece = stream.read(min(READ_SIZE, length - written))
+            if not piece:
+                break
+            out.write(piece)
+            digest.update(piece)
+            written += len(piece)
+
+        if written != length or (checksum and digest.hexdigest() != checksum.lower()):
+            out.truncate(offset)
+            reason = 'Chunk checksum mismatch' if written == length else 'Chunk ended early'
+            raise UploadError(reason, offset=offset)
+        out.flush()
+        # the bytes must be durable before the offset says they are there
+        os.fsync(out.fileno())
+
+        with transaction.atomic():
+            upload = _locked(user, upload_id)
+            _check_chunk(upload, offset, length)
+            upload.offset = offset + length
+            upload.save(update_fields=['offset', 'updated_at'])
+    return upload
+
+
+def _check_chunk(upload, offset, length):
+    if upload.status != 'uploading':
+        raise UploadError('Upload is already complete', status=409, offset=upload.offset)
+    if offset != upload.offset:
+        raise UploadError('Chunk does not start at the current offset', status=409, offset=upload.offset)
+    if not 0 < length <= MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunks must be between 1 and {MAX_CHUNK_SIZE} bytes', status=413,
+                          offset=upload.offset)
+    if offset + length > upload.size:
+        raise UploadError('Chunk runs past the declared size', offset=upload.offset)
+
+
+def complete(user, upload_id):
+    """Check the size (and sha256, if one was declared) and sniff the file type."""
+    with transaction.atomic():
+        upload = _locked(user, upload_id)
+        if upload.status != 'uploading':
+            return upload
+        if upload.offset != upload.size:
+            raise UploadError('Upload is missing bytes', status=409, offset=upload.offset)
+
+        if upload.sha256 and _file_sha256(upload.file.name) != upload.sha256:
+            # something was corrupted along the way; make the client start over
+            with open(default_storage.path(upload.file.name), 'r+b') as out:
+                out.truncate(0)
+            upload.offset = 0
+            upload.save(update_fields=['offset', 'updated_at'])
+        else:
+            with default_storage.open(upload.file.name, 'rb') as handle:
+                upload.mime = media.sniff_mime(handle)
+            if hasattr(default_storage, 'adopt'):
+                # finished bytes no longer change: move them to their content address (social_admin.storage)
+                upload.file.name = default_storage.adopt(upload.file.name)
+            upload.status = 'complete'
+            upload.save(update_fields=['file', 'mime', 'status', 'updated_at'])
+
+    if upload.status != 'complete':
+        raise UploadError('File checksum mismatch; upload it again from offset 0', offset=0)
+    return upload
+
+
+def _file_sha256(name):
+    digest = hashlib.sha256()
+    with default_storage.open(name, 'rb') as handle:
+        for piece in iter(lambda: handle.read(READ_SIZE), b''):
+            digest.update(piece)
+    return digest.hexdigest()
+
+
+def claim(user, upload_id):
+    """Mark a completed upload as used by a post; each upload can be attached once."""
+    try:
+        upload_id = uuid.UUID(str(upload_id))
+    except ValueError:
+        raise UploadError('Upload not found', status=404)
+    if not Upload.objects.filter(pk=upload_id, owner=user, status='complete').update(status='attached'):
+        raise UploadError('Upload is not complete or was already used')
+    return Upload.objects.get(pk=upload_id)
+
+
+def purge(hours=EXPIRE_HOURS):
+    """Delete uploads untouched for `hours`: unfinished ones with their files, attached ones (the post owns the file) without."""
+    cutoff = timezone.now() - timedelta(hours=hours)
+    stale = Upload.objects.filter(updated_at__lt=cutoff)
+    abandoned = 0
+    for upload in stale.exclude(status='attached'):
+        default_storage.delete(upload.file.name)
+        abandoned += 1
+    stale.delete()
+    return abandoned
@@ -1,13 +1,15 @@
 from django.shortcuts import render, redirect
+from django.conf import settings
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.http import Http404
+from django.http import Http404, HttpResponse
 from datetime import datetime, timedelta
 from rest_framework.decorators import api_view, permission_classes,parser_classes
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from django.http import JsonResponse
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from .models import User, Community, Post, Comment, Chat, Message, Notification, Like, CommunityMembership, Report, TypingStatus
+from .models import User, Community, Post, Comment, Chat, Message, Notification, Like, CommunityMembership, Report, TrendingPost, ChatState
 from .serializers import (UserSerializer, CommunitySerializer, PostSerializer,CommentSerializer, ChatSerializer, MessageSerializer, NotificationSerializer,CommunityMembershipSerializer)
 from django.contrib.auth import authenticate,login
 from rest_framework.status import HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND, HTTP_200_OK
@@ -17,17 +19,80 @@ from django.contrib.contenttypes.models import ContentType
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
-from django.db.models import Count
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.contrib.auth import logout
 from django.contrib.auth import get_user_model
-from django.db.models import Max
+from django.db.models import F
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Greatest
+from django.core.cache import cache
 from django.utils import timezone
-import os
+import hashlib
 from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth import update_session_auth_hash
+from . import (chat_state, comment_threads, counters, feed, instrumentation, media, metrics, popularity,
+               presence, realtime, response_cache, search, serving, site_stats, tasks, trending, uploads)
+from .pagination import (PopularCursorPagination, MessageCursorPagination, ReplyCursorPagination,
+                         CreatedAtCursorPagination, paginated_response)
+
+
+DISCOVER_CACHE_SECONDS = 60
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE = 50
+POPULAR_MAX_DAYS = 365
+MESSAGE_DELTA_LIMIT = 50
+MESSAGE_DELTA_MAX = 200
+MESSAGE_LONG_POLL_MAX = 25
+NOTIFICATIONS_LIMIT = 50
+GROWTH_LABELS = {
+    "new_users": "New Users",
+    "posts": "New Posts",
+    "comments": "New Comments",
+    "reports": "New Reports",
+}
+
+
+def _overlay_reactions(user, items):
+    # Cached post payloads are built for an anonymous viewer; fill in this
+    # viewer's liked/disliked flags with one query
+    items = [dict(item) for item in items]
+    reactions = {}
+    if user.is_authenticated and items:
+        reactions = dict(
+            Like.objects.filter(user=user, post_id__in=[item['id'] for item in items])
+            .values_list('post_id', 'type')
+        )
+    for item in items:
+        item['liked'] = reactions.get(item['id']) == 'like'
+        item['disliked'] = reactions.get(item['id']) == 'dislike'
+    return items
+
+
+def _overlay_page_reactions(user, data):
+    return {**data, 'results': _overlay_reactions(user, data['results'])}
+
+
+def _conditional_post_page(request, queryset, pagination_class=CreatedAtCursorPagination):
+    """
+    Paginate `queryset` on ids only, then answer 304 if neither the page nor
+    any post on it changed since the client's ETag. Only a changed page pays
+    for the joins and serialization.
+    """
+    paginator = pagination_class()
+    page_ids = [post.id for post in paginator.paginate_queryset(queryset.only('id', 'created_at'), request)]
+
+    etag = response_cache.make_etag(
+        request, page_ids, sorted(response_cache.versions([f'post:{post_id}' for post_id in page_ids]).items())
+    )
+    if response_cache.etag_matches(request, etag):
+        return response_cache.not_modified(etag)
+
+    posts = Post.objects.for_listing(request.user).in_bulk(page_ids)
+    data = PostSerializer([posts[post_id] for post_id in page_ids if post_id in posts], many=True).data
+    return response_cache.with_validator(paginator.get_paginated_response(data), etag)
 
 
 @never_cache
@@ -73,17 +138,69 @@ def admin_home(request):
         messages.error(request, "Access denied")
         return redirect("admin_login")
 
+    totals = site_stats.totals()
+    growth = []
+    for metric, points in site_stats.series().items():
+        peak = max(value for _, value in points) or 1
+        growth.append({
+            "label": GROWTH_LABELS[metric],
+            "total": sum(value for _, value in points),
+            "bars": [{"day": day, "value": value, "height": round(value * 100 / peak)} for day, value in points],
+        })
+
     context = {
-        "total_users": User.objects.filter(is_active=True).count(),
-        "total_communities": Community.objects.count(),
-        "total_posts": Post.objects.count(),
-        "total_comments": Comment.objects.count(),
-        "total_reports": Report.objects.filter(resolved=False).count(),
+        "total_users": totals["users"],
+        "total_communities": totals["communities"],
+        "total_posts": totals["posts"],
+        "total_comments": totals["comments"],
+        "total_reports": totals["open_reports"],
+        "tracked_routes": len(instrumentation.stats.snapshot()),
+        "growth": growth,
+        "growth_days": site_stats.DEFAULT_SERIES_DAYS,
     }
 
     return render(request, "dashboard.html", context) 
 
 
+@never_cache
+@login_required(login_url="admin_login")
+def performance_dashboard(request):
+    if not request.user.is_admin:
+        messages.error(request, "Access denied")
+        return redirect("admin_login")
+
+    if request.method == "POST":
+        instrumentation.stats.reset()
+        return redirect("performance_dashboard")
+
+    bounds = instrumentation.LATENCY_BUCKETS
+    bucket_labels = [f"≤{bound:g} ms" for bound in bounds[:-1]] + [f">{bounds[-2]:g} ms"]
+    context = {
+        "routes": instrumentation.stats.snapshot(),
+        "bucket_labels": bucket_labels,
+        "window": instrumentation.stats.window,
+        "threshold": instrumentation.DUPLICATE_QUERY_THRESHOLD,
+    }
+    return render(request, "performance.html", context)
+
+
+@never_cache
+def metrics_view(request):
+    allowed = getattr(settings, "METRICS_ALLOWED_IPS", None)
+    if allowed and request.META.get("REMOTE_ADDR") not in allowed:
+        return HttpResponse(status=403)
+    if not metrics.enabled():
+        return HttpResponse("prometheus_client is not installed", status=503, content_type="text/plain")
+
+    body, content_type = metrics.render()
+    return HttpResponse(body, content_type=content_type)
+
+
+@require_safe
+def serve_media(request, name):
+    # uploads and renditions under MEDIA_URL; Range, ETag and proxy offload live in serving
+    return serving.serve(request, name)
+
 
 
 @never_cache
@@ -96,7 +213,7 @@ def users_list(request):
     users = User.objects.exclude(is_admin=True).order_by('id')
     
     if query:
-        users = users.filter(Q(name__icontains=query) | Q(email__icontains=query))
+        users = users.filter(id__in=search.matching_ids('user', query))
     
     paginator = Paginator(users, 5)
     page_obj = paginator.get_page(page_number)
@@ -154,9 +271,8 @@ def user_detail(request, user_id):
     query_post = request.GET.get("q_post", "")
     if query_post:
         user_posts = Post.objects.filter(
-            postedby=user
-        ).filter(
-            Q(title__icontains=query_post) | Q(caption__icontains=query_post)
+            postedby=user,
+            id__in=search.matching_ids('post', query_post)
         )
     else:
         user_posts = Post.objects.filter(postedby=user)
@@ -166,7 +282,7 @@ def user_detail(request, user_id):
     if query_com:
         user_communities = Community.objects.filter(
             members=user,
-            name__icontains=query_com
+            id__in=search.matching_ids('community', query_com, fields=['name'])
         )
     else:
         user_communities = Community.objects.filter(members=user)
@@ -201,10 +317,12 @@ def user_detail(request, user_id):
 @login_required(login_url="admin_login")
 def community_list(request):
     query = request.GET.get('q', '').strip()
-    communities = Community.objects.all().order_by('-created_at')
+    # communities waiting for their background delete are already gone as far as the admin is concerned
+    deleting = [args[0] for args in tasks.pending(tasks.delete_community)]
+    communities = Community.objects.exclude(id__in=deleting).order_by('-created_at')
 
     if query:
-        communities = communities.filter(name__icontains=query) | communities.filter(description__icontains=query)
+        communities = communities.filter(id__in=search.matching_ids('community', query))
 
     paginator = Paginator(communities, 5)
     page_number = request.GET.get('page')
@@ -246,8 +364,9 @@ def community_delete(request, community_id):
     community = get_object_or_404(Community, id=community_id)
 
     if request.method == "POST":
-        community.delete()
-        return JsonResponse({"success": True, "message": "Community deleted successfully."})
+        # the cascade can be large: a worker deletes it, and its post/comment signals keep every counter right
+        tasks.enqueue(tasks.delete_community, community.id, priority=tasks.HIGH)
+        return JsonResponse({"success": True, "message": "Community is being deleted."})
     return JsonResponse({"success": False, "message": "Invalid request."})
 
 
@@ -262,11 +381,7 @@ def community_detail(request, community_id):
     posts = Post.objects.filter(community=community, status='active').order_by('-created_at')
 
     if query:
-        posts = posts.filter(
-            title__icontains=query
-        ) | posts.filter(
-            caption__icontains=query
-        )
+        posts = posts.filter(id__in=search.matching_ids('post', query))
 
     # Pagination (5 posts per page)
     paginator = Paginator(posts, 5)
@@ -291,11 +406,7 @@ def community_users(request, community_id):
 
     query = request.GET.get("q", "")
     if query:
-        users = users.filter(
-            name__icontains=query
-        ) | users.filter(
-            email__icontains=query
-        )
+        users = users.filter(id__in=search.matching_ids('user', query))
 
     paginator = Paginator(users, 5)
     page_number = request.GET.get("page")
@@ -319,8 +430,8 @@ def post_management(request):
 
     if query:
         posts = posts.filter(
-            Q(community__name__icontains=query) |
-            Q(postedby__name__icontains=query)
+            Q(community__in=search.matching_ids('community', query, fields=['name'])) |
+            Q(postedby__in=search.matching_ids('user', query, fields=['name']))
         )
 
     paginator = Paginator(posts, 10)
@@ -346,6 +457,10 @@ def post_detail(request, post_id):
         else:
             post.status = "active"
         post.save()
+        if post.status == "active":
+            tasks.enqueue(tasks.fan_out_post, post.id, priority=tasks.HIGH)
+        else:
+            feed.remove_post(post)
         return redirect('post_detail', post_id=post.id)
 
     return render(request, "view_post.html", {
@@ -371,7 +486,7 @@ def comment_management(request):
             comment.save()
 
         elif action == "delete":
-            comment.delete()
+            comment_threads.delete_thread(comment)
 
         return redirect("comment_management")
 
@@ -384,9 +499,8 @@ def comment_management(request):
 
     if query:
         comments = comments.filter(
-            Q(text__icontains=query) |
-            Q(user__name__icontains=query) |
-            Q(user__email__icontains=query)
+            Q(id__in=search.matching_ids('comment', query)) |
+            Q(user__in=search.matching_ids('user', query))
         )
 
     paginator = Paginator(comments, 5)
@@ -416,12 +530,21 @@ def reported_management(request):
             model = report.content_type.model
             object_id = report.object_id
 
+            # hidden right away, deleted (with everything that cascades) by the task worker
             if model == "post":
-                Post.objects.filter(id=object_id).delete()
+                post = Post.objects.filter(id=object_id).first()
+                if post:
+                    post.status = "hidden"
+                    post.save(update_fields=["status"])
+                    tasks.enqueue(tasks.delete_post, post.id, priority=tasks.HIGH)
                 messages.success(request, "Reported post deleted.")
 
             elif model == "comment":
-                Comment.objects.filter(id=object_id).delete()
+                comment = Comment.objects.filter(id=object_id).first()
+                if comment:
+                    comment.is_visible = False
+                    comment.save(update_fields=["is_visible"])
+                    tasks.enqueue(tasks.delete_comment_thread, comment.id, priority=tasks.HIGH)
                 messages.success(request, "Reported comment deleted.")
 
             report.delete()
@@ -461,7 +584,7 @@ def reported_management(request):
     if content_query:
         contents = contents.filter(
             Q(reason__icontains=content_query) |
-            Q(reported_by__name__icontains=content_query)
+            Q(reported_by__in=search.matching_ids('user', content_query, fields=['name']))
         )
 
     contents_paginator = Paginator(contents, 5)
@@ -475,7 +598,7 @@ def reported_management(request):
     if msg_query:
         messages_qs = messages_qs.filter(
             Q(reason__icontains=msg_query) |
-            Q(reported_by__name__icontains=msg_query)
+            Q(reported_by__in=search.matching_ids('user', msg_query, fields=['name']))
         )
 
     messages_paginator = Paginator(messages_qs, 5)
@@ -638,98 +761,89 @@ def get_profile(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def latest_posts(request):
-    posts = Post.objects.filter(status='active').order_by('-created_at')[:20]
-    serializer = PostSerializer(posts, many=True)
-    return Response(serializer.data)
+    posts = Post.objects.filter(status='active')
+    return _conditional_post_page(request, posts)
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def popular_posts(request):
-    # Popular: posts in the last N days (default 14) ranked by a heuristic score
-    days = int(request.GET.get('days', 14))
-    cutoff = timezone.now() - timedelta(days=days)
-
-    # annotate with names that do not conflict with model field names
-    posts_qs = Post.objects.filter(status='active', created_at__gte=cutoff).annotate(
-        likes_total=Count('likes', filter=Q(likes__type='like')),
-        dislikes_total=Count('likes', filter=Q(likes__type='dislike')),
-        comments_total=Count('comments')
+    # Popular: posts in the last N days (default 14) ranked by the stored popularity_score
+    try:
+        days = max(1, min(int(request.GET.get('days', 14)), POPULAR_MAX_DAYS))
+    except ValueError:
+        return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    def build():
+        cutoff = timezone.now() - timedelta(days=days)
+
+        posts_qs = Post.objects.for_listing().filter(status='active', created_at__gte=cutoff)
+
+        paginator = PopularCursorPagination()
+        page = paginator.paginate_queryset(posts_qs, request)
+        data = PostSerializer(page, many=True).data
+        # attach score for UI use
+        for item, post in zip(data, page):
+            item['popular_score'] = post.popularity_score
+        return paginator.get_paginated_response(data).data, ['posts'] + [f'post:{post.id}' for post in page]
+
+    return response_cache.respond(
+        request, 'popular_posts', build,
+        overlay=lambda data: _overlay_page_reactions(request.user, data),
+        timeout=response_cache.LISTING_TIMEOUT,
     )
 
-    scored = []
-    for p in posts_qs:
-        # use the annotated totals to compute the score
-        likes = getattr(p, 'likes_total', 0) or 0
-        comments = getattr(p, 'comments_total', 0) or 0
-        dislikes = getattr(p, 'dislikes_total', 0) or 0
-        score = likes + comments * 2 - dislikes
-        # small boost for larger communities
-        try:
-            comm_members = p.community.members.count() if p.community else 0
-            score += int(comm_members / 100)
-        except Exception:
-            comm_members = 0
-        scored.append((p, score))
-
-    scored.sort(key=lambda x: x[1], reverse=True)
-    posts_sorted = [p for p, s in scored]
-    serializer = PostSerializer(posts_sorted, many=True)
-    data = serializer.data
-    # attach score for UI use
-    for i, item in enumerate(data):
-        item['popular_score'] = scored[i][1]
-    return Response(data)
-
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def trending_posts(request):
-    # Trending: rapid engagement in recent hours (default 48h)
-    hours = int(request.GET.get('hours', 48))
-    cutoff = timezone.now() - timedelta(hours=hours)
-
-    posts_qs = Post.objects.filter(status='active', created_at__gte=cutoff).annotate(
-        likes_recent=Count('likes', filter=Q(likes__created_at__gte=cutoff, likes__type='like')),
-        comments_recent=Count('comments', filter=Q(comments__created_at__gte=cutoff))
+    # Trending: ranked by the compute_trending command from hourly engagement buckets
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 50)), trending.DEFAULT_TOP_K))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    def build():
+        ranked = list(
+            TrendingPost.objects
+            .filter(post__status='active')
+            .order_by('-score')[:limit]
+        )
+        if not ranked and not TrendingPost.objects.exists():
+            # compute_trending has not run yet (fresh deploy): rank by the stored popularity score instead
+            posts = list(
+                Post.objects.for_listing().filter(status='active')
+                .order_by('-popularity_score', '-id')[:limit]
+            )
+            data = PostSerializer(posts, many=True).data
+            for item in data:
+                item['trending_score'] = item['trending_engagement'] = item['hours_since'] = None
+            return data, ['trending', 'posts'] + [f'post:{post.id}' for post in posts]
+
+        posts = Post.objects.for_listing().in_bulk([t.post_id for t in ranked])
+        ranked = [t for t in ranked if t.post_id in posts]
+
+        serializer = PostSerializer([posts[t.post_id] for t in ranked], many=True)
+        data = serializer.data
+        # attach trending details
+        for item, t in zip(data, ranked):
+            item['trending_score'] = t.score
+            item['trending_engagement'] = t.engagement
+            item['hours_since'] = t.hours_since
+        return data, ['trending'] + [f'post:{t.post_id}' for t in ranked]
+
+    return response_cache.respond(
+        request, 'trending_posts', build,
+        overlay=lambda data: _overlay_reactions(request.user, data),
     )
 
-    scored = []
-    now = timezone.now()
-    for p in posts_qs:
-        hours_since = max(1.0, (now - p.created_at).total_seconds() / 3600.0)
-        engagement = (getattr(p, 'likes_recent', 0) or 0) + (getattr(p, 'comments_recent', 0) or 0)
-        score = engagement / hours_since
-        scored.append((p, score, engagement, hours_since))
-
-    scored.sort(key=lambda x: x[1], reverse=True)
-    posts_sorted = [p for p, s, e, h in scored]
-    serializer = PostSerializer(posts_sorted, many=True)
-    data = serializer.data
-    # attach trending details
-    for i, item in enumerate(data):
-        item['trending_score'] = scored[i][1]
-        item['trending_engagement'] = scored[i][2]
-        item['hours_since'] = scored[i][3]
-    return Response(data)
-
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def stream_posts(request):
     # Stream: chronological feed based on user's relationships
-    user = request.user
-    joined_communities = user.communities_joined.all()
-    following_users = user.following.all()
-
-    posts = Post.objects.filter(
-        status='active'
-    ).filter(
-        Q(community__in=joined_communities) | Q(postedby__in=following_users)
-    ).order_by('-created_at')[:100]
-
-    serializer = PostSerializer(posts, many=True)
-    return Response(serializer.data)
+    # Posts are pushed into FeedEntry inboxes on write (see social_admin.feed)
+    return _conditional_post_page(request, feed.feed_queryset(request.user))
 
 
 @api_view(['POST'])
@@ -740,32 +854,41 @@ def like_post(request, post_id):
     if action not in ['like', 'dislike']:
         return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
 
-    post = get_object_or_404(Post, id=post_id, status='active')
+    author_id = Post.objects.filter(id=post_id, status='active').values_list('postedby_id', flat=True).first()
+    if author_id is None:
+        raise Http404
 
     opposite = 'dislike' if action == 'like' else 'like'
 
-    removed_opposite = Like.objects.filter(user=user, post=post, type=opposite).delete()
-
-    like_obj, created = Like.objects.get_or_create(user=user, post=post, type=action)
-    if not created:
-        like_obj.delete()
-        message = f'{action} removed'
-    else:
-        message = f'{action} added'
-
-    post.likes_count = Like.objects.filter(post=post, type='like').count()
-    post.dislikes_count = Like.objects.filter(post=post, type='dislike').count()
-    post.save()
-
-    liked = Like.objects.filter(user=user, post=post, type='like').exists()
-    disliked = Like.objects.filter(user=user, post=post, type='dislike').exists()
+    # The unique (user, post, type) row decides the toggle: inserting it adds the
+    # reaction, a conflict means it was already there and gets removed. Counters
+    # only move by the rows actually inserted/deleted, so concurrent taps can't drift.
+    deltas = {'like': 0, 'dislike': 0}
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                Like.objects.create(user=user, post_id=post_id, type=action)
+            added = True
+            deltas[action] = 1
+            deltas[opposite] = -Like.objects.filter(user=user, post_id=post_id, type=opposite).delete()[0]
+        except IntegrityError:
+            added = False
+            deltas[action] = -Like.objects.filter(user=user, post_id=post_id, type=action).delete()[0]
+
+        popularity.record_reactions(post_id, likes_delta=deltas['like'], dislikes_delta=deltas['dislike'])
+        if added and action == 'like':
+            tasks.notify_later(author_id, user, 'liked your post', Post(id=post_id))
+
+    likes_count, dislikes_count = Post.objects.filter(id=post_id).values_list('likes_count', 'dislikes_count').get()
+    # include changes still sitting in a write-behind buffer
+    pending_likes, pending_dislikes, _ = counters.get_counters().pending(post_id)
 
     return Response({
-        'message': message,
-        'likes_count': post.likes_count,
-        'dislikes_count': post.dislikes_count,
-        'liked': liked,
-        'disliked': disliked
+        'message': f'{action} added' if added else f'{action} removed',
+        'likes_count': likes_count + pending_likes,
+        'dislikes_count': dislikes_count + pending_dislikes,
+        'liked': added and action == 'like',
+        'disliked': added and action == 'dislike'
     })
 
 
@@ -789,15 +912,18 @@ def add_comment(request, post_id):
         if not parent_comment:
             return Response({'error': 'Parent comment not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    comment = Comment.objects.create(
-        post=post,
-        user=user,
-        text=text,
-        parent=parent_comment
-    )
+    with transaction.atomic():
+        comment = Comment.objects.create(
+            post=post,
+            user=user,
+            text=text,
+            parent=parent_comment
+        )
+        tasks.notify_later(post.postedby_id, user, 'commented on your post', post)
+        if parent_comment and parent_comment.user_id != post.postedby_id:
+            tasks.notify_later(parent_comment.user_id, user, 'replied to your comment', comment)
 
-    post.comments_count = (post.comments_count or 0) + 1
-    post.save()
+    popularity.record_comments(post.id, 1)
 
     serializer = CommentSerializer(comment)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -811,19 +937,19 @@ def create_post(request):
     caption = request.data.get("caption")
     media_file = request.FILES.get("media_file")
     media_type = "none"
+    media_mime = ""
 
     if media_file:
-        if media_file.content_type:
-            if media_file.content_type.startswith("image"):
-                media_type = "image"
-            elif media_file.content_type.startswith("video"):
-                media_type = "video"
-        else:
-            ext = os.path.splitext(media_file.name)[1].lower()
-            if ext in [".png", ".jpg", ".jpeg", ".gif", ".webp"]:
-                media_type = "image"
-            elif ext in [".mp4", ".mov", ".avi", ".mkv", ".webm"]:
-                media_type = "video"
+        # trust the file's bytes, not the client's content type or extension
+        media_mime, media_type = media.sniff(media_file)
+    elif request.data.get("upload_id"):
+        # a file sent earlier through the chunked upload API
+        try:
+            upload = uploads.claim(request.user, request.data.get("upload_id"))
+        except uploads.UploadError as exc:
+            return Response({"error": str(exc)}, status=exc.status)
+        media_file = upload.file.name
+        media_mime, media_type = upload.mime, media.media_type_for(upload.mime)
 
     # Get community if sent from frontend
     community_id = request.data.get("community")  # frontend sends "community"
@@ -836,13 +962,66 @@ def create_post(request):
         caption=caption,
         media_file=media_file,
         media_type=media_type,
+        media_mime=media_mime,
+        media_status="pending" if media_file else "none",
         community=community,  
-        postedby=request.user
+        postedby=request.user,
+        popularity_score=popularity.initial_score(community),
     )
+    tasks.enqueue(tasks.fan_out_post, post.id, priority=tasks.HIGH)
+    media.process_post_later(post)
 
     return Response({"message": "Post created", "post_id": post.id}, status=201)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def start_upload(request):
+    try:
+        upload = uploads.start(
+            request.user,
+            request.data.get("filename"),
+            request.data.get("size"),
+            request.data.get("sha256", ""),
+        )
+    except uploads.UploadError as exc:
+        return Response({"error": str(exc)}, status=exc.status)
+    return Response(uploads.state(upload), status=201)
+
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAuthenticated])
+def upload_chunk(request, upload_id):
+    # PUT body is the raw chunk: Upload-Offset says where it starts and the
+    # optional Upload-Checksum carries its hex sha256. GET reports where to resume.
+    try:
+        if request.method == "GET":
+            upload = uploads.get(request.user, upload_id)
+        else:
+            try:
+                offset = int(request.headers.get("Upload-Offset", ""))
+                length = int(request.headers.get("Content-Length", ""))
+            except ValueError:
+                return Response({"error": "Upload-Offset and Content-Length headers are required"}, status=400)
+            upload = uploads.write_chunk(
+                request.user, upload_id, request.stream, offset, length,
+                request.headers.get("Upload-Checksum", ""),
+            )
+    except uploads.UploadError as exc:
+        return Response({"error": str(exc), "offset": exc.offset}, status=exc.status)
+    return Response(uploads.state(upload))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def complete_upload(request, upload_id):
+    try:
+        upload = uploads.complete(request.user, upload_id)
+    except uploads.UploadError as exc:
+        return Response({"error": str(exc), "offset": exc.offset}, status=exc.status)
+    return Response({**uploads.state(upload), "media_type": media.media_type_for(upload.mime)})
+
+
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -853,6 +1032,8 @@ def create_community_with_post(request):
         # Add creator to members so owner is a member by default
         try:
             community.members.add(request.user)
+            Community.objects.filter(id=community.id).update(members_count=F('members_count') + 1)
+            community.members_count += 1
         except Exception:
             pass
 
@@ -860,15 +1041,10 @@ def create_community_with_post(request):
         if create_post_flag:
             # Accept post file from different keys and auto-detect type
             post_file = request.FILES.get('post_media') or request.FILES.get('media_file') or None
-            post_media_type = request.data.get('post_media_type')
-            if post_file and not post_media_type:
-                ctype = getattr(post_file, 'content_type', '')
-                if ctype.startswith('image'):
-                    post_media_type = 'image'
-                elif ctype.startswith('video'):
-                    post_media_type = 'video'
-                else:
-                    post_media_type = 'none'
+            post_media_type = None
+            post_media_mime = ''
+            if post_file:
+                post_media_mime, post_media_type = media.sniff(post_file)
 
             post_data = {
                 'caption': request.data.get('post_caption', ''),
@@ -879,7 +1055,14 @@ def create_community_with_post(request):
             }
             post_serializer = PostSerializer(data=post_data)
             if post_serializer.is_valid():
-                post_serializer.save(postedby=request.user)
+                post = post_serializer.save(
+                    postedby=request.user,
+                    popularity_score=popularity.initial_score(community),
+                    media_mime=post_media_mime,
+                    media_status='pending' if post_file else 'none',
+                )
+                tasks.enqueue(tasks.fan_out_post, post.id, priority=tasks.HIGH)
+                media.process_post_later(post)
             else:
                 return Response({
                     'community': community_serializer.data,
@@ -896,38 +1079,52 @@ def create_community_with_post(request):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_community(request, community_id):
-    try:
-        community = Community.objects.get(id=community_id)
-    except Community.DoesNotExist:
-        return Response({'error': 'Community not found'}, status=404)
+    def build():
+        try:
+            community = Community.objects.select_related('creater').get(id=community_id)
+        except Community.DoesNotExist:
+            return Response({'error': 'Community not found'}, status=404)
+        return {'community': CommunitySerializer(community).data}, [f'community:{community_id}']
 
-    serializer = CommunitySerializer(community)
-    joined = False
-    if request.user.is_authenticated:
-        joined = community.members.filter(id=request.user.id).exists()
+    def overlay(data):
+        joined = False
+        if request.user.is_authenticated:
+            joined = Community.members.through.objects.filter(
+                community_id=community_id, user_id=request.user.id
+            ).exists()
+        return {**data, 'joined': joined}
 
-    return Response({
-        'community': serializer.data,
-        'joined': joined
-    })
+    return response_cache.respond(request, 'get_community', build, overlay=overlay)
 
 
 @csrf_exempt
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def toggle_community_membership(request, community_id):
-    community = get_object_or_404(Community, id=community_id)
-    
-    if community.members.filter(id=request.user.id).exists():
-        community.members.remove(request.user)
-        CommunityMembership.objects.filter(user=request.user, community=community).delete()
-        joined = False
-        message = "Left community"
+    with transaction.atomic():
+        # the row lock serializes joins/leaves, so members_count read here is the real "before"
+        community = get_object_or_404(Community.objects.select_for_update(), id=community_id)
+        members_before = community.members_count
+
+        if community.members.filter(id=request.user.id).exists():
+            community.members.remove(request.user)
+            CommunityMembership.objects.filter(user=request.user, community=community).delete()
+            members_after = max(members_before - 1, 0)
+            joined = False
+            message = "Left community"
+        else:
+            community.members.add(request.user)
+            CommunityMembership.objects.get_or_create(user=request.user, community=community)
+            members_after = members_before + 1
+            joined = True
+            message = "Joined community"
+        Community.objects.filter(id=community.id).update(members_count=members_after)
+        popularity.record_membership_change(community.id, members_before, members_after)
+
+    if joined:
+        feed.on_join(request.user, community)
     else:
-        community.members.add(request.user)
-        CommunityMembership.objects.get_or_create(user=request.user, community=community)
-        joined = True
-        message = "Joined community"
+        feed.on_leave(request.user, community)
 
     return Response({
         "message": message,
@@ -939,58 +1136,153 @@ def toggle_community_membership(request, community_id):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def community_posts(request, community_id):
-    posts = Post.objects.filter(
-        community_id=community_id,
-        status='active'
-    ).order_by('-created_at')
-
-    serializer = PostSerializer(posts, many=True)
-    return Response(serializer.data)
+    def build():
+        posts = Post.objects.for_listing().filter(
+            community_id=community_id,
+            status='active'
+        )
+        paginator = CreatedAtCursorPagination()
+        page = paginator.paginate_queryset(posts, request)
+        data = paginator.get_paginated_response(PostSerializer(page, many=True).data).data
+        return data, [f'community:{community_id}'] + [f'post:{post.id}' for post in page]
+
+    return response_cache.respond(
+        request, 'community_posts', build,
+        overlay=lambda data: _overlay_page_reactions(request.user, data),
+    )
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def post_comments(request, post_id):
-    comments = Comment.objects.filter(
-        post_id=post_id,
-        parent=None
-    ).order_by('-created_at')
+    # ?parent=<comment id> pages through one comment's replies ("load more replies")
+    try:
+        depth = max(1, min(int(request.GET.get('depth', comment_threads.DEFAULT_DEPTH)), comment_threads.MAX_DEPTH))
+        parent_id = int(request.GET['parent']) if request.GET.get('parent') else None
+    except ValueError:
+        return Response({'error': 'depth and parent must be integers'}, status=status.HTTP_400_BAD_REQUEST)
 
-    serializer = CommentSerializer(comments, many=True)
-    return Response(serializer.data)
+    def build():
+        comments = Comment.objects.filter(
+            post_id=post_id,
+            parent_id=parent_id,
+            is_visible=True
+        ).select_related('user')
+
+        paginator = ReplyCursorPagination() if parent_id is not None else CreatedAtCursorPagination()
+        page = paginator.paginate_queryset(comments, request)
+        comment_threads.attach_replies(page, depth=depth)
+        serializer = CommentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data).data, [f'post:{post_id}']
+
+    return response_cache.respond(request, 'post_comments', build)
 
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def discover_communities(request):
-    search = request.GET.get('search', '')
+    search_query = request.GET.get('search', '').strip()
     sort_by = request.GET.get('sort', 'members')
 
-    communities = Community.objects.all()
+    # The community page is the same for every viewer, so it is cached briefly;
+    # only the per-viewer "joined" flags are looked up on each request.
+    cache_key = 'discover:%s' % hashlib.md5('|'.join([
+        sort_by, search_query.lower(), request.GET.get('cursor', ''), request.GET.get('page_size', ''),
+    ]).encode()).hexdigest()
+    payload = cache.get(cache_key)
+
+    if payload is None:
+        communities = Community.objects.select_related('creater')
+        if search_query:
+            communities = communities.filter(
+                id__in=search.matching_ids('community', search_query, public_only=True, fields=['name']))
+
+        paginator = CreatedAtCursorPagination()
+        if sort_by == 'name':
+            paginator.ordering = ('name', 'id')
+        elif sort_by == 'members':
+            paginator.ordering = ('-members_count', '-id')
+
+        page = paginator.paginate_queryset(communities, request)
+        payload = {
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'results': CommunitySerializer(page, many=True).data,
+        }
+        cache.set(cache_key, payload, DISCOVER_CACHE_SECONDS)
+
+    results = [dict(item) for item in payload['results']]
+    joined_ids = set(
+        Community.members.through.objects.filter(
+            user_id=request.user.id,
+            community_id__in=[item['id'] for item in results],
+        ).values_list('community_id', flat=True)
+    )
+    for item in results:
+        item['joined'] = item['id'] in joined_ids
+        item['members'] = item['members_count']
 
-    if search:
-        communities = communities.filter(name__icontains=search)
+    return Response({
+        'next': payload['next'],
+        'previous': payload['previous'],
+        'results': results,
+    })
 
-    if sort_by == 'name':
-        communities = communities.order_by('name')
-    else:
-        communities = communities.annotate(
-            members_count=Count('members')
-        ).order_by('-members_count')
 
-    serializer = CommunitySerializer(communities, many=True)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_view(request):
+    """
+    Ranked search over posts, communities, users and comments.
+    ?q=<terms>&type=post,community,user,comment&page=<n>
+    """
+    query = request.GET.get('q', '').strip()
+    kinds = [kind for kind in request.GET.get('type', '').split(',') if kind in search.MODELS]
+    try:
+        page = max(1, min(int(request.GET.get('page', 1)), SEARCH_MAX_PAGE))
+    except ValueError:
+        return Response({'error': 'page must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    offset = (page - 1) * SEARCH_PAGE_SIZE
+    hits = list(
+        search.matching_documents(query, kinds or None)
+        .values_list('kind', 'object_id', 'score')[offset:offset + SEARCH_PAGE_SIZE + 1]
+    )
+    has_more = len(hits) > SEARCH_PAGE_SIZE
+    hits = hits[:SEARCH_PAGE_SIZE]
+
+    # one query per kind present on the page
+    wanted = {}
+    for kind, object_id, _ in hits:
+        wanted.setdefault(kind, []).append(object_id)
+    loaded = {
+        'post': lambda ids: Post.objects.for_listing(request.user).filter(status='active').in_bulk(ids),
+        'community': lambda ids: Community.objects.select_related('creater').in_bulk(ids),
+        'user': lambda ids: User.objects.filter(is_active=True).in_bulk(ids),
+        'comment': lambda ids: Comment.objects.select_related('user')
+            .filter(is_visible=True, post__status='active').in_bulk(ids),
+    }
+    serializers = {
+        'post': PostSerializer,
+        'community': CommunitySerializer,
+        'user': UserSerializer,
+        'comment': CommentSerializer,
+    }
+    objects = {kind: loaded[kind](ids) for kind, ids in wanted.items()}
 
-    communities_data = serializer.data
-    user_id = request.user.id
-    for idx, community in enumerate(communities):
-        joined = CommunityMembership.objects.filter(
-            user_id=user_id, community_id=community.id
-        ).exists()
-        communities_data[idx]['joined'] = joined
-        communities_data[idx]['members'] = community.members.count()
+    results = []
+    for kind, object_id, score in hits:
+        obj = objects[kind].get(object_id)
+        if obj is not None:
+            results.append({'type': kind, 'score': score, 'item': serializers[kind](obj).data})
 
-    return Response(communities_data)
+    url = request.build_absolute_uri()
+    return Response({
+        'next': replace_query_param(url, 'page', page + 1) if has_more and page < SEARCH_MAX_PAGE else None,
+        'previous': replace_query_param(url, 'page', page - 1) if page > 1 else None,
+        'results': results,
+    })
 
 
 @csrf_exempt
@@ -1013,8 +1305,14 @@ def send_message(request, chat_id):
     )
 
     chat.save()  # updates updated_at
+    chat_state.record_message(message)
 
     serializer = MessageSerializer(message)
+    realtime.publish_chat(chat.id, {'type': 'message.new', 'message': serializer.data})
+    realtime.publish_users(
+        chat.participants.values_list('id', flat=True),
+        {'type': 'chat.updated', 'chat_id': chat.id},
+    )
     return Response(serializer.data, status=201)
 
 
@@ -1081,7 +1379,7 @@ def delete_comment(request, comment_id):
     if comment.user != request.user:
         return Response({'error': 'Not authorized to delete this comment'}, status=status.HTTP_403_FORBIDDEN)
 
-    comment.delete()
+    comment_threads.delete_thread(comment)
     return Response({'message': 'Comment deleted successfully'})
 
 
@@ -1104,23 +1402,18 @@ def delete_post(request, post_id):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_post_detail(request, post_id):
-    try:
-        post = Post.objects.get(id=post_id, status='active')
-    except Post.DoesNotExist:
-        return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
-    
-    serializer = PostSerializer(post)
-    
-    liked = disliked = False
-    if request.user.is_authenticated:
-        liked = Like.objects.filter(user=request.user, post=post, type='like').exists()
-        disliked = Like.objects.filter(user=request.user, post=post, type='dislike').exists()
+    def build():
+        try:
+            post = Post.objects.for_listing().get(id=post_id, status='active')
+        except Post.DoesNotExist:
+            return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
+        return {'post': PostSerializer(post).data}, [f'post:{post_id}']
 
-    return Response({
-        'post': serializer.data,
-        'liked': liked,
-        'disliked': disliked
-    })
+    def overlay(data):
+        post = _overlay_reactions(request.user, [data['post']])[0]
+        return {'post': post, 'liked': post['liked'], 'disliked': post['disliked']}
+
+    return response_cache.respond(request, 'get_post_detail', build, overlay=overlay)
 
 
 
@@ -1159,8 +1452,11 @@ def update_profile_picture(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    media.discard_renditions_later(user.profile_pic_renditions)
     user.profile_pic = file
+    user.profile_pic_renditions = []
     user.save()
+    media.process_profile_pic_later(user)
 
     serializer = UserSerializer(user)
     return Response(serializer.data, status=status.HTTP_200_OK)
@@ -1214,13 +1510,11 @@ def submit_report(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def my_posts(request):
-    posts = Post.objects.filter(
+    posts = Post.objects.for_listing(request.user).filter(
         postedby=request.user,
         status='active'
-    ).order_by('-created_at')
-
-    serializer = PostSerializer(posts, many=True)
-    return Response(serializer.data)
+    )
+    return paginated_response(request, posts, PostSerializer)
 
 
 @api_view(['GET'])
@@ -1241,19 +1535,16 @@ def my_created_communities(request):
     # Fixed field: Community model uses 'creater'
     communities = Community.objects.filter(
         creater=request.user
-    ).order_by('-created_at')
-
-    serializer = CommunitySerializer(communities, many=True)
-    return Response(serializer.data)
+    )
+    return paginated_response(request, communities, CommunitySerializer)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_posts(request, user_id):
     """Return posts for the given user id (public)."""
-    posts = Post.objects.filter(postedby__id=user_id, status='active').order_by('-created_at')
-    serializer = PostSerializer(posts, many=True)
-    return Response(serializer.data)
+    posts = Post.objects.for_listing(request.user).filter(postedby__id=user_id, status='active')
+    return paginated_response(request, posts, PostSerializer)
 
 
 @api_view(['GET'])
@@ -1280,31 +1571,36 @@ def edit_post(request, post_id):
     # Accept file from multiple possible keys (frontend uses 'media' or 'media_file')
     file_obj = request.FILES.get('media') or request.FILES.get('media_file') or None
 
-    # Auto-detect media type from uploaded file if not provided
-    media_type = data.get('media_type')
+    # Media type of a new upload comes from the file itself
+    extra = {}
     if file_obj:
         # ensure serializer sees the uploaded file under the expected field name
         if 'media_file' not in data:
             data['media_file'] = file_obj
+        media_mime, data['media_type'] = media.sniff(file_obj)
 
-    if file_obj and not media_type:
-        ctype = getattr(file_obj, 'content_type', '')
-        if ctype.startswith('image'):
-            media_type = 'image'
-        elif ctype.startswith('video'):
-            media_type = 'video'
-        else:
-            # fallback to filename extension
-            name = getattr(file_obj, 'name', '') or ''
-            if any(name.lower().endswith(ext) for ext in ('.mp4', '.webm', '.ogg', '.mov', '.m4v')):
-                media_type = 'video'
-            else:
-                media_type = 'none'
-        data['media_type'] = media_type
-
+    old_community = post.community
     serializer = PostSerializer(post, data=data, partial=True)
     if serializer.is_valid():
-        serializer.save()
+        with transaction.atomic():
+            if not file_obj and data.get('upload_id'):
+                # a file sent earlier through the chunked upload API; only used up once the edit is valid
+                try:
+                    upload = uploads.claim(request.user, data.get('upload_id'))
+                except uploads.UploadError as exc:
+                    return Response({'error': str(exc)}, status=exc.status)
+                media_mime = upload.mime
+                extra.update(media_file=upload.file.name, media_type=media.media_type_for(upload.mime))
+            if file_obj or extra:
+                media.discard_renditions_later(post.media_renditions)
+                extra.update(media_mime=media_mime, media_status='pending', media_renditions=[],
+                             media_width=None, media_height=None)
+            post = serializer.save(**extra)
+        if post.community_id != getattr(old_community, 'id', None):
+            # the community size boost moves with the post
+            popularity.record_community_move(post.id, old_community, post.community)
+        if extra:
+            media.process_post_later(post)
         return Response(serializer.data)
     # log serializer errors for easier debugging
     print('EDIT_POST_ERRORS', serializer.errors)
@@ -1333,10 +1629,8 @@ def update_community(request, community_id):
 def my_joined_communities(request):
     communities = Community.objects.filter(
         members=request.user
-    ).order_by('-created_at')
-
-    serializer = CommunitySerializer(communities, many=True)
-    return Response(serializer.data)
+    )
+    return paginated_response(request, communities, CommunitySerializer)
 
 
 @csrf_exempt
@@ -1350,17 +1644,19 @@ def logout_user(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_profile(request, user_id):
-    user = get_object_or_404(User, id=user_id)
+    def build():
+        user = get_object_or_404(User, id=user_id)
+        return {
+            'id': user.id,
+            'name': user.name,
+            'email': user.email,
+            'bio': user.bio,
+            'profile_pic': user.profile_pic.url if user.profile_pic else None,
+            'followers_count': user.followers.count(),
+            'following_count': user.following.count(),
+        }, [f'user:{user_id}']
 
-    return Response({
-        'id': user.id,
-        'name': user.name,
-        'email': user.email,
-        'bio': user.bio,
-        'profile_pic': user.profile_pic.url if user.profile_pic else None,
-        'followers_count': user.followers.count(),
-        'following_count': user.following.count(),
-    })
+    return response_cache.respond(request, 'user_profile', build)
 
 
 @csrf_exempt
@@ -1385,6 +1681,7 @@ def follow_user(request, user_id):
 
     if user.following.filter(id=target.id).exists():
         user.following.remove(target)
+        feed.on_unfollow(user, target)
         return Response({
             'following': False,
             'followers_count': target.followers.count(),
@@ -1392,6 +1689,8 @@ def follow_user(request, user_id):
         })
 
     user.following.add(target)
+    feed.on_follow(user, target)
+    tasks.notify_later(target.id, user, 'started following you')
     return Response({
         'following': True,
         'followers_count': target.followers.count(),
@@ -1422,13 +1721,35 @@ def block_user(request, user_id):
         user.blocked_users.remove(target)
         return Response({'blocked': False})
 
-    user.blocked_users.add(target)
-    user.following.remove(target)
-    target.following.remove(user)
+    with transaction.atomic():
+        user.blocked_users.add(target)
+        user.following.remove(target)
+        target.following.remove(user)
+        # purging each other's posts from both inboxes is the slow part
+        tasks.enqueue(tasks.drop_blocked_feeds, user.id, target.id, priority=tasks.HIGH)
 
     return Response({'blocked': True})
 
 
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def notifications(request):
+    """GET: the newest notifications and the unread count. POST: mark `ids` (or all) read."""
+    inbox = Notification.objects.filter(recipient=request.user)
+    if request.method == 'POST':
+        unread = inbox.filter(unread=True)
+        ids = request.data.get('ids')
+        if ids:
+            unread = unread.filter(id__in=ids)
+        unread.update(unread=False)
+
+    latest = inbox.select_related('actor', 'content_type')[:NOTIFICATIONS_LIMIT]
+    return Response({
+        'unread_count': inbox.filter(unread=True).count(),
+        'notifications': NotificationSerializer(latest, many=True).data,
+    })
+
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -1446,13 +1767,13 @@ def profile_dashboard_full(request):
     }
 
     # My posts
-    posts = Post.objects.filter(postedby=user, status='active').order_by('-created_at')
+    posts = Post.objects.for_listing(user).filter(postedby=user, status='active').order_by('-created_at')
 
     # Created communities
-    created_communities = Community.objects.filter(creater=user).order_by('-created_at')
+    created_communities = Community.objects.filter(creater=user).select_related('creater').order_by('-created_at')
 
     # Joined communities (excluding created by user)
-    joined_communities = Community.objects.filter(members=user).exclude(creater=user).order_by('-created_at')
+    joined_communities = Community.objects.filter(members=user).exclude(creater=user).select_related('creater').order_by('-created_at')
 
     return Response({
         "user": user_data,
@@ -1497,19 +1818,32 @@ def chats_view(request):
     # GET: List chats
     # -----------------------------
     if request.method == 'GET':
-        chats = (
-            Chat.objects
-            .filter(participants=request.user)
-            .annotate(last_time=Max('messages__created_at'))
-            .order_by('-last_time', '-updated_at')
+        # The inbox only changes when one of its chats does: validate against
+        # the chats' versions before loading anything else
+        chat_ids = ChatState.objects.filter(user=request.user).values_list('chat_id', flat=True)
+        chat_versions = response_cache.versions([chat_state.chat_scope(chat_id) for chat_id in chat_ids])
+        etag = response_cache.make_etag(request, sorted(chat_versions.items()))
+        if response_cache.etag_matches(request, etag):
+            return response_cache.not_modified(etag)
+
+        # One row per chat in ChatState carries the unread count and last message
+        states = (
+            ChatState.objects
+            .filter(user=request.user)
+            .select_related('chat', 'last_message__sender')
+            .prefetch_related('chat__participants')
+            .order_by('-last_activity')
         )
 
+        chats = []
+        for state in states:
+            state.chat.inbox_last_message = state.last_message
+            chats.append(state.chat)
+
         serialized = ChatSerializer(chats, many=True).data
-        # add unread_count for each chat (messages not read and not sent by current user)
-        for idx, chat in enumerate(chats):
-            unread = Message.objects.filter(chat=chat, is_read=False).exclude(sender=request.user).count()
-            serialized[idx]['unread_count'] = unread
-        return Response(serialized)
+        for item, state in zip(serialized, states):
+            item['unread_count'] = state.unread_count
+        return response_cache.with_validator(Response(serialized), etag)
 
     # -----------------------------
     # POST: Create or get chat
@@ -1535,6 +1869,7 @@ def chats_view(request):
         if not chat:
             chat = Chat.objects.create()
             chat.participants.add(request.user, other_user)
+        chat_state.ensure_states(chat, [request.user, other_user])
 
         return Response({
             "chat_id": chat.id
@@ -1546,10 +1881,71 @@ def chats_view(request):
 def get_messages(request, chat_id):
     chat = get_object_or_404(Chat, id=chat_id, participants=request.user)
 
-    messages = Message.objects.filter(chat=chat).order_by('created_at')
-    serializer = MessageSerializer(messages, many=True)
+    # Polls of an unchanged chat get a 304 before any message is loaded
+    # (long-polls wait for new data instead)
+    etag = None
+    if not request.GET.get('wait'):
+        etag = response_cache.make_etag(request, response_cache.versions([chat_state.chat_scope(chat.id)]))
+        if response_cache.etag_matches(request, etag):
+            return response_cache.not_modified(etag)
 
-    return Response(serializer.data)
+    messages = Message.objects.filter(chat=chat).select_related('sender')
+
+    after_id = request.GET.get('after_id')
+    before_id = request.GET.get('before_id')
+    if after_id or before_id:
+        response = _message_delta(request, chat, messages, after_id, before_id)
+    else:
+        # pages run newest-first so the first request returns the latest messages;
+        # each page is flipped back to chronological order for display
+        paginator = MessageCursorPagination()
+        page = paginator.paginate_queryset(messages, request)
+        serializer = MessageSerializer(reversed(page), many=True)
+        response = paginator.get_paginated_response(serializer.data)
+    return response_cache.with_validator(response, etag) if etag else response
+
+
+def _message_delta(request, chat, messages, after_id, before_id):
+    """
+    ?after_id=N   -> messages newer than N (oldest first); add &wait=<seconds>
+                     to hold the request until one arrives (long-poll)
+    ?before_id=N  -> the page of history just before N, for lazy loading
+
+    Long-polls are woken by the realtime channel layer, so with several
+    worker processes CHANNEL_LAYER must be shared (RedisChannelLayer);
+    otherwise a poll only sees messages sent through its own process.
+    """
+    try:
+        limit = max(1, min(int(request.GET.get('limit', MESSAGE_DELTA_LIMIT)), MESSAGE_DELTA_MAX))
+        before_id = int(before_id) if before_id else None
+        after_id = int(after_id) if after_id else 0
+        wait = max(0.0, min(float(request.GET.get('wait', 0)), MESSAGE_LONG_POLL_MAX))
+    except ValueError:
+        return Response({'error': 'after_id, before_id and limit must be integers and wait a number of seconds'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    if before_id is not None:
+        older = list(messages.filter(id__lt=before_id).order_by('-id')[:limit + 1])
+        has_more = len(older) > limit
+        page = older[:limit][::-1]
+    else:
+        newer = messages.filter(id__gt=after_id).order_by('id')
+        if wait:
+            # subscribe before querying, so a message sent between the query and the wait still wakes us;
+            # while waiting nothing touches the database
+            with realtime.Subscription(realtime.chat_group(chat.id)) as events:
+                page = list(newer[:limit + 1])
+                if not page and events.wait(wait, types={'message.new'}):
+                    page = list(newer[:limit + 1])
+        else:
+            page = list(newer[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+
+    return Response({
+        'results': MessageSerializer(page, many=True).data,
+        'has_more': has_more,
+    })
 
 
 @api_view(['POST'])
@@ -1569,6 +1965,13 @@ def delete_message(request, message_id):
     message.media_url = None
     message.deleted = True
     message.save()
+    chat_state.record_deleted(message)
+
+    realtime.publish_chat(message.chat_id, {'type': 'message.deleted', 'message_id': message.id})
+    realtime.publish_users(
+        message.chat.participants.values_list('id', flat=True),
+        {'type': 'chat.updated', 'chat_id': message.chat_id},
+    )
 
     return Response({'message': 'deleted'})
 
@@ -1582,6 +1985,7 @@ def delete_chat(request, chat_id):
 
     # Remove user from chat participants
     chat.participants.remove(request.user)
+    chat_state.leave(chat, request.user)
 
     # If chat has no participants left, delete it
     if chat.participants.count() == 0:
@@ -1597,22 +2001,20 @@ def typing_status_view(request, chat_id):
     chat = get_object_or_404(Chat, id=chat_id, participants=request.user)
     active = request.data.get('active', True)
 
-    if active:
-        TypingStatus.objects.update_or_create(chat=chat, user=request.user, defaults={'last_seen': timezone.now()})
-        return Response({'status': 'ok'})
-    else:
-        TypingStatus.objects.filter(chat=chat, user=request.user).delete()
-        return Response({'status': 'ok'})
+    presence.set_typing(chat.id, request.user.id, bool(active))
+    realtime.publish_chat(chat.id, {'type': 'typing', 'user_id': request.user.id, 'active': bool(active)})
+    return Response({'status': 'ok'})
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_typing_status(request, chat_id):
     chat = get_object_or_404(Chat, id=chat_id, participants=request.user)
-    cutoff = timezone.now() - timezone.timedelta(seconds=5)
-    typing = TypingStatus.objects.filter(chat=chat, last_seen__gte=cutoff).exclude(user=request.user)
-    users = [ts.user.id for ts in typing]
-    return Response({'typing_users': users})
+    typing_users = presence.typing_users(chat.id, exclude=request.user.id)
+    etag = response_cache.make_etag(request, sorted(typing_users))
+    if response_cache.etag_matches(request, etag):
+        return response_cache.not_modified(etag)
+    return response_cache.with_validator(Response({'typing_users': typing_users}), etag)
 
 
 @api_view(['POST'])
@@ -1621,6 +2023,11 @@ def mark_read(request, chat_id):
     """Mark all messages in the chat as read for the requesting user (i.e., messages not sent by them)."""
     chat = get_object_or_404(Chat, id=chat_id, participants=request.user)
     updated = Message.objects.filter(chat=chat, is_read=False).exclude(sender=request.user).update(is_read=True)
+    last_id = Message.objects.filter(chat=chat).order_by('-id').values_list('id', flat=True).first()
+    chat_state.mark_read(chat, request.user, last_id)
+    if updated:
+        realtime.publish_chat(chat.id, {'type': 'message.read', 'reader_id': request.user.id, 'last_id': last_id})
+    realtime.publish_users([request.user.id], {'type': 'chat.updated', 'chat_id': chat.id})
     return Response({'marked': updated}, status=200)
 
 
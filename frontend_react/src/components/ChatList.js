@@ -51,14 +51,27 @@ export default function ChatList({ onSelect, selectedChatId }) {
     };
 
     fetchChats();
-    const timer = setInterval(fetchChats, 3000);
+    // poll only while the inbox websocket is down; when connected, chat.updated events trigger a refetch
+    let timer = setInterval(fetchChats, 3000);
     window.addEventListener("chats:refresh", fetchChats);
 
+    const socket = new WebSocket(`ws://127.0.0.1:8000/ws/inbox/?token=${token}`);
+    socket.onopen = () => {
+      clearInterval(timer);
+      timer = null;
+    };
+    socket.onclose = () => {
+      if (!timer) timer = setInterval(fetchChats, 3000);
+    };
+    socket.onmessage = () => fetchChats();
+
     return () => {
       clearInterval(timer);
+      socket.onclose = null;
+      socket.close();
       window.removeEventListener("chats:refresh", fetchChats);
     };
-  }, [headers, userId]);
+  }, [headers, userId, token]);
 
   /* ---------------- SEARCH ---------------- */
   const handleSearch = (q) => {
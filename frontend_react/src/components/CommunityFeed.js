@@ -18,6 +18,8 @@ export default function CommunityFeed() {
   const [community, setCommunity] = useState(null);
   const [joined, setJoined] = useState(false);
   const [posts, setPosts] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [activeComments, setActiveComments] = useState(null);
   const [commentInput, setCommentInput] = useState("");
   const [showEditModal, setShowEditModal] = useState(false);
@@ -47,10 +49,27 @@ export default function CommunityFeed() {
   useEffect(() => {
     axios
       .get(`http://127.0.0.1:8000/api/community_posts/${id}`)
-      .then((res) => setPosts(res.data))
+      .then((res) => {
+        setPosts(res.data.results);
+        setNextPage(res.data.next);
+      })
       .catch(console.error);
   }, [id]);
 
+  // the API pages by cursor: `next` is the full URL of the following page
+  const loadMore = () => {
+    if (!nextPage || loadingMore) return;
+    setLoadingMore(true);
+    axios
+      .get(nextPage)
+      .then((res) => {
+        setPosts((prev) => prev.concat(res.data.results.filter((p) => !prev.some((q) => q.id === p.id))));
+        setNextPage(res.data.next);
+      })
+      .catch(console.error)
+      .finally(() => setLoadingMore(false));
+  };
+
   /* ---------------- JOIN / LEAVE ---------------- */
   const toggleJoin = () => {
     axios
@@ -188,6 +207,18 @@ export default function CommunityFeed() {
             )}
           </div>
         ))}
+
+        {nextPage && (
+          <div className="text-center py-4">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="px-5 py-2 rounded-full text-sm font-semibold bg-cyan-500 text-white hover:bg-cyan-600 disabled:opacity-60"
+            >
+              {loadingMore ? "Loading..." : "Load more"}
+            </button>
+          </div>
+        )}
       </div>
 
       {/* FLOATING ADD BUTTON */}
@@ -31,7 +31,7 @@ export default function DiscoverCommunity() {
         headers: { Authorization: `Token ${token}` },
       })
       .then((res) => {
-        setCommunities(res.data);
+        setCommunities(res.data.results);
         setLoading(false);
       })
       .catch((err) => {
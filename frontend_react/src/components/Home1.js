@@ -54,7 +54,7 @@ export default function Home1() {
       .get("http://127.0.0.1:8000/api/latest_post", {
         headers: { Authorization: `Token ${token}` },
       })
-      .then((res) => setPosts(res.data))
+      .then((res) => setPosts(res.data.results))
       .catch(() => {
         localStorage.removeItem("token");
         navigate("/login");
@@ -9,6 +9,8 @@ export default function MessageFeed({ chat, onBack }) {
   const inputRef = useRef(null);
 
   const [messages, setMessages] = useState([]);
+  const [hasOlder, setHasOlder] = useState(false);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const [text, setText] = useState("");
   const [menuOpen, setMenuOpen] = useState(false);
   const [selectedMsgForOptions, setSelectedMsgForOptions] = useState(null);
@@ -22,6 +24,7 @@ export default function MessageFeed({ chat, onBack }) {
   const [isTyping, setIsTyping] = useState(false);
   const typingTimeoutRef = useRef(null);
   const typingPollRef = useRef(null);
+  const socketRef = useRef(null);
 
   const token = localStorage.getItem("token");
   const myId = Number(localStorage.getItem("user_id"));
@@ -46,46 +49,151 @@ export default function MessageFeed({ chat, onBack }) {
   useEffect(() => {
     if (!chat) return;
 
+    let lastId = 0;
+    const markReadIfNeeded = async (list) => {
+      // if there are unread messages from other user, mark read
+      if (list.some((m) => !m.is_read && m.sender.id !== myId)) {
+        await axios.post(`http://127.0.0.1:8000/api/mark_read/${chat.id}/`, {}, headers).catch(() => {});
+        window.dispatchEvent(new CustomEvent("chats:refresh"));
+      }
+    };
+
     const fetchMessages = async () => {
       try {
         const res = await axios.get(
           `http://127.0.0.1:8000/api/get_messages/${chat.id}/`,
           headers
         );
-        setMessages(res.data);
-        // if there are unread messages from other user, mark read
-        if (res.data.some((m) => !m.is_read && m.sender.id !== myId)) {
-          await axios.post(`http://127.0.0.1:8000/api/mark_read/${chat.id}/`, {}, headers).catch(() => {});
-          window.dispatchEvent(new CustomEvent("chats:refresh"));
-        }
+        setMessages(res.data.results);
+        setHasOlder(Boolean(res.data.next));
+        if (res.data.results.length) lastId = res.data.results[res.data.results.length - 1].id;
+        await markReadIfNeeded(res.data.results);
       } catch (err) {
         console.error(err);
       }
     };
 
-    fetchMessages();
-    const timer = setInterval(fetchMessages, 3000);
+    // polling only asks for messages newer than the last one we have
+    const fetchNewMessages = async () => {
+      if (!lastId) return fetchMessages();
+      try {
+        const res = await axios.get(
+          `http://127.0.0.1:8000/api/get_messages/${chat.id}/?after_id=${lastId}`,
+          headers
+        );
+        const fresh = res.data.results;
+        if (!fresh.length) return;
+        lastId = fresh[fresh.length - 1].id;
+        setMessages((prev) => prev.concat(fresh.filter((m) => !prev.some((p) => p.id === m.id))));
+        await markReadIfNeeded(fresh);
+      } catch (err) {
+        console.error(err);
+      }
+    };
 
-    // start typing poll
-    if (typingPollRef.current) clearInterval(typingPollRef.current);
-    typingPollRef.current = setInterval(async () => {
+    let timer = null;
+    const pollTyping = async () => {
       try {
         const res = await axios.get(`http://127.0.0.1:8000/api/get_typing/${chat.id}/`, headers);
         setTypingUsers(res.data.typing_users || []);
       } catch (e) {
         console.error('typing poll failed', e);
       }
-    }, 1500);
-
-    return () => {
+    };
+    // REST polling is the fallback whenever the websocket is not connected
+    const startPolling = () => {
+      if (timer) return;
+      timer = setInterval(fetchNewMessages, 3000);
+      typingPollRef.current = setInterval(pollTyping, 1500);
+    };
+    const stopPolling = () => {
       clearInterval(timer);
+      timer = null;
       if (typingPollRef.current) clearInterval(typingPollRef.current);
+      typingPollRef.current = null;
     };
-  }, [chat, headers, myId]);
 
+    fetchMessages();
+    startPolling();
+
+    const typingTimers = {};
+    const socket = new WebSocket(`ws://127.0.0.1:8000/ws/chat/${chat.id}/?token=${token}`);
+    socketRef.current = socket;
+    socket.onopen = () => {
+      stopPolling();
+      fetchMessages();
+    };
+    socket.onclose = () => {
+      if (socketRef.current === socket) socketRef.current = null;
+      startPolling();
+    };
+    socket.onmessage = (e) => {
+      const event = JSON.parse(e.data);
+      if (event.type === "message.new") {
+        lastId = Math.max(lastId, event.message.id);
+        setMessages((prev) => (prev.some((m) => m.id === event.message.id) ? prev : [...prev, event.message]));
+        if (event.message.sender.id !== myId) {
+          axios.post(`http://127.0.0.1:8000/api/mark_read/${chat.id}/`, {}, headers).catch(() => {});
+        }
+      } else if (event.type === "message.deleted") {
+        setMessages((prev) => prev.map((m) => (m.id === event.message_id ? { ...m, deleted: true, text: "" } : m)));
+      } else if (event.type === "message.read" && event.reader_id !== myId) {
+        setMessages((prev) => prev.map((m) => (m.sender.id === myId ? { ...m, is_read: true } : m)));
+      } else if (event.type === "typing" && event.user_id !== myId) {
+        clearTimeout(typingTimers[event.user_id]);
+        setTypingUsers((prev) => prev.filter((id) => id !== event.user_id).concat(event.active ? [event.user_id] : []));
+        if (event.active) {
+          typingTimers[event.user_id] = setTimeout(
+            () => setTypingUsers((prev) => prev.filter((id) => id !== event.user_id)),
+            5000
+          );
+        }
+      }
+    };
+
+    return () => {
+      stopPolling();
+      Object.values(typingTimers).forEach(clearTimeout);
+      socketRef.current = null;
+      socket.onclose = null;
+      socket.close();
+    };
+  }, [chat, headers, myId, token]);
+
+  // typing indicator goes over the socket when connected, otherwise through the REST endpoint
+  const sendTyping = (active) => {
+    const socket = socketRef.current;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      socket.send(JSON.stringify({ type: "typing", active }));
+      return Promise.resolve();
+    }
+    return axios.post(`http://127.0.0.1:8000/api/typing/${chat.id}/`, { active }, headers).catch(() => {});
+  };
+
+  // scroll down for new messages only, not when older history is prepended
+  const lastMessageId = messages.length ? messages[messages.length - 1].id : null;
   useEffect(() => {
     bottomRef.current?.scrollIntoView({ behavior: "smooth" });
-  }, [messages]);
+  }, [lastMessageId]);
+
+  // history above the first loaded message, one page at a time
+  const loadOlder = async () => {
+    if (!messages.length || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const res = await axios.get(
+        `http://127.0.0.1:8000/api/get_messages/${chat.id}/?before_id=${messages[0].id}`,
+        headers
+      );
+      const older = res.data.results;
+      setMessages((prev) => older.filter((m) => !prev.some((p) => p.id === m.id)).concat(prev));
+      setHasOlder(res.data.has_more);
+    } catch (err) {
+      console.error(err);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
 
   // When a new chat is selected, focus the input box so user can start typing immediately
   useEffect(() => {
@@ -99,7 +207,7 @@ export default function MessageFeed({ chat, onBack }) {
     if (!text) {
       // when cleared, send stop
       if (isTyping) {
-        axios.post(`http://127.0.0.1:8000/api/typing/${chat.id}/`, { active: false }, headers).catch(()=>{});
+        sendTyping(false);
         setIsTyping(false);
       }
       return;
@@ -107,12 +215,12 @@ export default function MessageFeed({ chat, onBack }) {
 
     if (!isTyping) {
       setIsTyping(true);
-      axios.post(`http://127.0.0.1:8000/api/typing/${chat.id}/`, { active: true }, headers).catch(()=>{});
+      sendTyping(true);
     }
 
     if (typingTimeoutRef.current) clearTimeout(typingTimeoutRef.current);
     typingTimeoutRef.current = setTimeout(() => {
-      axios.post(`http://127.0.0.1:8000/api/typing/${chat.id}/`, { active: false }, headers).catch(()=>{});
+      sendTyping(false);
       setIsTyping(false);
     }, 2000);
 
@@ -135,7 +243,7 @@ export default function MessageFeed({ chat, onBack }) {
       setText("");
       window.dispatchEvent(new CustomEvent("chats:refresh"));
       // notify typing stopped
-      await axios.post(`http://127.0.0.1:8000/api/typing/${chat.id}/`, { active: false }, headers).catch(()=>{});
+      await sendTyping(false);
       setIsTyping(false);
     } catch (err) {
       console.error(err);
@@ -233,6 +341,17 @@ export default function MessageFeed({ chat, onBack }) {
 
       {/* MESSAGES */}
       <div className="flex-1 p-4 overflow-y-auto space-y-2 pb-20">
+        {hasOlder && (
+          <div className="text-center">
+            <button
+              className="text-sm text-indigo-600 hover:underline disabled:text-gray-400"
+              onClick={loadOlder}
+              disabled={loadingOlder}
+            >
+              {loadingOlder ? "Loading..." : "Load earlier messages"}
+            </button>
+          </div>
+        )}
         {messages.map((m) => {
           const mine = m.sender.id === myId;
           return (
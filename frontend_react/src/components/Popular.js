@@ -22,7 +22,7 @@ export default function Popular() {
       .get("http://127.0.0.1:8000/api/popular_posts", {
         headers: { Authorization: `Token ${token}` },
       })
-      .then((res) => setPosts(res.data))
+      .then((res) => setPosts(res.data.results))
       .catch((err) => {
         console.error(err);
         setError("Failed to load popular posts");
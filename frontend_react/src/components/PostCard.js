@@ -32,6 +32,13 @@ export default function PostCard({
       : `http://127.0.0.1:8000${path}`;
   };
 
+  // resized variants from the server; browsers pick the smallest one that fits
+  const mediaSrcSet = (post) =>
+    (post.media_renditions || [])
+      .filter((r) => r.kind === "image" && r.format === "webp")
+      .map((r) => `${getFullUrl(r.url)} ${r.width}w`)
+      .join(", ");
+
   const mediaLooksLikeVideo = (post) => {
     if (!post) return false;
     if (post.media_type === "video") return true;
@@ -179,6 +186,7 @@ export default function PostCard({
               <video
                 ref={thumbVideoRef}
                 src={getFullUrl(post.media_file)}
+                poster={getFullUrl(post.media_preview) || undefined}
                 className="w-full max-h-[520px] object-contain"
                 muted={thumbMuted}
                 playsInline
@@ -194,7 +202,12 @@ export default function PostCard({
             </div>
           ) : (
             <img
-              src={getFullUrl(post.media_file)}
+              src={getFullUrl(post.media_preview || post.media_file)}
+              srcSet={mediaSrcSet(post) || undefined}
+              sizes="(max-width: 640px) 100vw, 640px"
+              width={post.media_width || undefined}
+              height={post.media_height || undefined}
+              loading="lazy"
               className="w-full max-h-[520px] object-contain"
               alt="post"
             />
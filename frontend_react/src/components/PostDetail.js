@@ -19,6 +19,11 @@ export default function PostDetail() {
   const [likes, setLikes] = useState(0);
   const [dislikes, setDislikes] = useState(0);
   const [comments, setComments] = useState([]);
+  const [nextComments, setNextComments] = useState(null);
+  const [loadingComments, setLoadingComments] = useState(false);
+  // comment id -> URL of its next page of replies (null once all are loaded)
+  const [replyNext, setReplyNext] = useState({});
+  const [loadingReplies, setLoadingReplies] = useState(null);
   const [showComments, setShowComments] = useState(true);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
@@ -77,7 +82,8 @@ export default function PostDetail() {
         setDisliked(!!res.data.disliked);
 
         const commentsRes = await axios.get(`http://127.0.0.1:8000/api/get_comment/${id}`, { headers });
-        setComments(commentsRes.data);
+        setComments(commentsRes.data.results);
+        setNextComments(commentsRes.data.next);
       } catch (err) {
         if (err.response?.status === 404 && statePost) {
           setPost(statePost);
@@ -85,7 +91,8 @@ export default function PostDetail() {
           setDislikes(statePost.dislikes_count || 0);
           try {
             const commentsRes = await axios.get(`http://127.0.0.1:8000/api/get_comment/${id}`, { headers });
-            setComments(commentsRes.data);
+            setComments(commentsRes.data.results);
+            setNextComments(commentsRes.data.next);
           } catch {}
         } else {
           setError(err.response?.data?.error || "Failed to load post.");
@@ -121,6 +128,49 @@ export default function PostDetail() {
     }
   };
 
+  // apply fn to the comment with this id wherever it sits in the loaded tree
+  const updateComment = (list, commentId, fn) => list.map((c) => (
+    c.id === commentId ? fn(c) : { ...c, replies: c.replies && updateComment(c.replies, commentId, fn) }
+  ));
+
+  const removeComment = (list, commentId) => list
+    .filter((c) => c.id !== commentId)
+    .map((c) => ({ ...c, replies: c.replies && removeComment(c.replies, commentId) }));
+
+  // top-level comments page by cursor: `next` is the full URL of the following page
+  const loadMoreComments = async () => {
+    if (!nextComments || loadingComments) return;
+    setLoadingComments(true);
+    try {
+      const res = await axios.get(nextComments, { headers });
+      setComments((prev) => prev.concat(res.data.results.filter((c) => !prev.some((p) => p.id === c.id))));
+      setNextComments(res.data.next);
+    } catch (err) {
+      console.error(err);
+    } finally {
+      setLoadingComments(false);
+    }
+  };
+
+  // the thread only inlines the first few replies per comment; ?parent= pages through the rest
+  const loadMoreReplies = async (comment) => {
+    if (loadingReplies) return;
+    setLoadingReplies(comment.id);
+    try {
+      const url = replyNext[comment.id] || `http://127.0.0.1:8000/api/get_comment/${id}?parent=${comment.id}`;
+      const res = await axios.get(url, { headers });
+      setComments((prev) => updateComment(prev, comment.id, (c) => {
+        const loaded = c.replies || [];
+        return { ...c, replies: loaded.concat(res.data.results.filter((r) => !loaded.some((l) => l.id === r.id))) };
+      }));
+      setReplyNext((prev) => ({ ...prev, [comment.id]: res.data.next }));
+    } catch (err) {
+      console.error(err);
+    } finally {
+      setLoadingReplies(null);
+    }
+  };
+
   const handleAddComment = async () => {
     if (!newComment.trim()) return;
     if (!token) return alert('Please login to comment');
@@ -176,7 +226,7 @@ export default function PostDetail() {
     if (!token) return alert('Login required');
     try {
       await axios.delete(`http://127.0.0.1:8000/api/delete_comment/${deleteCommentTarget}`, { headers: { Authorization: `Token ${token}` } });
-      setComments((prev) => prev.filter((c) => c.id !== deleteCommentTarget));
+      setComments((prev) => removeComment(prev, deleteCommentTarget));
       setToastText('Deleted');
       setShowDeletedToast(true);
       setTimeout(() => setShowDeletedToast(false), 900);
@@ -188,6 +238,73 @@ export default function PostDetail() {
       setDeleteCommentTarget(null);
     }
   };
+  // a comment, the replies loaded under it, and a "load more replies" link while the server has more
+  const renderComment = (c, level = 0) => {
+    const replies = c.replies || [];
+    const moreReplies = replyNext[c.id] !== null && (replyNext[c.id] || replies.length < (c.reply_count || 0));
+    return (
+      <div key={c.id}>
+        <div className="px-5 py-3 flex gap-3 items-start relative" style={{ paddingLeft: `${1.25 + level * 2.5}rem` }}>
+          <img src={c.user?.profile_pic ? (c.user.profile_pic.startsWith('http') ? c.user.profile_pic : `http://127.0.0.1:8000${c.user.profile_pic}`) : "/default_avatar.svg"} className="w-9 h-9 rounded-full object-cover" alt={c.user?.name || 'commenter'} />
+          <div className="flex-1">
+            <p className="text-sm"><span className="font-semibold">{c.user?.name || c.user_name}</span> {c.text}</p>
+            <p className="text-xs text-gray-400 mt-1">{timeAgo(c.created_at)}</p>
+          </div>
+          <div className="relative">
+            <button onClick={() => setActiveCommentMenu(activeCommentMenu === c.id ? null : c.id)}>
+              <EllipsisVerticalIcon className="w-4 h-4 text-gray-500" />
+            </button>
+            <AnimatePresence>
+              {activeCommentMenu === c.id && (
+                <motion.div
+                  initial={{ opacity: 0, scale: 0.95 }}
+                  animate={{ opacity: 1, scale: 1 }}
+                  exit={{ opacity: 0 }}
+                  className="absolute right-0 top-8 bg-white shadow-lg rounded-xl"
+                >
+                  {/* Delete for comment owner */}
+                  {currentUserId && c.user && currentUserId === c.user.id && (
+                    <button
+                      onClick={() => {
+                        setDeleteCommentTarget(c.id);
+                        setShowDeleteCommentConfirm(true);
+                        setActiveCommentMenu(null);
+                      }}
+                      className="px-4 py-2 text-sm text-red-600 hover:bg-gray-100"
+                    >
+                      Delete comment
+                    </button>
+                  )}
+
+                  {/* Report only for non-owners */}
+                  {!(currentUserId && c.user && currentUserId === c.user.id) && (
+                    <button
+                      onClick={() => reportComment(c)}
+                      className="px-4 py-2 text-sm text-red-500 hover:bg-gray-100 dark:hover:bg-gray-700"
+                    >
+                      Report comment
+                    </button>
+                  )}
+                </motion.div>
+              )}
+            </AnimatePresence>
+
+          </div>
+        </div>
+        {replies.map((r) => renderComment(r, level + 1))}
+        {moreReplies && (
+          <button
+            onClick={() => loadMoreReplies(c)}
+            disabled={loadingReplies === c.id}
+            className="text-xs text-blue-500 hover:underline disabled:text-gray-400"
+            style={{ marginLeft: `${4.25 + level * 2.5}rem` }}
+          >
+            {loadingReplies === c.id ? 'Loading...' : `View ${Math.max((c.reply_count || 0) - replies.length, 1)} more replies`}
+          </button>
+        )}
+      </div>
+    );
+  };
   return (
     <div className="min-h-screen bg-gray-100 dark:bg-gray-900 flex flex-col">
       {/* Header */}
@@ -319,54 +436,12 @@ export default function PostDetail() {
 
                 {/* Comment List */}
                 <div className="flex flex-col">
-                  {comments.map((c) => (
-                    <div key={c.id} className="px-5 py-3 flex gap-3 items-start relative">
-                      <img src={c.user?.profile_pic ? (c.user.profile_pic.startsWith('http') ? c.user.profile_pic : `http://127.0.0.1:8000${c.user.profile_pic}`) : "/default_avatar.svg"} className="w-9 h-9 rounded-full object-cover" alt={c.user?.name || 'commenter'} />
-                      <div className="flex-1">
-                        <p className="text-sm"><span className="font-semibold">{c.user?.name || c.user_name}</span> {c.text}</p>
-                        <p className="text-xs text-gray-400 mt-1">{timeAgo(c.created_at)}</p>
-                      </div>
-                      <div className="relative">
-                        <button onClick={() => setActiveCommentMenu(activeCommentMenu === c.id ? null : c.id)}>
-                          <EllipsisVerticalIcon className="w-4 h-4 text-gray-500" />
-                        </button>
-                        <AnimatePresence>
-                          {activeCommentMenu === c.id && (
-                            <motion.div
-                              initial={{ opacity: 0, scale: 0.95 }}
-                              animate={{ opacity: 1, scale: 1 }}
-                              exit={{ opacity: 0 }}
-                              className="absolute right-0 top-8 bg-white shadow-lg rounded-xl"
-                            >
-                              {/* Delete for comment owner */}
-                              {currentUserId && c.user && currentUserId === c.user.id && (
-                                <button
-                                  onClick={() => {
-                                    setDeleteCommentTarget(c.id);
-                                    setShowDeleteCommentConfirm(true);
-                                    setActiveCommentMenu(null);
-                                  }}
-                                  className="px-4 py-2 text-sm text-red-600 hover:bg-gray-100"
-                                >
-                                  Delete comment
-                                </button>
-                              )}
-
-                              {/* Report only for non-owners */}
-                              {!(currentUserId && c.user && currentUserId === c.user.id) && (
-                                <button
-                                  onClick={() => reportComment(c)}
-                                  className="px-4 py-2 text-sm text-red-500 hover:bg-gray-100 dark:hover:bg-gray-700"
-                                >
-                                  Report comment
-                                </button>
-                              )}
-                            </motion.div>
-                          )}
-                        </AnimatePresence>
-
-                      </div>
-                    </div>
+                  {comments.map((c) => renderComment(c))}
+                  {nextComments && (
+                    <button onClick={loadMoreComments} disabled={loadingComments} className="px-5 py-3 text-sm text-blue-500 hover:underline text-left disabled:text-gray-400">
+                      {loadingComments ? 'Loading...' : 'Load more comments'}
+                    </button>
+                  )}
                   ))}
                 </div>
               </motion.div>
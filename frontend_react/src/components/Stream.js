@@ -19,7 +19,7 @@ export default function Stream() {
     axios
       .get("http://127.0.0.1:8000/api/stream_posts", { headers: { Authorization: `Token ${token}` } })
       .then((res) => {
-        setPosts(res.data);
+        setPosts(res.data.results);
       })
       .catch((err) => {
         console.error(err);
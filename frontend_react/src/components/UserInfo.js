@@ -13,6 +13,8 @@ export default function UserInfo() {
   const [blocked, setBlocked] = useState(false);
   const [showBlockModal, setShowBlockModal] = useState(false);
   const [userPosts, setUserPosts] = useState([]);
+  const [nextPostsPage, setNextPostsPage] = useState(null);
+  const [loadingMorePosts, setLoadingMorePosts] = useState(false);
   const [userCommunities, setUserCommunities] = useState([]);
   const [activeTab, setActiveTab] = useState('posts');
   const [showPicModal, setShowPicModal] = useState(false);
@@ -26,6 +28,21 @@ export default function UserInfo() {
     return p.startsWith('http') ? p : `http://127.0.0.1:8000${p}`;
   };
 
+  // user_posts pages by cursor: `next` is the full URL of the following page
+  const loadMorePosts = async () => {
+    if (!nextPostsPage || loadingMorePosts) return;
+    setLoadingMorePosts(true);
+    try {
+      const res = await axios.get(nextPostsPage, { headers: { Authorization: `Token ${token}` } });
+      setUserPosts((prev) => prev.concat(res.data.results.filter((p) => !prev.some((q) => q.id === p.id))));
+      setNextPostsPage(res.data.next);
+    } catch (e) {
+      console.error('Failed to load more posts:', e);
+    } finally {
+      setLoadingMorePosts(false);
+    }
+  };
+
   const fetchUser = useCallback(async () => {
     if (!token) {
       navigate("/login");
@@ -57,10 +74,12 @@ export default function UserInfo() {
           // Try to get user's posts and created communities (backend endpoints may not exist on older versions)
       try {
         const postsRes = await axios.get(`http://127.0.0.1:8000/api/user_posts/${numericId}/`, { headers: { Authorization: `Token ${token}` } });
-        setUserPosts(postsRes.data || []);
+        setUserPosts(postsRes.data.results || []);
+        setNextPostsPage(postsRes.data.next || null);
       } catch (e) {
         // ignore if endpoint not available
         setUserPosts([]);
+        setNextPostsPage(null);
       }
 
       try {
@@ -266,7 +285,7 @@ export default function UserInfo() {
       <div className="mt-6 bg-white rounded-xl shadow p-2">
         <div className="flex justify-around border-b pb-2">
           <button onClick={() => setActiveTab('posts')} className={`py-2 px-4 rounded ${activeTab === 'posts' ? 'bg-gray-100 font-semibold' : 'text-gray-500'}`}>
-            Posts ({userPosts.length})
+            Posts ({userPosts.length}{nextPostsPage ? '+' : ''})
           </button>
           <button onClick={() => setActiveTab('communities')} className={`py-2 px-4 rounded ${activeTab === 'communities' ? 'bg-gray-100 font-semibold' : 'text-gray-500'}`}>
             Communities ({userCommunities.length})
@@ -316,6 +335,18 @@ export default function UserInfo() {
               ))}
             </div>
           )}
+
+          {activeTab === 'posts' && nextPostsPage && (
+            <div className="text-center mt-4">
+              <button
+                onClick={loadMorePosts}
+                disabled={loadingMorePosts}
+                className="px-4 py-2 rounded bg-gray-100 text-sm font-semibold hover:bg-gray-200 disabled:opacity-60"
+              >
+                {loadingMorePosts ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </div>
       </div>
     </div>